@@ -0,0 +1,46 @@
+"""Parse throughput on a generated workload.
+
+    python benchmarks/bench_parse.py --n 1000000 --seed 1
+
+`bench_suite.py` runs the same measurement (case `parse_select_query`) with baselines.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from eplws1.parse import parse_select_query  # noqa: E402
+from eplws1.workload_gen import generate_workload  # noqa: E402
+
+
+def parse_all(qs) -> None:
+    for q in qs:
+        parse_select_query(q)
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--n", type=int, default=1_000_000)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args(argv)
+
+    t0 = time.perf_counter()
+    qs = generate_workload(args.n, seed=args.seed)
+    n_bytes = sum(len(q) for q in qs)
+    print(f"generated {len(qs)} queries ({n_bytes / 1e6:.1f} MB) in {time.perf_counter() - t0:.1f}s")
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        parse_all(qs)
+        best = min(best, time.perf_counter() - t0)
+    print(f"parse_select_query: {len(qs) / best:,.0f} queries/s, {n_bytes / best / 1e6:.1f} MB/s (best of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
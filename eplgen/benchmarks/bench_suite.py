@@ -0,0 +1,191 @@
+"""Fixed-seed benchmark suite over the pipeline stages, with JSON baselines.
+
+    python benchmarks/bench_suite.py --sizes small,medium --save benchmarks/baseline.json
+    python benchmarks/bench_suite.py --sizes small,medium --baseline benchmarks/baseline.json --max-regression 0.2
+
+Every case builds its inputs from a fixed seed (outside the timed region) and
+reports the best of `--repeat` runs. With `--baseline`, the exit status is 1 if
+any case present in the baseline got slower by more than `--max-regression`
+(a fraction: 0.25 = 25%). Baselines are machine-specific; save one per machine.
+Runs offline and needs nothing beyond the package's own dependencies.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_parse import parse_all  # noqa: E402
+from eplws1.decompose import decompose_select_query  # noqa: E402
+from eplws1.export_data import write_case_csv  # noqa: E402
+from eplws1.export_epl import ExportConfig, export_queries_to_case_files  # noqa: E402
+from eplws1.harness import compare_outputs  # noqa: E402
+from eplws1.normalize import to_operator_tree  # noqa: E402
+from eplws1.parse import parse_select_query  # noqa: E402
+from eplws1.print_epl import query_to_epl  # noqa: E402
+from eplws1.synth_events import generate_inputs  # noqa: E402
+from eplws1.workload_gen import generate_workload  # noqa: E402
+
+SIZES = {"small": 1_000, "medium": 10_000, "large": 100_000}
+SEED = 1
+_TMP = tempfile.TemporaryDirectory(prefix="eplws1_bench_")  # removed at exit
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    setup: Callable[[int], Tuple[Callable[[], object], int]]  # n -> (timed fn, items processed)
+    scale: float = 1.0  # multiplies the size's n (for expensive stages)
+
+
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str, scale: float = 1.0):
+    def deco(setup):
+        CASES[name] = Case(name, setup, scale)
+        return setup
+    return deco
+
+
+def _queries(n: int) -> List[str]:
+    return generate_workload(n, seed=SEED)
+
+
+@case("parse_select_query")
+def _parse(n):
+    qs = _queries(n)
+    return (lambda: parse_all(qs)), n
+
+
+@case("to_operator_tree")
+def _tree(n):
+    parsed = [parse_select_query(q) for q in _queries(n)]
+    return (lambda: [to_operator_tree(q) for q in parsed]), n
+
+
+@case("decompose_select_query")
+def _decompose(n):
+    parsed = [parse_select_query(q) for q in _queries(n)]
+    return (lambda: [decompose_select_query(q) for q in parsed]), n
+
+
+@case("query_to_epl")
+def _print(n):
+    parsed = [parse_select_query(q) for q in _queries(n)]
+    return (lambda: [query_to_epl(q) for q in parsed]), n
+
+
+@case("generate_workload")
+def _gen(n):
+    return (lambda: generate_workload(n, seed=SEED)), n
+
+
+@case("generate_inputs", scale=10)
+def _inputs(n):
+    # n events per stream, default streams
+    return (lambda: generate_inputs(seed=SEED, n_per_stream=n)), n
+
+
+@case("write_case_csv", scale=10)
+def _csv(n):
+    events = generate_inputs(seed=SEED, n_per_stream=n)
+    out = Path(_TMP.name) / f"case_{n}.csv"
+    return (lambda: write_case_csv(out, events)), n * len(events)
+
+
+@case("export_queries_to_case_files", scale=0.1)
+def _export(n):
+    qs = _queries(n)
+    out = Path(_TMP.name) / f"export_{n}"
+    cfg = ExportConfig(n_per_stream=50, seed=SEED)
+    return (lambda: export_queries_to_case_files(qs, out, cfg=cfg)), n
+
+
+@case("compare_outputs", scale=10)
+def _compare(n):
+    rng = random.Random(SEED)
+    a = [{"camera": rng.choice("123"), "temp": float(rng.randrange(50)), "x": rng.randrange(5), "ts": i} for i in range(n)]
+    b = list(a)
+    rng.shuffle(b)
+    return (lambda: compare_outputs(a, b)), n
+
+
+def run_case(c: Case, size: str, repeat: int) -> dict:
+    n = max(1, int(SIZES[size] * c.scale))
+    fn, items = c.setup(n)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return {"n": n, "items": items, "seconds": best, "items_per_s": items / best if best > 0 else 0.0}
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> List[str]:
+    """Names of cases slower than baseline by more than max_regression."""
+    failed = []
+    for key, res in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None:
+            print(f"  {key:<45} {res['seconds']:10.4f}s  (no baseline)")
+            continue
+        ratio = res["seconds"] / base["seconds"] if base["seconds"] > 0 else 1.0
+        flag = "REGRESSION" if ratio > 1 + max_regression else ""
+        print(f"  {key:<45} {res['seconds']:10.4f}s  baseline {base['seconds']:.4f}s  x{ratio:5.2f} {flag}")
+        if flag:
+            failed.append(key)
+    return failed
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", type=str, default="small", help=f"Comma-separated subset of {','.join(SIZES)}")
+    p.add_argument("--only", type=str, default=None, help="Comma-separated case names")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--save", type=str, default=None, help="Write results as JSON (e.g. a new baseline)")
+    p.add_argument("--baseline", type=str, default=None, help="JSON results to compare against")
+    p.add_argument("--max-regression", type=float, default=0.25, help="Allowed slowdown vs baseline, as a fraction")
+    args = p.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    names = [s.strip() for s in args.only.split(",")] if args.only else list(CASES)
+    unknown = [s for s in sizes if s not in SIZES] + [c for c in names if c not in CASES]
+    if unknown:
+        p.error(f"unknown size/case: {', '.join(unknown)}")
+
+    results: Dict[str, dict] = {}
+    for name in names:
+        for size in sizes:
+            key = f"{name}[{size}]"
+            results[key] = res = run_case(CASES[name], size, args.repeat)
+            print(f"{key:<47} n={res['n']:<8} {res['seconds']:.4f}s  {res['items_per_s']:,.0f} items/s", flush=True)
+
+    if args.save:
+        doc = {
+            "meta": {"python": platform.python_version(), "machine": platform.machine(), "seed": SEED, "repeat": args.repeat},
+            "results": results,
+        }
+        Path(args.save).write_text(json.dumps(doc, indent=2) + "\n", encoding="utf-8")
+
+    if args.baseline:
+        baseline: Optional[dict] = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        print(f"vs {args.baseline} (max regression {args.max_regression:.0%}):")
+        failed = compare(results, baseline["results"], args.max_regression)  # type: ignore[index]
+        if failed:
+            print(f"{len(failed)} case(s) regressed: {', '.join(failed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,24 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional, Sequence, Union, List
+from typing import Dict, Hashable, Optional, Sequence, Tuple, Union, List
 
 # ---- Source-level AST (what we parse / generate) ----
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WindowSpec:
     """Inline window spec used in FROM, e.g., #time(20 sec)."""
     func: str  # e.g. "time(20 sec)" or "length(5)"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class StreamSource:
     name: str                       # e.g., "DetectMov"
     filter_cond: Optional[str] = None  # e.g., "camera='R2'"
     window: Optional[WindowSpec] = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PatternSource:
     pattern: str  # raw text inside PATTERN [...], including brackets if desired
 
@@ -26,7 +26,7 @@ class PatternSource:
 FromSource = Union[StreamSource, PatternSource]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SelectQuery:
     """Minimal EPL query form for this workstream."""
     select: str                      # raw select list, e.g. "*", "camera, avg(temp)"
@@ -40,42 +40,147 @@ class SelectQuery:
         return len(self.from_sources) >= 2
 
 # ---- Operator tree (what Algorithms 1–3 traverse) ----
+# Nodes compare structurally, but check identity and their cached hashes first,
+# so comparing hash-consed trees (see NodeTable) is O(1).
 
-@dataclass(frozen=True)
 class OpNode:
-    pass
+    __slots__ = ("_hash",)
+    __match_args__: Tuple[str, ...] = ()
 
+    def _fields(self) -> tuple:
+        return tuple(getattr(self, f) for f in self.__match_args__)
 
-@dataclass(frozen=True)
+    def __hash__(self) -> int:
+        try:
+            return self._hash
+        except AttributeError:
+            h = hash((type(self).__name__,) + self._fields())
+            object.__setattr__(self, "_hash", h)
+            return h
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if type(other) is not type(self):
+            return NotImplemented
+        return hash(self) == hash(other) and self._fields() == other._fields()  # type: ignore[attr-defined]
+
+    def __ne__(self, other: object) -> bool:
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+
+@dataclass(frozen=True, slots=True, eq=False)
 class OpSelect(OpNode):
     select: str
     group_by: Optional[str]
     child: OpNode
+    where: Optional[str] = None  # WHERE fused into the projection (see optimize)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class OpWhere(OpNode):
     cond: str
     child: OpNode
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class OpJoin(OpNode):
     left: OpNode
     right: OpNode
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class OpWindow(OpNode):
     child: OpNode
     window: WindowSpec
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class OpStream(OpNode):
     src: StreamSource
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True, eq=False)
 class OpPattern(OpNode):
     src: PatternSource
+
+
+# ---- Hash-consing ----
+
+class NodeTable:
+    """Hash-consing factory: one shared object per distinct string, source and subtree.
+
+    `node(n)` returns the table's canonical copy of a tree, so structurally equal
+    subtrees built through one table are the same object (equality is an
+    identity check, hashes are computed once). `query(q)` shares the strings and
+    sources of a parsed query the same way, which makes holding a large parsed
+    workload compact. Entries live as long as the table.
+    """
+
+    def __init__(self) -> None:
+        self._objs: Dict[Hashable, object] = {}
+
+    def __len__(self) -> int:
+        return len(self._objs)
+
+    def _get(self, obj):
+        return self._objs.setdefault(obj, obj)
+
+    def intern(self, s: Optional[str]) -> Optional[str]:
+        return None if s is None else self._get(s)
+
+    def window(self, w: Optional[WindowSpec]) -> Optional[WindowSpec]:
+        return None if w is None else self._get(WindowSpec(self.intern(w.func)))  # type: ignore[arg-type]
+
+    def source(self, src: FromSource) -> FromSource:
+        if isinstance(src, PatternSource):
+            return self._get(PatternSource(self.intern(src.pattern)))  # type: ignore[arg-type]
+        return self._get(StreamSource(
+            self.intern(src.name), self.intern(src.filter_cond), self.window(src.window),  # type: ignore[arg-type]
+        ))
+
+    def query(self, q: SelectQuery) -> SelectQuery:
+        """q with shared strings and sources; `from_sources` becomes a tuple."""
+        i = self.intern
+        return SelectQuery(
+            i(q.select), tuple(self.source(s) for s in q.from_sources),  # type: ignore[arg-type]
+            i(q.where), i(q.group_by), i(q.having), i(q.insert_into),
+        )
+
+    def node(self, n: OpNode) -> OpNode:
+        hit = self._objs.get(n)
+        if hit is not None and hit is n:
+            return n
+        if isinstance(n, OpSelect):
+            n = OpSelect(self.intern(n.select), self.intern(n.group_by), self.node(n.child), self.intern(n.where))  # type: ignore[arg-type]
+        elif isinstance(n, OpWhere):
+            n = OpWhere(self.intern(n.cond), self.node(n.child))  # type: ignore[arg-type]
+        elif isinstance(n, OpJoin):
+            n = OpJoin(self.node(n.left), self.node(n.right))
+        elif isinstance(n, OpWindow):
+            n = OpWindow(self.node(n.child), self.window(n.window))  # type: ignore[arg-type]
+        elif isinstance(n, OpStream):
+            n = OpStream(self.source(n.src))  # type: ignore[arg-type]
+        elif isinstance(n, OpPattern):
+            n = OpPattern(self.source(n.src))  # type: ignore[arg-type]
+        return self._get(n)
+
+    # constructors for building trees directly through the table
+    def select(self, select: str, group_by: Optional[str], child: OpNode, where: Optional[str] = None) -> OpNode:
+        return self._get(OpSelect(self.intern(select), self.intern(group_by), child, self.intern(where)))  # type: ignore[arg-type]
+
+    def where(self, cond: str, child: OpNode) -> OpNode:
+        return self._get(OpWhere(self.intern(cond), child))  # type: ignore[arg-type]
+
+    def join(self, left: OpNode, right: OpNode) -> OpNode:
+        return self._get(OpJoin(left, right))
+
+    def windowed(self, child: OpNode, window: WindowSpec) -> OpNode:
+        return self._get(OpWindow(child, self.window(window)))  # type: ignore[arg-type]
+
+    def stream(self, src: StreamSource) -> OpNode:
+        return self._get(OpStream(self.source(src)))  # type: ignore[arg-type]
+
+    def pattern(self, src: PatternSource) -> OpNode:
+        return self._get(OpPattern(self.source(src)))  # type: ignore[arg-type]
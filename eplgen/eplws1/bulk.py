@@ -0,0 +1,207 @@
+"""Chunked, bounded-memory fan-out of per-line work over a process pool."""
+from __future__ import annotations
+
+import collections
+import dataclasses
+import itertools
+import json
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from . import metrics
+from .cache import CacheStats, DecompositionCache
+from .decompose import SharedDecomposer
+from .joinorder import JoinPlan, JoinStats, reorder_joins
+from .print_epl import query_to_epl
+from .io_utils import open_text
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    it = iter(items)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_chunks(
+    fn: Callable[[List[T]], R],
+    chunks: Iterable[List[T]],
+    *,
+    workers: int,
+    ordered: bool = True,
+    max_in_flight: Optional[int] = None,
+    initializer: Optional[Callable[..., None]] = None,
+    initargs: Sequence[object] = (),
+) -> Iterator[R]:
+    """Apply fn to each chunk in a process pool, holding at most `max_in_flight` chunks.
+
+    Results come back in submission order when `ordered`, else as they complete.
+    `workers <= 1` runs in-process.
+    """
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for c in chunks:
+            yield fn(c)
+        return
+
+    limit = max_in_flight or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=tuple(initargs)) as pool:
+        if ordered:
+            queue: Deque[Future] = collections.deque()
+            for c in chunks:
+                queue.append(pool.submit(fn, c))
+                if len(queue) >= limit:
+                    yield queue.popleft().result()
+            while queue:
+                yield queue.popleft().result()
+        else:
+            pending: Set[Future] = set()
+            for c in chunks:
+                pending.add(pool.submit(fn, c))
+                if len(pending) >= limit:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        yield fut.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+
+
+# ---------------------------
+# decompose over JSONL
+# ---------------------------
+
+_cache: Optional[DecompositionCache] = None
+_join_stats: Optional[JoinStats] = None
+
+
+def _init_decompose_worker(
+    cache_size: int, cache_path: Optional[str], join_order: bool = False, with_metrics: bool = False,
+) -> None:
+    global _cache, _join_stats
+    _cache = DecompositionCache(maxsize=cache_size, path=cache_path)
+    _join_stats = JoinStats() if join_order else None
+    if with_metrics:
+        metrics.enable()
+
+
+def _decompose_chunk(
+    args: Tuple[str, bool, bool, List[Tuple[int, str]]],
+) -> Tuple[List[str], CacheStats, Optional[dict]]:
+    mode, optimize, with_index, lines = args
+    assert _cache is not None
+    before = dataclasses.replace(_cache.stats)
+    out: List[str] = []
+    for idx, line in lines:
+        q = json.loads(line)["query"]
+        plans: List[JoinPlan] = []
+        src = q
+        if _join_stats is not None:
+            with metrics.stage("join_order"):
+                parsed = _cache.parse(q)
+                reordered, plans = reorder_joins(parsed, _join_stats)
+                if reordered is not parsed:
+                    src = query_to_epl(reordered)
+        prog, _ = _cache.decompose(src, create_window_mode=mode, optimize=optimize)
+        metrics.count_statements(prog.stmts)
+        rec = {"index": idx} if with_index else {}
+        rec.update(query=q, decomposed=prog.statements, lineage=prog.stream_lineage)
+        if plans:
+            rec["join_plans"] = [p.as_dict() for p in plans]
+        out.append(json.dumps(rec) + "\n")
+    _cache.flush()
+    metrics.count("queries", len(lines))
+    after = _cache.stats
+    return out, CacheStats(
+        hits=after.hits - before.hits,
+        misses=after.misses - before.misses,
+        disk_hits=after.disk_hits - before.disk_hits,
+        evictions=after.evictions - before.evictions,
+    ), metrics.take()
+
+
+def decompose_jsonl(
+    in_jsonl: str | Path,
+    out_jsonl: str | Path,
+    *,
+    create_window_mode: str = "paper",
+    optimize: bool = False,
+    join_order: bool = False,
+    workers: int = 1,
+    chunk_size: int = 1000,
+    ordered: bool = True,
+    cache_size: int = 4096,
+    cache_path: Optional[str] = None,
+) -> Tuple[int, CacheStats]:
+    """Stream `in_jsonl` through parse+decompose; return (records written, cache stats).
+
+    With `ordered=False` records are written as chunks complete and carry a 1-based
+    `index` field giving their input line. `.gz`/`.zst` paths are (de)compressed.
+    With `join_order`, multi-source FROM clauses are reordered by `joinorder.reorder_joins`
+    before decomposing, and each such record lists the costed `join_plans`.
+    """
+    n = 0
+    stats = CacheStats()
+    with open_text(in_jsonl, "r") as fin, open_text(out_jsonl, "w") as fout:
+        numbered = enumerate((l for l in fin if l.strip()), start=1)
+        jobs = ((create_window_mode, optimize, not ordered, c) for c in chunked(numbered, chunk_size))
+        write = metrics.timed("write", fout.writelines)
+        for lines, st, snap in map_chunks(
+            _decompose_chunk, jobs,
+            workers=workers, ordered=ordered,
+            initializer=_init_decompose_worker, initargs=(cache_size, cache_path, join_order, metrics.enabled()),
+        ):
+            metrics.merge(snap)
+            write(lines)
+            n += len(lines)
+            for f in dataclasses.fields(st):
+                setattr(stats, f.name, getattr(stats, f.name) + getattr(st, f.name))
+    if workers <= 1 and _cache is not None:
+        _cache.close()
+    metrics.count_bytes(out_jsonl)
+    return n, stats
+
+
+def decompose_workload_jsonl(
+    in_jsonl: str | Path,
+    out_json: str | Path,
+    *,
+    create_window_mode: str = "paper",
+    optimize: bool = False,
+    cache_size: int = 4096,
+    cache_path: Optional[str] = None,
+) -> SharedDecomposer:
+    """Decompose a whole workload into one shared network (see `SharedDecomposer`).
+
+    Writes a single JSON object: `statements`, `lineage` (stream -> description),
+    `program` (the network as `ir.Program.to_json`, for graph analyses) and
+    `queries`, one `{index, query, final_stream}` per input line.
+    """
+    sd = SharedDecomposer(create_window_mode=create_window_mode, optimize=optimize)
+    queries: List[dict] = []
+    with DecompositionCache(maxsize=cache_size, path=cache_path) as cache, open_text(in_jsonl, "r") as fin:
+        for idx, line in enumerate((l for l in fin if l.strip()), start=1):
+            q = json.loads(line)["query"]
+            parsed = cache.parse(q)
+            with metrics.stage("decompose"):
+                final = sd.add(parsed)
+            queries.append({"index": idx, "query": q, "final_stream": final})
+    metrics.count("queries", len(queries))
+    metrics.count_statements(sd.prog.stmts)
+    with metrics.stage("write"), open_text(out_json, "w") as fout:
+        prog = sd.prog
+        json.dump({
+            "statements": prog.statements, "lineage": prog.stream_lineage,
+            "program": {"stmts": [s.as_json() for s in prog.stmts]}, "queries": queries,
+        }, fout)
+        fout.write("\n")
+    metrics.count_bytes(out_json)
+    return sd
@@ -0,0 +1,183 @@
+"""Memoizing parse/decompose cache.
+
+Keys are the whitespace-normalized query text (plus `create_window_mode` and
+`optimize` for decompositions), so textually identical and whitespace-variant queries share one
+entry. Entries live in a bounded in-memory LRU; decompositions can additionally be
+persisted in a SQLite file shared across CLI invocations. `stats` counts
+decomposition lookups, `parse_stats` the `parse` lookups.
+
+Cached values are never handed out directly: `parse` returns a fresh `SelectQuery`
+and `decompose` a fresh `Program`, so callers may mutate what they get. Programs
+are cached (and persisted, as `Program.to_json`) as statement objects, not text.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Hashable, Optional, Tuple
+
+from . import metrics
+from .ast import SelectQuery
+from .decompose import decompose_select_query
+from .ir import Program, Statement, statement_from_json
+from .parse import _normalize, parse_select_query
+
+# Bump whenever parse/decompose output changes, so stale persisted entries are ignored.
+CACHE_VERSION = 2
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    disk_hits: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"hits={self.hits} (disk={self.disk_hits}) misses={self.misses} "
+            f"evictions={self.evictions} hit_rate={self.hit_rate:.1%}"
+        )
+
+
+class _LRU:
+    def __init__(self, maxsize: int, stats: CacheStats) -> None:
+        self.maxsize = maxsize
+        self.stats = stats
+        self.data: "OrderedDict[Hashable, object]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[object]:
+        v = self.data.get(key)
+        if v is not None:
+            self.data.move_to_end(key)
+        return v
+
+    def put(self, key: Hashable, value: object) -> None:
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.stats.evictions += 1
+
+
+# (statements, lineage items, final stream) -- immutable snapshot of a Program
+_Decomp = Tuple[Tuple[Statement, ...], Tuple[Tuple[str, str], ...], str]
+
+
+class DecompositionCache:
+    def __init__(self, maxsize: int = 4096, path: str | Path | None = None, *, commit_every: int = 256) -> None:
+        self.stats = CacheStats()
+        self.parse_stats = CacheStats()
+        self._parsed = _LRU(maxsize, self.parse_stats)
+        self._decomp = _LRU(maxsize, self.stats)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending = 0
+        self._commit_every = commit_every
+        if path is not None:
+            self._db = sqlite3.connect(str(path), timeout=30.0, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS decomp ("
+                " version INTEGER, mode TEXT, query TEXT,"
+                " statements TEXT, lineage TEXT, final TEXT,"
+                " PRIMARY KEY (version, mode, query))"
+            )
+            self._db.commit()
+
+    def __enter__(self) -> "DecompositionCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def parse(self, query: str) -> SelectQuery:
+        key = _normalize(query)
+        with self._lock:
+            q = self._parsed.get(key)
+            if q is not None:
+                self.parse_stats.hits += 1
+            else:
+                self.parse_stats.misses += 1
+                with metrics.stage("parse"):
+                    q = parse_select_query(key)
+                self._parsed.put(key, q)
+        return dataclasses.replace(q, from_sources=list(q.from_sources))  # type: ignore[arg-type]
+
+    def decompose(self, query: str, *, create_window_mode: str = "paper", optimize: bool = False) -> Tuple[Program, str]:
+        """Cached `decompose_select_query(parse_select_query(query))`."""
+        norm = _normalize(query)
+        mode = create_window_mode + ("+opt" if optimize else "")  # persisted as the `mode` column
+        key = (mode, norm)
+        with self._lock:
+            entry = self._decomp.get(key)
+            if entry is not None:
+                self.stats.hits += 1
+            else:
+                entry = self._load(mode, norm)
+                if entry is not None:
+                    self.stats.hits += 1
+                    self.stats.disk_hits += 1
+                else:
+                    self.stats.misses += 1
+                    with metrics.stage("parse"):
+                        parsed = parse_select_query(norm)
+                    with metrics.stage("decompose"):
+                        prog, final = decompose_select_query(
+                            parsed, create_window_mode=create_window_mode, optimize=optimize,
+                        )
+                    entry = (tuple(prog.stmts), tuple(prog.stream_lineage.items()), final)
+                    self._store(mode, norm, entry)
+                self._decomp.put(key, entry)
+        stmts, lineage, final = entry  # type: ignore[misc]
+        prog = Program()
+        prog.stmts = list(stmts)
+        prog.stream_lineage = dict(lineage)
+        return prog, final
+
+    def _load(self, mode: str, norm: str) -> Optional[_Decomp]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT statements, lineage, final FROM decomp WHERE version=? AND mode=? AND query=?",
+            (CACHE_VERSION, mode, norm),
+        ).fetchone()
+        if row is None:
+            return None
+        lineage: Dict[str, str] = json.loads(row[1])
+        return tuple(statement_from_json(s) for s in json.loads(row[0])), tuple(lineage.items()), row[2]
+
+    def _store(self, mode: str, norm: str, entry: _Decomp) -> None:
+        if self._db is None:
+            return
+        stmts, lineage, final = entry
+        self._db.execute(
+            "INSERT OR REPLACE INTO decomp VALUES (?, ?, ?, ?, ?, ?)",
+            (CACHE_VERSION, mode, norm, json.dumps([s.as_json() for s in stmts], separators=(",", ":")), json.dumps(dict(lineage)), final),
+        )
+        self._pending += 1
+        if self._pending >= self._commit_every:
+            self._db.commit()
+            self._pending = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._db is not None and self._pending:
+                self._db.commit()
+                self._pending = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
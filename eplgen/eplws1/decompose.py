@@ -1,16 +1,18 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Optional, Tuple, Dict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 from .ast import (
     SelectQuery, OpNode, OpSelect, OpWhere, OpJoin, OpWindow, OpStream, OpPattern,
-    StreamSource, PatternSource, WindowSpec,
+    StreamSource, PatternSource, WindowSpec, NodeTable,
 )
+from .ir import CreateWindow, Filter, InsertSelect, Join, Pattern, Program, Project, StreamRef
 from .normalize import to_operator_tree
+from .optimize import optimize_tree
 
 # ---------------------------
-# Naming + program container
+# Naming
 # ---------------------------
 
 @dataclass
@@ -23,72 +25,21 @@ class NameGen:
         return f"{self.prefix}_{tag}_{self.counter}"
 
 
-@dataclass
-class Program:
-    statements: List[str]
-    # optional metadata (helps with analysis)
-    stream_lineage: Dict[str, str]  # out_stream -> description
-
-    def __init__(self) -> None:
-        self.statements = []
-        self.stream_lineage = {}
-
-    def add(self, stmt: str, out_stream: Optional[str] = None, desc: Optional[str] = None) -> None:
-        s = stmt.strip()
-        if not s.endswith(";"):
-            s += ";"
-        self.statements.append(s)
-        if out_stream and desc:
-            self.stream_lineage[out_stream] = desc
-
-
 # ----------------------------------------
-# Table 19 write-procedure as code templates
+# Table 19 write procedures: the statement types live in `ir`; a Program
+# holds them and renders EPL text only when exported.
 # ----------------------------------------
 
-def _stmt_insert_select(out_stream: str, select_body: str) -> str:
-    return f"INSERT INTO {out_stream}\n{select_body}"
-
-def _stmt_select(select_body: str) -> str:
-    return select_body
-
-def _stmt_create_window(win_name: str, win_func: str, *, mode: str = "paper") -> str:
-    # 'paper' mirrors Listing 10: CREATE WINDOW AWindow#time(20 seconds)
-    # 'esper' uses Esper-style: create window AWindow.win:time(20 sec) as SomeType
-    if mode == "paper":
-        return f"CREATE WINDOW {win_name}#{win_func}"
-    if mode == "esper":
-        return f"CREATE WINDOW {win_name}.win:{win_func} as BaseEvent"
-    raise ValueError(mode)
-
-def _stmt_insert_all(out_stream: str, in_stream: str) -> str:
-    return f"INSERT INTO {out_stream}\nSELECT *\nFROM {in_stream}"
-
-def _stmt_join(out_stream: str, left: str, right: str) -> str:
-    return f"INSERT INTO {out_stream}\nSELECT *\nFROM {left}, {right}"
-
-def _stmt_filter(out_stream: str, in_stream: str, cond: str) -> str:
-    return f"INSERT INTO {out_stream}\nSELECT *\nFROM {in_stream}\nWHERE {cond}"
-
-def _stmt_project(out_stream: str, in_stream: str, select_list: str, group_by: Optional[str] = None) -> str:
-    body = [f"SELECT {select_list}", f"FROM {in_stream}"]
-    if group_by:
-        body.append(f"GROUP BY {group_by}")
-    return _stmt_insert_select(out_stream, "\n".join(body))
-
-def _stmt_pattern(out_stream: str, select_list: str, pattern: str) -> str:
-    body = f"SELECT {select_list}\nFROM PATTERN {pattern}"
-    return _stmt_insert_select(out_stream, body)
-
 # ---------------------------
 # Algorithms 1–3 implementation
 # ---------------------------
 
-def decompose_select_query(q: SelectQuery, *, create_window_mode: str = "paper") -> Tuple[Program, str]:
+def decompose_select_query(q: SelectQuery, *, create_window_mode: str = "paper", optimize: bool = False) -> Tuple[Program, str]:
     """Return (program, final_stream_name).
 
     The returned program is an interconnected set of atomic queries equivalent to q,
-    in the sense of Algorithms 1–3 + Table 19.
+    in the sense of Algorithms 1–3 + Table 19. With `optimize`, the operator tree is
+    first rewritten by `optimize.optimize_tree` (fewer, earlier-filtering statements).
     """
     # Practical extension: rewrite HAVING into post-aggregation filter (Listing 14 style)
     # We treat HAVING only if it exists; otherwise use the query as-is.
@@ -112,85 +63,178 @@ def decompose_select_query(q: SelectQuery, *, create_window_mode: str = "paper")
             group_by=None,
             having=None,
         )
-        prog1, s1 = decompose_select_query(q1, create_window_mode=create_window_mode)
-        prog2, s2 = decompose_select_query(q2, create_window_mode=create_window_mode)
-        prog1.statements.extend(prog2.statements)
-        prog1.stream_lineage.update(prog2.stream_lineage)
+        prog1, s1 = decompose_select_query(q1, create_window_mode=create_window_mode, optimize=optimize)
+        prog2, s2 = decompose_select_query(q2, create_window_mode=create_window_mode, optimize=optimize)
+        prog1.extend(prog2)
         return prog1, s2
 
     root = to_operator_tree(q)
+    if optimize:
+        root = optimize_tree(root)
     prog = Program()
     ng = NameGen(prefix="x")
     final_stream = eExplore(root, prog, ng, create_window_mode=create_window_mode, final_insert=q.insert_into is not None, final_select=q.select)
-    # If the original query had no INSERT INTO, keep the last statement as a plain SELECT producing output.
-    # The algorithm above always uses INSERT INTO for OpSelect. Replace the last statement accordingly.
-    if q.insert_into is None:
-        # last statement must be an INSERT INTO ... SELECT ...
-        last = prog.statements[-1]
-        m = last.splitlines()
-        if m and m[0].strip().lower().startswith("insert into "):
-            prog.statements[-1] = "\n".join(m[1:]).rstrip(";") + ";"
-    else:
-        # ensure the last INSERT targets the requested output
-        # (eExplore already does that by passing final_insert, but keep as guard)
-        pass
-    return prog, final_stream
-
-def eExplore(node: OpNode, prog: Program, ng: NameGen, *, create_window_mode: str, final_insert: bool, final_select: str) -> str:
+    # If the original query had no INSERT INTO, the last statement is a plain SELECT producing output.
+    # The algorithm above always uses INSERT INTO for OpSelect, so drop the target of the last statement.
+    last = prog.stmts[-1] if prog.stmts else None
+    if q.insert_into is None and last is not None and last.kind == "DML" and last.out is not None:
+        prog.stmts[-1] = last.into(None)
+    return prog, str(final_stream)
+
+def eExplore(node: OpNode, prog: Program, ng: NameGen, *, create_window_mode: str, final_insert: bool, final_select: str) -> StreamRef:
     # Algorithm 1: Expression Translation
     if isinstance(node, OpSelect):
         x = eExplore(node.child, prog, ng, create_window_mode=create_window_mode, final_insert=True, final_select=node.select)
         # projection/aggregation atomic query
         out = ng.new("proj")
-        stmt = _stmt_project(out, x, node.select, node.group_by)
-        prog.add(stmt, out_stream=out, desc=f"PROJ({node.select}) from {x}")
-        return out
+        desc = f"PROJ({node.select}) from {x}" if node.where is None else f"PROJ({node.select}) FILTER({node.where}) from {x}"
+        prog.add(Project(out, x, node.select, node.group_by, node.where), desc=desc)
+        return StreamRef(out)
     if isinstance(node, OpWhere):
         x = wExplore(node.child, prog, ng, create_window_mode=create_window_mode)
         out = ng.new("filter")
-        stmt = _stmt_filter(out, x, node.cond)
-        prog.add(stmt, out_stream=out, desc=f"FILTER({node.cond}) from {x}")
-        return out
+        prog.add(Filter(out, x, node.cond), desc=f"FILTER({node.cond}) from {x}")
+        return StreamRef(out)
     # else: pass-through to window exploration
     x = wExplore(node, prog, ng, create_window_mode=create_window_mode)
     return x
 
-def wExplore(node: OpNode, prog: Program, ng: NameGen, *, create_window_mode: str) -> str:
+def wExplore(node: OpNode, prog: Program, ng: NameGen, *, create_window_mode: str) -> StreamRef:
     # Algorithm 2: Windowing Translation
     if isinstance(node, OpJoin):
         x = wExplore(node.left, prog, ng, create_window_mode=create_window_mode)
         y = wExplore(node.right, prog, ng, create_window_mode=create_window_mode)
         out = ng.new("join")
-        stmt = _stmt_join(out, x, y)
-        prog.add(stmt, out_stream=out, desc=f"JOIN({x},{y})")
-        return out
+        prog.add(Join(out, x, y), desc=f"JOIN({x},{y})")
+        return StreamRef(out)
     if isinstance(node, OpWindow):
         x = pExplore(node.child, prog, ng, create_window_mode=create_window_mode)
         # window materialization via named window
         win_name = ng.new("win")
-        prog.add(_stmt_create_window(win_name, node.window.func, mode=create_window_mode), out_stream=win_name, desc=f"WINDOW({node.window.func})")
-        prog.add(_stmt_insert_all(win_name, x))
-        return win_name
+        prog.add(CreateWindow(win_name, node.window.func, create_window_mode), desc=f"WINDOW({node.window.func})")
+        prog.add(InsertSelect(win_name, x))
+        return StreamRef(win_name)
     # fallback: pattern / stream
     x = pExplore(node, prog, ng, create_window_mode=create_window_mode)
     return x
 
-def pExplore(node: OpNode, prog: Program, ng: NameGen, *, create_window_mode: str) -> str:
+def pExplore(node: OpNode, prog: Program, ng: NameGen, *, create_window_mode: str) -> StreamRef:
     # Algorithm 3: Pattern Translation
     if isinstance(node, OpStream):
         # inline stream filters R(cond) are kept as part of the source name in EPL,
         # but decomposition treats them as part of the source operator.
-        # We return the printed source string to let upper layers use it in FROM.
-        src = node.src.name
-        if node.src.filter_cond:
-            src += f"({node.src.filter_cond})"
-        return src
+        # We return the source (with its filter) to let upper layers use it in FROM.
+        return StreamRef(node.src.name, node.src.filter_cond or None)
     if isinstance(node, OpPattern):
         out = ng.new("pattern")
-        stmt = _stmt_pattern(out, "*", node.src.pattern)
-        prog.add(stmt, out_stream=out, desc=f"PATTERN({node.src.pattern})")
-        return out
+        prog.add(Pattern(out, "*", node.src.pattern), desc=f"PATTERN({node.src.pattern})")
+        return StreamRef(out)
     # In case a window wraps a stream, wExplore passes the child here.
     if isinstance(node, OpWindow):
         return pExplore(node.child, prog, ng, create_window_mode=create_window_mode)
     raise TypeError(f"Unsupported node in pExplore: {type(node)}")
+
+# ---------------------------------------
+# Workload-level (shared) decomposition
+# ---------------------------------------
+
+class SharedDecomposer:
+    """Decompose many queries into one network of atomic queries.
+
+    Operator sub-trees are hash-consed: a (stream, filter, window, pattern, join,
+    WHERE, SELECT) sub-plan that occurs in several queries is emitted once, and
+    every query that needs it reads the same stream (fan-out). `query_streams[i]`
+    is the final stream of the i-th added query. Trees are built through one
+    `NodeTable`, so memo lookups compare sub-plans by identity.
+    """
+
+    def __init__(self, *, create_window_mode: str = "paper", optimize: bool = False, prefix: str = "x") -> None:
+        self.create_window_mode = create_window_mode
+        self.optimize = optimize
+        self.prog = Program()
+        self.ng = NameGen(prefix=prefix)
+        self.query_streams: List[str] = []
+        self.table = NodeTable()
+        # sub-plan -> (stream, statements in the whole sub-plan)
+        self._memo: Dict[object, Tuple[str, int]] = {}
+        self.unshared_statements = 0  # what per-query decomposition would have emitted
+
+    def add(self, q: SelectQuery) -> str:
+        out, n = self._query(q)
+        self.unshared_statements += n
+        self.query_streams.append(str(out))
+        return str(out)
+
+    def _query(self, q: SelectQuery) -> Tuple[StreamRef, int]:
+        if q.having:
+            # aggregate, then filter the aggregate stream (as decompose_select_query)
+            s1, n1 = self._query(SelectQuery(select=q.select, from_sources=q.from_sources, where=q.where, group_by=q.group_by))
+            s2, n2 = self._query(SelectQuery(select="*", from_sources=[StreamSource(name=str(s1))], where=q.having))
+            out, n = s2, n1 + n2
+        else:
+            root = to_operator_tree(q, table=self.table)
+            out, n = self._node(self.table.node(optimize_tree(root)) if self.optimize else root)
+        if q.insert_into:
+            # keep the requested output stream name; its producer stays shared. Not
+            # counted in `n`: per-query decomposition writes the final statement into it.
+            into, src = q.insert_into, out
+            out, _ = self._emit(("into", into, src), lambda: self._insert_into(into, src))
+        return out, n
+
+    def _insert_into(self, name: str, src: StreamRef) -> Tuple[StreamRef, int]:
+        self.prog.add(InsertSelect(name, src), desc=f"INTO({name}) from {src}")
+        return StreamRef(name), 1
+
+    def _emit(self, key: object, build: Callable[[], Tuple[StreamRef, int]]) -> Tuple[StreamRef, int]:
+        hit = self._memo.get(key)
+        if hit is None:
+            hit = self._memo[key] = build()
+        return hit
+
+    def _node(self, node: OpNode) -> Tuple[StreamRef, int]:
+        if isinstance(node, OpStream):
+            return StreamRef(node.src.name, node.src.filter_cond or None), 0
+        return self._emit(node, lambda: self._build(node))
+
+    def _build(self, node: OpNode) -> Tuple[StreamRef, int]:
+        # Algorithms 1-3 (eExplore/wExplore/pExplore), one operator at a time;
+        # returns (stream, statements in the whole sub-plan)
+        prog, ng = self.prog, self.ng
+        if isinstance(node, OpSelect):
+            x, n = self._node(node.child)
+            out = ng.new("proj")
+            desc = f"PROJ({node.select}) from {x}" if node.where is None else f"PROJ({node.select}) FILTER({node.where}) from {x}"
+            prog.add(Project(out, x, node.select, node.group_by, node.where), desc=desc)
+            return StreamRef(out), n + 1
+        if isinstance(node, OpWhere):
+            x, n = self._node(node.child)
+            out = ng.new("filter")
+            prog.add(Filter(out, x, node.cond), desc=f"FILTER({node.cond}) from {x}")
+            return StreamRef(out), n + 1
+        if isinstance(node, OpJoin):
+            x, nx = self._node(node.left)
+            y, ny = self._node(node.right)
+            out = ng.new("join")
+            prog.add(Join(out, x, y), desc=f"JOIN({x},{y})")
+            return StreamRef(out), nx + ny + 1
+        if isinstance(node, OpWindow):
+            x, n = self._node(node.child)
+            out = ng.new("win")
+            prog.add(CreateWindow(out, node.window.func, self.create_window_mode), desc=f"WINDOW({node.window.func})")
+            prog.add(InsertSelect(out, x))
+            return StreamRef(out), n + 2
+        if isinstance(node, OpPattern):
+            out = ng.new("pattern")
+            prog.add(Pattern(out, "*", node.src.pattern), desc=f"PATTERN({node.src.pattern})")
+            return StreamRef(out), 1
+        raise TypeError(f"Unsupported node: {type(node)}")
+
+
+def decompose_workload(
+    queries: Iterable[SelectQuery], *, create_window_mode: str = "paper", optimize: bool = False,
+) -> Tuple[Program, List[str]]:
+    """Return (shared program, final stream of each query, in input order)."""
+    sd = SharedDecomposer(create_window_mode=create_window_mode, optimize=optimize)
+    for q in queries:
+        sd.add(q)
+    return sd.prog, sd.query_streams
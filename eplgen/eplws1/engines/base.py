@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 from typing import Dict, List, Protocol
 
@@ -9,3 +10,18 @@ class Engine(Protocol):
     def run(self, statements: List[str], events: Dict[str, List[Event]]) -> List[Event]:
         """Execute EPL statements against provided event streams; return output of the final statement."""
         ...
+
+
+class AsyncEngine(Protocol):
+    async def run(self, statements: List[str], events: Dict[str, List[Event]]) -> List[Event]:
+        """Coroutine variant of `Engine.run`."""
+        ...
+
+
+@dataclass
+class ThreadedEngine:
+    """`AsyncEngine` over a synchronous `Engine`: each run goes to a worker thread."""
+    engine: Engine
+
+    async def run(self, statements: List[str], events: Dict[str, List[Event]]) -> List[Event]:
+        return await asyncio.to_thread(self.engine.run, statements, events)
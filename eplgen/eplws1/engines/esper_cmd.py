@@ -1,41 +1,385 @@
 from __future__ import annotations
 
+import asyncio
+import collections
+import itertools
 import json
+import queue
 import subprocess
-from dataclasses import dataclass
-from typing import Dict, List
+import threading
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple, Union
 
 from .base import Engine, Event
+from .events_file import EventSpill, EventsFile
+
+Events = Union[Dict[str, List[Event]], EventsFile]
+
+_spill_lock = threading.Lock()
+
+
+class _EventsPayload:
+    """How the runner adapters put events into a request.
+
+    `events_via="inline"` embeds in-memory events as JSON (`"events"`);
+    `events_via="file"` spills them once to a temporary `spill_format` dataset and
+    sends `"events_file": {path, format, digest}` instead. An `EventsFile` is
+    always sent by reference. A spilled file is held until `_release_events`,
+    so concurrent runs cannot delete each other's datasets.
+    Events a dataset cannot hold unchanged are sent inline.
+    """
+    events_via: str
+    spill_format: str
+    _spill: Optional[EventSpill]
+
+    def _spill_keep(self) -> int:
+        return 8
+
+    def _spiller(self) -> EventSpill:
+        with _spill_lock:
+            if self._spill is None:
+                self._spill = EventSpill(self.spill_format, keep=self._spill_keep())
+            return self._spill
+
+    def _events_fields(self, events: Events) -> Tuple[dict, Optional[EventsFile]]:
+        """(request fields, spilled file to pass to `_release_events` after the run)."""
+        if isinstance(events, EventsFile):
+            return {"events_file": events.as_json()}, None
+        if self.events_via == "inline":
+            return {"events": events}, None
+        if self.events_via != "file":
+            raise ValueError(f"unknown events_via: {self.events_via}")
+        ref = self._spiller().acquire(events)
+        if ref is None:  # not representable as a dataset (see events_file.spill_columns)
+            return {"events": events}, None
+        return {"events_file": ref.as_json()}, ref
+
+    def _release_events(self, ref: Optional[EventsFile]) -> None:
+        spill = self._spill
+        if ref is not None and spill is not None:
+            spill.release(ref)
+
+    def cache_key(self) -> dict:
+        # outputs depend on the runner only, not on how requests are transported
+        return {"cmd": list(self.cmd)}  # type: ignore[attr-defined]
+
+    def _close_spill(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
 
 @dataclass
-class EsperCmdEngine:
+class EsperCmdEngine(_EventsPayload):
     """Adapter that calls an external Esper runner command.
 
     The command must:
     - read a single JSON object from stdin with fields:
         { "statements": [..], "events": { streamName: [ {..event..}, ... ], ... } }
+      or, instead of "events", a dataset to read from disk (see `events_file`):
+        { "statements": [..], "events_file": { "path": "..", "format": "csv"|"evb", "digest": ".." } }
     - write a single JSON object to stdout:
         { "output": [ {..event..}, ... ] }
 
     This keeps Python independent of Esper version and runtime details.
     """
     cmd: List[str]
+    events_via: str = "inline"            # or "file" (see _EventsPayload)
+    spill_format: str = "csv"
+
+    _spill: Optional[EventSpill] = field(init=False, repr=False, default=None)
+
+    def run(self, statements: List[str], events: Events) -> List[Event]:
+        fields, held = self._events_fields(events)
+        try:
+            p = subprocess.run(
+                self.cmd,
+                input=json.dumps({"statements": statements, **fields}).encode("utf-8"),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=False,
+            )
+        finally:
+            self._release_events(held)
+        if p.returncode != 0:
+            raise RuntimeError(
+                "Esper runner failed\n"
+                f"cmd={self.cmd}\n"
+                f"rc={p.returncode}\n"
+                f"stderr=\n{p.stderr.decode('utf-8', errors='replace')}"
+            )
+        out = json.loads(p.stdout.decode("utf-8"))
+        return out.get("output", [])
+
+    def close(self) -> None:
+        self._close_spill()
+
 
-    def run(self, statements: List[str], events: Dict[str, List[Event]]) -> List[Event]:
-        payload = {"statements": statements, "events": events}
-        p = subprocess.run(
-            self.cmd,
-            input=json.dumps(payload).encode("utf-8"),
+# ---------------------------
+# Persistent runner mode
+# ---------------------------
+
+class RunnerCrashed(RuntimeError):
+    """The runner process exited or stopped answering."""
+
+
+class _RunnerProcess:
+    """One long-lived runner speaking newline-framed JSON on stdin/stdout."""
+
+    def __init__(self, cmd: List[str], stderr_lines: int = 200) -> None:
+        self.cmd = cmd
+        self.proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            check=False,
         )
+        self._lines: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._stderr: Deque[str] = collections.deque(maxlen=stderr_lines)
+        self._ids = itertools.count(1)
+        threading.Thread(target=self._pump_stdout, daemon=True).start()
+        threading.Thread(target=self._pump_stderr, daemon=True).start()
+
+    def _pump_stdout(self) -> None:
+        assert self.proc.stdout is not None
+        for line in self.proc.stdout:
+            self._lines.put(line)
+        self._lines.put(None)  # EOF
+
+    def _pump_stderr(self) -> None:
+        assert self.proc.stderr is not None
+        for line in self.proc.stderr:
+            self._stderr.append(line.decode("utf-8", errors="replace"))
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def stderr_tail(self) -> str:
+        return "".join(self._stderr)
+
+    def request(self, obj: dict, timeout: Optional[float] = None) -> dict:
+        rid = next(self._ids)
+        msg = dict(obj, id=rid)
+        try:
+            assert self.proc.stdin is not None
+            self.proc.stdin.write(json.dumps(msg).encode("utf-8") + b"\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise RunnerCrashed(f"write failed: {e}") from e
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                raise RunnerCrashed(f"no response within {timeout}s") from None
+            if line is None:
+                raise RunnerCrashed(f"runner exited (rc={self.proc.poll()})")
+            if not line.strip():
+                continue
+            resp = json.loads(line.decode("utf-8"))
+            # stale answers (e.g. to a request that timed out) are dropped
+            if resp.get("id") == rid:
+                return resp
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self.alive():
+            try:
+                self.request({"op": "shutdown"}, timeout=timeout)
+            except RunnerCrashed:
+                pass
+            try:
+                self.proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        for s in (self.proc.stdin, self.proc.stdout, self.proc.stderr):
+            if s is not None:
+                try:
+                    s.close()
+                except OSError:
+                    pass
+
+
+@dataclass
+class EsperServerEngine(_EventsPayload):
+    """Adapter that keeps a pool of long-lived Esper runner processes.
+
+    Avoids one JVM start per `run`. Each runner reads one JSON request per line
+    on stdin and writes one JSON response per line on stdout:
+
+        {"id": 1, "op": "run", "statements": [..], "events": {..}}
+            -> {"id": 1, "output": [..]}   or   {"id": 1, "error": "..."}
+        {"id": 2, "op": "ping"}      -> {"id": 2, "ok": true}
+        {"id": 3, "op": "shutdown"}  -> {"id": 3, "ok": true}, then exit
+
+    A `run` request deploys the statements, replays the events, collects the
+    output of the final statement and undeploys everything, so no state leaks
+    between requests. Runners that crash or time out are restarted; the request
+    is retried up to `max_restarts` times.
+
+    `python -m eplws1.engines.py_runner --serve` is a pure-Python stand-in.
+    """
+    cmd: List[str]
+    pool_size: int = 1
+    timeout: Optional[float] = None
+    max_restarts: int = 1
+    events_via: str = "inline"            # or "file" (see _EventsPayload)
+    spill_format: str = "csv"
+
+    _spill: Optional[EventSpill] = field(init=False, repr=False, default=None)
+    _idle: "queue.LifoQueue[Optional[_RunnerProcess]]" = field(init=False, repr=False)
+    _all: List[_RunnerProcess] = field(init=False, repr=False, default_factory=list)
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+    restarts: int = field(init=False, default=0)
+
+    def __post_init__(self) -> None:
+        if self.pool_size < 1:
+            raise ValueError("pool_size must be >= 1")
+        self._idle = queue.LifoQueue()
+        for _ in range(self.pool_size):
+            self._idle.put(None)  # started lazily
+
+    def __enter__(self) -> "EsperServerEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _spawn(self) -> _RunnerProcess:
+        r = _RunnerProcess(self.cmd)
+        with self._lock:
+            self._all.append(r)
+        return r
+
+    def _discard(self, r: _RunnerProcess) -> None:
+        with self._lock:
+            if r in self._all:
+                self._all.remove(r)
+        try:
+            r.proc.kill()
+        except OSError:
+            pass
+        r.close(timeout=1.0)
+
+    def _request(self, obj: dict) -> dict:
+        r = self._idle.get()
+        try:
+            attempt = 0
+            while True:
+                if r is None or not r.alive():
+                    if r is not None:
+                        self._discard(r)
+                        self.restarts += 1
+                    r = self._spawn()
+                try:
+                    return r.request(obj, timeout=self.timeout)
+                except RunnerCrashed as e:
+                    tail = r.stderr_tail()
+                    self._discard(r)
+                    r = None
+                    attempt += 1
+                    if attempt > self.max_restarts:
+                        raise RuntimeError(
+                            "Esper runner failed\n"
+                            f"cmd={self.cmd}\n"
+                            f"reason={e}\n"
+                            f"stderr=\n{tail}"
+                        ) from e
+                    self.restarts += 1
+        finally:
+            self._idle.put(r)
+
+    def _spill_keep(self) -> int:
+        return max(8, self.pool_size)
+
+    def run(self, statements: List[str], events: Events) -> List[Event]:
+        fields, held = self._events_fields(events)
+        try:
+            resp = self._request({"op": "run", "statements": statements, **fields})
+        finally:
+            self._release_events(held)
+        if "error" in resp:
+            raise RuntimeError(f"Esper runner failed\ncmd={self.cmd}\nerror=\n{resp['error']}")
+        return resp.get("output", [])
+
+    def ping(self) -> bool:
+        """Health-check one runner (starting or restarting it if needed)."""
+        try:
+            return bool(self._request({"op": "ping"}).get("ok"))
+        except RuntimeError:
+            return False
+
+    def close(self) -> None:
+        with self._lock:
+            procs, self._all = self._all, []
+        for r in procs:
+            r.close()
+        self._close_spill()
+
+
+# ---------------------------
+# Asyncio mode
+# ---------------------------
+
+@dataclass
+class AsyncEsperCmdEngine(_EventsPayload):
+    """`AsyncEngine` speaking the `EsperCmdEngine` contract (one process per run).
+
+    Runs are started with `asyncio.create_subprocess_exec`; at most `concurrency`
+    runner processes exist at a time, further runs wait for a slot. A run taking
+    longer than `timeout` seconds has its process killed and raises
+    `asyncio.TimeoutError`.
+    """
+    cmd: List[str]
+    concurrency: int = 4
+    timeout: Optional[float] = None
+    events_via: str = "inline"            # or "file" (see _EventsPayload)
+    spill_format: str = "csv"
+
+    _spill: Optional[EventSpill] = field(init=False, repr=False, default=None)
+    _slots: asyncio.Semaphore = field(init=False, repr=False)
+    started: int = field(init=False, default=0)
+
+    def __post_init__(self) -> None:
+        if self.concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self._slots = asyncio.Semaphore(self.concurrency)
+
+    def _spill_keep(self) -> int:
+        return max(8, self.concurrency)
+
+    async def run(self, statements: List[str], events: Events) -> List[Event]:
+        async with self._slots:  # spill inside the slot: at most `concurrency` files are held
+            if isinstance(events, dict) and self.events_via == "file":
+                fields, held = await asyncio.to_thread(self._events_fields, events)
+            else:
+                fields, held = self._events_fields(events)
+            try:
+                payload = json.dumps({"statements": statements, **fields}).encode("utf-8")
+                p = await asyncio.create_subprocess_exec(
+                    *self.cmd,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                self.started += 1
+                try:
+                    stdout, stderr = await asyncio.wait_for(p.communicate(payload), self.timeout)
+                except BaseException:  # timeout or cancellation: do not leave the runner behind
+                    if p.returncode is None:
+                        p.kill()
+                        await p.wait()
+                    raise
+            finally:
+                self._release_events(held)
         if p.returncode != 0:
             raise RuntimeError(
                 "Esper runner failed\n"
                 f"cmd={self.cmd}\n"
                 f"rc={p.returncode}\n"
-                f"stderr=\n{p.stderr.decode('utf-8', errors='replace')}"
+                f"stderr=\n{stderr.decode('utf-8', errors='replace')}"
             )
-        out = json.loads(p.stdout.decode("utf-8"))
+        out = json.loads(stdout.decode("utf-8"))
         return out.get("output", [])
+
+    def close(self) -> None:
+        self._close_spill()
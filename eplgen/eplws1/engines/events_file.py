@@ -0,0 +1,223 @@
+"""Event datasets passed to engines by file reference instead of inline JSON.
+
+An `EventsFile` names an exported case dataset (`<case>.csv` from
+`write_case_csv` or `<case>.evb` from `write_case_bin`) together with a digest
+of its bytes. Engines that accept one (the runner adapters in `esper_cmd`, the
+reference engine, `CachedEngine`) hand the path to the runner, which reads the
+file itself, instead of JSON-encoding every event into the request:
+
+    {"statements": [..], "events_file": {"path": "/abs/Q0001.csv", "format": "csv", "digest": "..."}}
+
+`EventSpill` turns in-memory events into such a reference by writing them once
+to a temporary file; passing the same dict again (e.g. for the decomposed
+program of a case) reuses the file. A run holds its file with `acquire` /
+`release`, so a file is never deleted while a runner may still read it. Events
+a dataset cannot hold as they are (see `spill_columns`) are not spilled; the
+adapters then send them inline.
+"""
+from __future__ import annotations
+
+import collections
+import csv
+import hashlib
+import shutil
+import tempfile
+import threading
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+from .base import Event
+
+FORMATS = {".csv": "csv", ".evb": "evb"}
+
+
+@dataclass(frozen=True)
+class EventsFile:
+    path: str
+    format: str   # "csv" or "evb"
+    digest: str   # blake2b-128 of the file bytes
+
+    @classmethod
+    def from_path(cls, path: str | Path, *, digest: Optional[str] = None) -> "EventsFile":
+        p = Path(path).resolve()
+        fmt = FORMATS.get(p.suffix)
+        if fmt is None:
+            raise ValueError(f"{path}: expected a .csv or .evb dataset")
+        return cls(str(p), fmt, digest or file_digest(p))
+
+    def as_json(self) -> dict:
+        return {"path": self.path, "format": self.format, "digest": self.digest}
+
+    @classmethod
+    def from_json(cls, obj: Mapping[str, str]) -> "EventsFile":
+        return cls(obj["path"], obj.get("format") or FORMATS.get(Path(obj["path"]).suffix, "csv"), obj.get("digest", ""))
+
+
+def file_digest(path: str | Path, chunk: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_case_csv(path: str | Path, *, column_types: Optional[Mapping[str, str]] = None) -> Dict[str, List[Event]]:
+    """Engine input shape from a `<case>.csv`, values typed as in `event_binary.COLUMN_TYPES`."""
+    from ..event_binary import COLUMN_TYPES
+    types = column_types or COLUMN_TYPES
+    conv = {"i8": int, "f8": float}
+    out: Dict[str, List[Event]] = {}
+    with Path(path).open("r", newline="", encoding="utf-8") as f:
+        rows = csv.reader(f)
+        header = next(rows, None)
+        if header is None:
+            return out
+        i_type = header.index("EventType")
+        cols: List[Tuple[int, str, object]] = [
+            (i, "ts" if c == "Timestamp" else c, conv.get(types.get(c, "str")))
+            for i, c in enumerate(header) if i != i_type
+        ]
+        for row in rows:
+            ev: Event = {}
+            for i, name, fn in cols:
+                v = row[i]
+                ev[name] = fn(v) if fn is not None and v != "" else v  # type: ignore[operator]
+            out.setdefault(row[i_type], []).append(ev)
+    return out
+
+
+def load_events(ref: EventsFile) -> Dict[str, List[Event]]:
+    if ref.format == "evb":
+        from ..event_binary import read_case_bin
+        return read_case_bin(ref.path)
+    return read_case_csv(ref.path)
+
+
+def resolve_events(events: "Dict[str, List[Event]] | EventsFile") -> Dict[str, List[Event]]:
+    return load_events(events) if isinstance(events, EventsFile) else events
+
+
+_CELL_TYPES = {"i8": (int,), "f8": (float,), "str": (str,)}
+
+
+def spill_columns(events: Dict[str, List[Event]]) -> Optional[List[str]]:
+    """Dataset columns holding `events` so that they read back unchanged, or None.
+
+    Every event must have the same fields, an int `ts` and values of its column's
+    `event_binary.COLUMN_TYPES` type (str for other columns): a cell has no room
+    for None, booleans or nested values, and a missing field would read back as "".
+    """
+    from ..event_binary import COLUMN_TYPES
+    from ..export_data import DEFAULT_COLUMNS
+    keys: Optional[frozenset] = None
+    for evs in events.values():
+        for ev in evs:
+            if keys is None:
+                keys = frozenset(ev)
+                if "ts" not in keys or keys & {"EventType", "Timestamp"}:
+                    return None
+                types = {k: _CELL_TYPES[COLUMN_TYPES.get("Timestamp" if k == "ts" else k, "str")] for k in keys}
+            elif ev.keys() != keys:
+                return None
+            for k, v in ev.items():
+                if type(v) not in types[k]:
+                    return None
+    if keys is None:
+        return list(DEFAULT_COLUMNS)
+    known = [c for c in DEFAULT_COLUMNS[2:] if c in keys]
+    return DEFAULT_COLUMNS[:2] + known + sorted(keys - set(known) - {"ts"})
+
+
+class EventSpill:
+    """Writes in-memory event dicts to temporary dataset files, one file per dict.
+
+    The `keep` most recently spilled files are kept (and reused when the same
+    dict object is spilled again); older ones are deleted, but a file taken with
+    `acquire` only once its last `release`. Everything is removed by `close()` or
+    when the spill is garbage-collected. `spill`/`acquire` return None for events
+    without lossless `spill_columns`.
+    """
+
+    def __init__(self, format: str = "csv", directory: Optional[str] = None, keep: int = 8) -> None:
+        if format not in ("csv", "evb"):
+            raise ValueError(f"unknown spill format: {format}")
+        self.format = format
+        self.keep = keep
+        self._parent = directory
+        self._dir: Optional[Path] = None
+        self._files: "collections.OrderedDict[int, Tuple[object, EventsFile]]" = collections.OrderedDict()
+        self._pins: Dict[str, int] = {}  # path -> runs holding it
+        self._evicted: Set[str] = set()  # pinned paths to delete on their last release
+        self._lock = threading.Lock()
+        self._n = 0
+        self.spilled = 0
+
+    def spill(self, events: Dict[str, List[Event]]) -> Optional[EventsFile]:
+        return self._spill(events, pin=False)
+
+    def acquire(self, events: Dict[str, List[Event]]) -> Optional[EventsFile]:
+        """Like `spill`, but the file stays on disk until the matching `release`."""
+        return self._spill(events, pin=True)
+
+    def release(self, ref: EventsFile) -> None:
+        with self._lock:
+            n = self._pins.pop(ref.path, 0) - 1
+            if n > 0:
+                self._pins[ref.path] = n
+            elif ref.path in self._evicted:
+                self._evicted.discard(ref.path)
+                Path(ref.path).unlink(missing_ok=True)
+
+    def _spill(self, events: Dict[str, List[Event]], pin: bool) -> Optional[EventsFile]:
+        with self._lock:
+            hit = self._files.get(id(events))
+            if hit is not None and hit[0] is events:
+                self._files.move_to_end(id(events))
+                if pin:
+                    self._pins[hit[1].path] = self._pins.get(hit[1].path, 0) + 1
+                return hit[1]
+        columns = spill_columns(events)
+        if columns is None:
+            return None
+        with self._lock:
+            if self._dir is None:
+                self._dir = Path(tempfile.mkdtemp(prefix="eplws1_events_", dir=self._parent))
+                self._finalizer = weakref.finalize(self, shutil.rmtree, str(self._dir), True)
+            self._n += 1
+            path = self._dir / f"events{self._n}.{self.format}"
+        if self.format == "evb":
+            from ..event_binary import write_case_bin
+            write_case_bin(path, events, columns=columns)
+        else:
+            from ..export_data import write_case_csv
+            write_case_csv(path, events, columns=columns)
+        ref = EventsFile.from_path(path)
+        with self._lock:
+            self.spilled += 1
+            if pin:
+                self._pins[ref.path] = 1
+            prev = self._files.pop(id(events), None)  # spilled concurrently by another run
+            if prev is not None:
+                self._evict(prev[1])
+            self._files[id(events)] = (events, ref)  # holding `events` keeps its id from being reused
+            while len(self._files) > self.keep:
+                _, (_, old) = self._files.popitem(last=False)
+                self._evict(old)
+        return ref
+
+    def _evict(self, ref: EventsFile) -> None:
+        if ref.path in self._pins:
+            self._evicted.add(ref.path)
+        else:
+            Path(ref.path).unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._files.clear()
+            self._pins.clear()
+            self._evicted.clear()
+            if self._dir is not None:
+                self._finalizer()
+                self._dir = None
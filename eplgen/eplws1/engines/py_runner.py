@@ -0,0 +1,99 @@
+"""Pure-Python stand-in for the Esper runner command.
+
+One-shot mode (the `EsperCmdEngine` contract):
+    python -m eplws1.engines.py_runner < request.json
+
+Persistent mode (the `EsperServerEngine` contract, one JSON object per line):
+    python -m eplws1.engines.py_runner --serve
+
+The statements are executed by any `Engine` importable as `module:attr`
+(default: the pure-Python reference engine), which makes the runner usable in tests without a JVM.
+Requests may carry `events_file` (see `events_file.EventsFile`) instead of inline
+`events`. The dataset is not streamed: `load_events` reads the whole file into
+memory, since the engine replays all streams in timestamp order. The last dataset
+read is kept, keyed by its digest, so the original and decomposed runs of a case
+read the file once.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import sys
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .base import Engine, Event
+from .events_file import EventsFile, load_events
+
+DEFAULT_ENGINE = "eplws1.engines.reference:ReferenceEngine"
+
+
+def load_engine(spec: str) -> Engine:
+    mod_name, _, attr = spec.partition(":")
+    factory: Callable[[], Engine] = getattr(importlib.import_module(mod_name), attr)
+    return factory()
+
+
+_loaded: Optional[Tuple[str, str, Dict[str, List[Event]]]] = None  # (path, digest, events)
+
+
+def request_events(req: dict) -> Dict[str, List[Event]]:
+    """The request's events: inline, or an `events_file` loaded whole (or the cached last one)."""
+    global _loaded
+    if "events_file" not in req:
+        return req.get("events", {})
+    ref = EventsFile.from_json(req["events_file"])
+    if ref.digest and _loaded is not None and _loaded[:2] == (ref.path, ref.digest):
+        return _loaded[2]
+    events = load_events(ref)
+    _loaded = (ref.path, ref.digest, events)
+    return events
+
+
+def handle(engine: Engine, req: dict) -> dict:
+    op = req.get("op", "run")
+    resp: dict = {"id": req.get("id")}
+    if op in ("ping", "shutdown"):
+        resp["ok"] = True
+        return resp
+    if op != "run":
+        resp["error"] = f"unknown op: {op}"
+        return resp
+    try:
+        resp["output"] = engine.run(req["statements"], request_events(req))
+    except Exception:
+        resp["error"] = traceback.format_exc()
+    return resp
+
+
+def serve(engine: Engine, fin=sys.stdin, fout=sys.stdout) -> None:
+    for line in fin:
+        if not line.strip():
+            continue
+        req = json.loads(line)
+        fout.write(json.dumps(handle(engine, req), default=str) + "\n")
+        fout.flush()
+        if req.get("op") == "shutdown":
+            return
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(prog="eplws1.engines.py_runner")
+    p.add_argument("--serve", action="store_true", help="Persistent newline-framed JSON mode.")
+    p.add_argument("--engine", type=str, default=DEFAULT_ENGINE, help="Engine factory as module:attr")
+    args = p.parse_args(argv)
+
+    engine = load_engine(args.engine)
+    if args.serve:
+        serve(engine)
+        return
+    resp = handle(engine, json.load(sys.stdin))
+    if "error" in resp:
+        sys.stderr.write(resp["error"])
+        sys.exit(1)
+    json.dump({"output": resp["output"]}, sys.stdout, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,569 @@
+"""Pure-Python reference engine for the EPL fragment covered by `parse.py`.
+
+Executes a list of statements event-at-a-time over `Dict[str, List[Event]]` inputs:
+- SELECT ... FROM ... [WHERE ...] [GROUP BY ...] [HAVING ...], optionally INSERT INTO;
+- stream filters `R(cond)`, inline `#time(..)` / `#length(..)` windows, comma joins;
+- PATTERN [...] with `EVERY`, `->`, tagged atoms `x=R` and atom filters `R(cond)`;
+- CREATE WINDOW in both decomposition modes ("paper": `W#time(..)`,
+  "esper": `W.win:time(..) as T`); CREATE SCHEMA is accepted and ignored.
+
+Semantics follow Esper's defaults closely enough to serve as a baseline:
+- input events are replayed in (ts, stream name) order; `ts` is in engine time
+  units (milliseconds by default, like `Running.java`'s `advanceTime`);
+- the clock advances before each event, expiring time windows in expiry order;
+- only the insert stream is emitted, except that aggregating statements also emit
+  their updated aggregate when events leave a window;
+- INSERT INTO output is dispatched to consumers before the next input event;
+- a stream without a data window retains nothing, so in a join it only contributes
+  the triggering event;
+- join rows are flat merges of the joined events (first source wins on clashes),
+  so a qualified name `S.f` resolves to `f` unless `S` is a nested event (pattern tag).
+
+Returns the output of the final (non-DDL) statement.
+"""
+from __future__ import annotations
+
+import collections
+import heapq
+import itertools
+import re
+from dataclasses import dataclass
+from typing import Callable, ClassVar, Deque, Dict, List, Optional, Sequence, Tuple
+
+from ..ast import PatternSource, SelectQuery, WindowSpec
+from ..expr import Expr, compile_expr
+from ..parse import _split_top_level, parse_select_query
+from .base import Event
+from .events_file import EventsFile, resolve_events
+
+# ---------------------------
+# Aggregates (expressions are compiled by `expr.compile_expr`)
+# ---------------------------
+
+class _Agg:
+    __slots__ = ("func", "n", "total", "values")
+
+    def __init__(self, func: str) -> None:
+        self.func = func
+        self.n = 0
+        self.total = 0.0
+        self.values: Optional[collections.Counter] = collections.Counter() if func in ("min", "max") else None
+
+    def update(self, v: object, sign: int) -> None:
+        if v is None:
+            return
+        self.n += sign
+        if self.values is not None:
+            self.values[v] += sign
+            if self.values[v] <= 0:
+                del self.values[v]
+        elif self.func in ("avg", "sum"):
+            self.total += sign * v  # type: ignore[operator]
+
+    def value(self) -> object:
+        if self.func == "count":
+            return self.n
+        if self.n == 0:
+            return None
+        if self.func == "sum":
+            return self.total
+        if self.func == "avg":
+            return self.total / self.n
+        return max(self.values) if self.func == "max" else min(self.values)  # type: ignore[arg-type]
+
+
+# ---------------------------
+# Windows
+# ---------------------------
+
+_TIME_UNITS_MS = {
+    "msec": 1, "millisecond": 1, "milliseconds": 1,
+    "sec": 1000, "second": 1000, "seconds": 1000,
+    "min": 60_000, "minute": 60_000, "minutes": 60_000,
+    "hour": 3_600_000, "hours": 3_600_000,
+}
+
+
+def parse_window(func: str, *, ts_per_second: float = 1000.0) -> Tuple[str, float]:
+    """Return (kind, size) for a window function, size in events or ts units."""
+    m = re.match(r"^\s*(\w+)\s*\((.*)\)\s*$", func)
+    if not m:
+        raise ValueError(f"Bad window spec: {func}")
+    kind, arg = m.group(1).lower(), m.group(2).strip()
+    if kind == "length":
+        return "length", int(arg)
+    if kind == "time":
+        mt = re.match(r"^(\d+(?:\.\d+)?)\s*([A-Za-z]*)$", arg)
+        if not mt:
+            raise ValueError(f"Bad time window: {func}")
+        unit = mt.group(2).lower() or "sec"
+        if unit not in _TIME_UNITS_MS:
+            raise ValueError(f"Unknown time unit in window: {func}")
+        return "time", float(mt.group(1)) * _TIME_UNITS_MS[unit] * ts_per_second / 1000.0
+    raise NotImplementedError(f"Window kind not supported by the reference engine: {func}")
+
+
+class _Window:
+    __slots__ = ("kind", "size", "items")
+
+    def __init__(self, spec: WindowSpec, ts_per_second: float) -> None:
+        self.kind, self.size = parse_window(spec.func, ts_per_second=ts_per_second)
+        self.items: Deque[Tuple[float, Event]] = collections.deque()
+
+    def insert(self, ev: Event, now: float) -> List[Event]:
+        self.items.append((now, ev))
+        if self.kind == "length" and len(self.items) > self.size:
+            return [self.items.popleft()[1] for _ in range(len(self.items) - int(self.size))]
+        return []
+
+    def next_expiry(self) -> Optional[float]:
+        if self.kind != "time" or not self.items:
+            return None
+        return self.items[0][0] + self.size
+
+    def expire(self, now: float) -> List[Event]:
+        out: List[Event] = []
+        while self.items and self.items[0][0] + self.size <= now:
+            out.append(self.items.popleft()[1])
+        return out
+
+    def contents(self) -> List[Event]:
+        return [ev for _, ev in self.items]
+
+
+# ---------------------------
+# Patterns
+# ---------------------------
+
+class _PNode:
+    def streams(self) -> List[str]:
+        raise NotImplementedError
+
+    def start(self, bindings: Dict[str, Event]) -> "_PInst":
+        raise NotImplementedError
+
+
+class _PInst:
+    done = False
+
+    def feed(self, stream: str, ev: Event) -> List[Dict[str, Event]]:
+        raise NotImplementedError
+
+
+@dataclass
+class _PAtom(_PNode):
+    var: Optional[str]
+    stream: str
+    cond: Optional[Expr]
+
+    def streams(self) -> List[str]:
+        return [self.stream]
+
+    def start(self, bindings):
+        return _PAtomInst(self, bindings)
+
+
+class _PAtomInst(_PInst):
+    def __init__(self, node: _PAtom, bindings: Dict[str, Event]) -> None:
+        self.node = node
+        self.bindings = bindings
+
+    def feed(self, stream, ev):
+        if self.done or stream != self.node.stream:
+            return []
+        if self.node.cond is not None:
+            env = dict(ev)
+            env.update(self.bindings)
+            if not self.node.cond.test(env):
+                return []
+        self.done = True
+        b = dict(self.bindings)
+        if self.node.var:
+            b[self.node.var] = ev
+        return [b]
+
+
+@dataclass
+class _PFollowedBy(_PNode):
+    left: _PNode
+    right: _PNode
+
+    def streams(self):
+        return self.left.streams() + self.right.streams()
+
+    def start(self, bindings):
+        return _PFollowedByInst(self, bindings)
+
+
+class _PFollowedByInst(_PInst):
+    def __init__(self, node: _PFollowedBy, bindings: Dict[str, Event]) -> None:
+        self.node = node
+        self.left = node.left.start(bindings)
+        self.rights: List[_PInst] = []
+
+    def feed(self, stream, ev):
+        out: List[Dict[str, Event]] = []
+        # existing right-hand instances first: the event completing the left side
+        # must not also satisfy the right side it just started
+        for r in self.rights:
+            out.extend(r.feed(stream, ev))
+        self.rights = [r for r in self.rights if not r.done]
+        if not self.left.done:
+            for b in self.left.feed(stream, ev):
+                self.rights.append(self.node.right.start(b))
+        self.done = self.left.done and not self.rights
+        return out
+
+
+@dataclass
+class _PEvery(_PNode):
+    child: _PNode
+
+    def streams(self):
+        return self.child.streams()
+
+    def start(self, bindings):
+        return _PEveryInst(self, bindings)
+
+
+class _PEveryInst(_PInst):
+    def __init__(self, node: _PEvery, bindings: Dict[str, Event]) -> None:
+        self.node = node
+        self.bindings = bindings
+        self.cur = node.child.start(bindings)
+
+    def feed(self, stream, ev):
+        out = self.cur.feed(stream, ev)
+        if self.cur.done:
+            self.cur = self.node.child.start(self.bindings)
+        return out
+
+
+class _PatternParser:
+    _IDENT = re.compile(r"\s*([A-Za-z_][A-Za-z0-9_]*)")
+
+    def __init__(self, text: str) -> None:
+        s = text.strip()
+        if s.startswith("[") and s.endswith("]"):
+            s = s[1:-1]
+        self.s = s
+        self.i = 0
+
+    def _ws(self) -> None:
+        while self.i < len(self.s) and self.s[self.i].isspace():
+            self.i += 1
+
+    def _peek(self, lit: str) -> bool:
+        self._ws()
+        return self.s.startswith(lit, self.i)
+
+    def parse(self) -> _PNode:
+        node = self._followed_by()
+        self._ws()
+        if self.i != len(self.s):
+            raise NotImplementedError(f"Unsupported pattern syntax: {self.s[self.i:]!r}")
+        return node
+
+    def _followed_by(self) -> _PNode:
+        node = self._unary()
+        while self._peek("->"):
+            self.i += 2
+            node = _PFollowedBy(node, self._unary())
+        return node
+
+    def _unary(self) -> _PNode:
+        self._ws()
+        m = self._IDENT.match(self.s, self.i)
+        if m and m.group(1).lower() == "every":
+            self.i = m.end()
+            return _PEvery(self._unary())
+        if self._peek("("):
+            self.i += 1
+            node = self._followed_by()
+            if not self._peek(")"):
+                raise ValueError(f"Unbalanced pattern: {self.s}")
+            self.i += 1
+            return node
+        return self._atom()
+
+    def _atom(self) -> _PNode:
+        m = self._IDENT.match(self.s, self.i)
+        if not m:
+            raise ValueError(f"Bad pattern atom at: {self.s[self.i:]!r}")
+        self.i = m.end()
+        var = None
+        name = m.group(1)
+        if self._peek("=") and not self._peek("=="):
+            self.i += 1
+            m = self._IDENT.match(self.s, self.i)
+            if not m:
+                raise ValueError(f"Bad pattern atom at: {self.s[self.i:]!r}")
+            var, name = name, m.group(1)
+            self.i = m.end()
+        cond = None
+        if self._peek("("):
+            start = self.i + 1
+            depth = 0
+            in_q: Optional[str] = None
+            while self.i < len(self.s):
+                ch = self.s[self.i]
+                if in_q:
+                    if ch == in_q:
+                        in_q = None
+                elif ch in "'\"":
+                    in_q = ch
+                elif ch == "(":
+                    depth += 1
+                elif ch == ")":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                self.i += 1
+            cond = compile_expr(self.s[start:self.i])
+            self.i += 1
+        return _PAtom(var, name, cond)
+
+
+# ---------------------------
+# Statements
+# ---------------------------
+
+class _Source:
+    __slots__ = ("stream", "filter", "window", "named", "pattern", "pattern_inst")
+
+    def __init__(self, src, named: Dict[str, "_NamedWindow"], ts_per_second: float) -> None:
+        self.filter: Optional[Expr] = None
+        self.window: Optional[_Window] = None
+        self.named: Optional[_NamedWindow] = None
+        self.pattern: Optional[_PNode] = None
+        self.pattern_inst: Optional[_PInst] = None
+        if isinstance(src, PatternSource):
+            self.stream = ""
+            self.pattern = _PatternParser(src.pattern).parse()
+            self.pattern_inst = self.pattern.start({})
+            return
+        self.stream = src.name
+        if src.filter_cond:
+            self.filter = compile_expr(src.filter_cond)
+        if src.window is not None:
+            self.window = _Window(src.window, ts_per_second)
+        else:
+            self.named = named.get(src.name)
+
+    def streams(self) -> List[str]:
+        return sorted(set(self.pattern.streams())) if self.pattern else [self.stream]
+
+    def contents(self) -> List[Event]:
+        if self.window is not None:
+            return self.window.contents()
+        if self.named is not None:
+            evs = self.named.window.contents()
+            if self.filter is not None:
+                evs = self.filter.filter(evs)
+            return evs
+        return []
+
+
+class _Statement:
+    def __init__(self, q: SelectQuery, named: Dict[str, "_NamedWindow"], ts_per_second: float, clock: Callable[[], float]) -> None:
+        self.clock = clock
+        self.insert_into = q.insert_into
+        self.sources = [_Source(s, named, ts_per_second) for s in q.from_sources]
+        self.where = compile_expr(q.where) if q.where else None
+
+        self.aggs: List[Tuple[str, Optional[Expr]]] = []
+        self.items: List[Tuple[Optional[str], Optional[Expr]]] = []  # (None, None) == '*'
+        for item in _split_top_level(q.select, ","):
+            if item == "*":
+                self.items.append((None, None))
+                continue
+            m = re.match(r"^(.*?)\s+as\s+([A-Za-z_][A-Za-z0-9_]*)$", item, flags=re.I)
+            expr_text, name = (m.group(1), m.group(2)) if m else (item, item)
+            self.items.append((name, compile_expr(expr_text, self.aggs)))
+        self.group_by = [compile_expr(g) for g in _split_top_level(q.group_by, ",")] if q.group_by else []
+        self.having = compile_expr(q.having, self.aggs) if q.having else None
+        self.aggregated = bool(self.aggs or self.group_by)
+        self.groups: Dict[Tuple, List[_Agg]] = {}
+
+    def on_input(self, i: int, stream: str, new: List[Event], old: List[Event]) -> List[Event]:
+        src = self.sources[i]
+        if src.pattern_inst is not None:
+            matched: List[Event] = []
+            for ev in new:
+                matched.extend(src.pattern_inst.feed(stream, ev))
+            new, old = matched, []
+        if src.filter is not None:
+            new = src.filter.filter(new)
+            old = src.filter.filter(old)
+        if src.window is not None:
+            old = []
+            for ev in new:
+                old.extend(src.window.insert(ev, self.clock()))
+        return self._process(i, new, old)
+
+    def on_expired(self, i: int, old: List[Event]) -> List[Event]:
+        return self._process(i, [], old)
+
+    def _join(self, i: int, evs: List[Event]) -> List[Event]:
+        if not evs or len(self.sources) == 1:
+            return evs
+        others = [s.contents() if j != i else None for j, s in enumerate(self.sources)]
+        if any(o is not None and not o for o in others):
+            return []
+        rows: List[Event] = []
+        for ev in evs:
+            pools = [[ev] if o is None else o for o in others]
+            for combo in itertools.product(*pools):
+                row: Event = {}
+                for part in combo:
+                    for k, v in part.items():
+                        row.setdefault(k, v)
+                rows.append(row)
+        return rows
+
+    def _project(self, row: Event, aggvals: Sequence[object] = ()) -> Event:
+        out: Event = {}
+        for name, expr in self.items:
+            if expr is None:
+                out.update(row)
+            else:
+                out[name] = expr(row, aggvals)  # type: ignore[index]
+        return out
+
+    def _process(self, i: int, new: List[Event], old: List[Event]) -> List[Event]:
+        new_rows = self._join(i, new)
+        old_rows = self._join(i, old)
+        if self.where is not None:
+            new_rows = self.where.filter(new_rows)
+            old_rows = self.where.filter(old_rows)
+        if not self.aggregated:
+            return [self._project(r) for r in new_rows]
+
+        touched: Dict[Tuple, Event] = {}
+        for rows, sign in ((new_rows, 1), (old_rows, -1)):
+            for r in rows:
+                key = tuple(g(r) for g in self.group_by)
+                state = self.groups.get(key)
+                if state is None:
+                    state = self.groups[key] = [_Agg(f) for f, _ in self.aggs]
+                for agg, (_, arg) in zip(state, self.aggs):
+                    agg.update(1 if arg is None else arg(r), sign)
+                touched.setdefault(key, r)
+        out: List[Event] = []
+        for key, r in touched.items():
+            aggvals = [a.value() for a in self.groups[key]]
+            row = self._project(r, aggvals)
+            if self.having is not None and not self.having.test({**r, **row}, aggvals):
+                continue
+            out.append(row)
+        return out
+
+
+class _NamedWindow:
+    def __init__(self, name: str, spec: WindowSpec, ts_per_second: float) -> None:
+        self.name = name
+        self.window = _Window(spec, ts_per_second)
+
+
+_CREATE_WINDOW = re.compile(r"^create\s+window\s+([A-Za-z_][A-Za-z0-9_]*)\s*(?:#|\.win:)\s*(.+?)(?:\s+as\s+.+)?$", re.I | re.S)
+
+
+def _ts(ev: Event) -> float:
+    return ev.get("ts", ev.get("Timestamp", ev.get("timestamp", 0)))  # type: ignore[return-value]
+
+
+class _Network:
+    def __init__(self, statements: List[str], ts_per_second: float) -> None:
+        self.now = 0.0
+        self.named: Dict[str, _NamedWindow] = {}
+        self.stmts: List[_Statement] = []
+        self.subs: Dict[str, List[Tuple[_Statement, int]]] = collections.defaultdict(list)
+        self.timed: List[Tuple[_Window, Optional[_Statement], int, str]] = []
+        self.queue: Deque[Tuple[str, List[Event], List[Event]]] = collections.deque()
+        self.output: List[Event] = []
+
+        for raw in statements:
+            text = "\n".join(l for l in raw.strip().splitlines() if not l.lstrip().startswith("@")).strip().rstrip(";").strip()
+            low = text.lower()
+            if low.startswith("create schema"):
+                continue
+            m = _CREATE_WINDOW.match(text)
+            if m:
+                nw = _NamedWindow(m.group(1), WindowSpec(func=m.group(2).strip()), ts_per_second)
+                self.named[nw.name] = nw
+                if nw.window.kind == "time":
+                    self.timed.append((nw.window, None, 0, nw.name))
+                continue
+            st = _Statement(parse_select_query(text), self.named, ts_per_second, lambda: self.now)
+            for i, src in enumerate(st.sources):
+                for s in src.streams():
+                    self.subs[s].append((st, i))
+                if src.window is not None and src.window.kind == "time":
+                    self.timed.append((src.window, st, i, src.stream))
+            self.stmts.append(st)
+        self.final = self.stmts[-1] if self.stmts else None
+
+    def _route(self, st: _Statement, out: List[Event]) -> None:
+        if not out:
+            return
+        if st is self.final:
+            self.output.extend(out)
+        if st.insert_into:
+            self._insert(st.insert_into, out)
+
+    def _insert(self, stream: str, evs: List[Event]) -> None:
+        nw = self.named.get(stream)
+        old: List[Event] = []
+        if nw is not None:
+            for ev in evs:
+                old.extend(nw.window.insert(ev, self.now))
+        self.queue.append((stream, evs, old))
+
+    def _drain(self) -> None:
+        while self.queue:
+            stream, new, old = self.queue.popleft()
+            for st, i in self.subs.get(stream, ()):
+                self._route(st, st.on_input(i, stream, new, old))
+
+    def _advance(self, t: float) -> None:
+        while True:
+            due = [w.next_expiry() for w, _, _, _ in self.timed]
+            due = [d for d in due if d is not None and d <= t]
+            if not due:
+                break
+            self.now = min(due)
+            for w, st, i, name in self.timed:
+                nxt = w.next_expiry()
+                if nxt is None or nxt > self.now:
+                    continue
+                old = w.expire(self.now)
+                if st is not None:
+                    self._route(st, st.on_expired(i, old))
+                else:
+                    self.queue.append((name, [], old))
+            self._drain()
+        self.now = max(self.now, t)
+
+    def run(self, events: Dict[str, List[Event]]) -> List[Event]:
+        streams = [[(_ts(ev), name, ev) for ev in sorted(evs, key=_ts)] for name, evs in events.items()]
+        for ts, name, ev in heapq.merge(*streams, key=lambda x: (x[0], x[1])):
+            if ts > self.now:
+                self._advance(ts)
+            self.queue.append((name, [ev], []))
+            self._drain()
+        return self.output
+
+
+@dataclass
+class ReferenceEngine:
+    """In-process `Engine` for the parser's EPL fragment (see module docstring).
+
+    `ts_per_second` is the number of `ts` units per second used to size time windows.
+    """
+    ts_per_second: float = 1000.0
+
+    # Bump whenever outputs change, so cached results (engines.result_cache) are dropped.
+    version: ClassVar[str] = "1"
+
+    def run(self, statements: List[str], events: "Dict[str, List[Event]] | EventsFile") -> List[Event]:
+        return _Network(statements, self.ts_per_second).run(resolve_events(events))
@@ -0,0 +1,204 @@
+"""Content-addressed, disk-backed cache of engine outputs.
+
+`CachedEngine` wraps any `Engine`. A run is keyed by a digest of
+(engine identity, engine version, statement list, event dataset digest), so
+re-running a workload only executes the cases whose statements or inputs
+changed. Outputs are stored as zlib-compressed compact JSON in a SQLite file,
+which several worker processes can share.
+
+The engine identity defaults to the engine's class plus its configuration
+(`engine_config`: runner command, or e.g. `ts_per_second`); the version to its `version` attribute (if any). Entries written under
+another version of the same engine are deleted when the cache is opened, and
+the least recently used entries are evicted once the stored outputs exceed
+`max_bytes`. Failed runs are not cached.
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..cache import CacheStats
+from .base import Engine, Event
+from .events_file import EventsFile
+
+
+def engine_config(engine: Engine) -> Optional[dict]:
+    """The settings that determine an engine's outputs.
+
+    `engine.cache_key()` if defined; else the init fields of a dataclass engine
+    (e.g. `ReferenceEngine.ts_per_second`); else its runner command, if any.
+    """
+    key = getattr(engine, "cache_key", None)
+    if key is not None:
+        return key()
+    if dataclasses.is_dataclass(engine):
+        return {f.name: getattr(engine, f.name) for f in dataclasses.fields(engine) if f.init}
+    cmd = getattr(engine, "cmd", None)
+    return {"cmd": list(cmd)} if cmd else None
+
+
+def engine_identity(engine: Engine) -> str:
+    cls = type(engine)
+    ident = f"{cls.__module__}.{cls.__qualname__}"
+    config = engine_config(engine)
+    if config:
+        ident += " " + _compact(config).decode("utf-8")
+    return ident
+
+
+def _compact(obj: object) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def events_digest(events: Dict[str, List[Event]]) -> str:
+    """Digest of an event dataset (stream names, event order and values)."""
+    h = hashlib.blake2b(digest_size=16)
+    for name in sorted(events):
+        h.update(_compact(name))
+        for ev in events[name]:
+            h.update(_compact(ev))
+            h.update(b"\n")
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class CachedEngine:
+    def __init__(
+        self,
+        engine: Engine,
+        path: str | Path,
+        *,
+        engine_id: Optional[str] = None,
+        engine_version: Optional[str] = None,
+        max_bytes: int = 1 << 30,
+        commit_every: int = 64,
+    ) -> None:
+        self.engine = engine
+        self.engine_id = engine_id or engine_identity(engine)
+        self.engine_version = str(engine_version if engine_version is not None else getattr(engine, "version", ""))
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._commit_every = commit_every
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._last_events: Optional[Tuple[Dict[str, List[Event]], str]] = None
+        self._db: Optional[sqlite3.Connection] = sqlite3.connect(str(path), timeout=30.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")  # cheap commits, readers in other processes not blocked
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, engine TEXT, version TEXT,"
+            " output BLOB, size INTEGER, used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self._db.execute(
+            "DELETE FROM results WHERE engine=? AND version<>?", (self.engine_id, self.engine_version),
+        )
+        self._db.commit()
+        self._size = self._stored_bytes()  # estimate; other processes' inserts are picked up by _evict
+        self._inserts = 0
+
+    def __enter__(self) -> "CachedEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _events_digest(self, events: "Dict[str, List[Event]] | EventsFile") -> str:
+        if isinstance(events, EventsFile):
+            return "file:" + events.digest  # digest of the file bytes, not of the decoded events
+        # a harness case passes the same events to consecutive runs; they must not be mutated in between
+        last = self._last_events
+        if last is not None and last[0] is events:
+            return last[1]
+        digest = events_digest(events)
+        self._last_events = (events, digest)
+        return digest
+
+    def key(self, statements: List[str], events: "Dict[str, List[Event]] | EventsFile") -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(_compact([self.engine_id, self.engine_version, statements, self._events_digest(events)]))
+        return h.hexdigest()
+
+    def run(self, statements: List[str], events: "Dict[str, List[Event]] | EventsFile") -> List[Event]:
+        key = self.key(statements, events)
+        with self._lock:
+            assert self._db is not None
+            row = self._db.execute("SELECT output FROM results WHERE key=?", (key,)).fetchone()
+            if row is not None:
+                self.stats.hits += 1
+                self.stats.disk_hits += 1
+                self._db.execute("UPDATE results SET used=? WHERE key=?", (time.time(), key))
+                self._dirty()
+                return json.loads(zlib.decompress(row[0]))
+            self.stats.misses += 1
+        out = self.engine.run(statements, events)
+        blob = zlib.compress(_compact(out))
+        with self._lock:
+            assert self._db is not None
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.engine_id, self.engine_version, blob, len(blob), time.time()),
+            )
+            self._size += len(blob)
+            self._inserts += 1
+            self._dirty()
+        return out
+
+    def _dirty(self) -> None:
+        self._pending += 1
+        if self._pending >= self._commit_every:
+            self._commit()
+
+    def _commit(self) -> None:
+        assert self._db is not None
+        self._evict()
+        self._db.commit()
+        self._pending = 0
+
+    def _stored_bytes(self) -> int:
+        assert self._db is not None
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the stored outputs fit in 90% of max_bytes."""
+        assert self._db is not None
+        if self._size <= self.max_bytes and self._inserts < 1024:
+            return
+        self._inserts = 0
+        total = self._size = self._stored_bytes()
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed: List[str] = []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY used"):
+            doomed.append(key)
+            freed += size
+            if freed >= target:
+                break
+        self._db.executemany("DELETE FROM results WHERE key=?", [(k,) for k in doomed])
+        self._size -= freed
+        self.stats.evictions += len(doomed)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._db is not None and self._pending:
+                self._commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+                self._db.close()
+                self._db = None
+        close = getattr(self.engine, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,193 @@
+"""Fixed-width binary case datasets (`<case>.evb`), an alternative to `<case>.csv`.
+
+Same rows, in the same order, as `write_case_csv`, stored as packed little-endian
+records so a reader can memory-map the file and view columns without parsing:
+
+    offset  size  field
+    0       8     magic b"EPLEVB1\\0"
+    8       4     u32 record size in bytes
+    12      4     u32 reserved (0)
+    16      8     u64 number of records
+    24      8     u64 footer offset
+    32      n*r   records
+    footer        UTF-8 JSON: {"columns": [[name, type], ...], "strings": [...]}
+
+Column types: "str" (u32 code into `strings`), "i8" (int64; a missing value is
+-2**63) and "f8" (float64; missing is NaN). Fields are packed in column order
+with no padding.
+"""
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from .engines.base import Event
+from .export_data import DEFAULT_COLUMNS, iter_case_rows
+
+MAGIC = b"EPLEVB1\0"
+_HEADER = struct.Struct("<8sIIQQ")
+_FMT = {"str": "I", "i8": "q", "f8": "d"}
+_NP_FMT = {"str": "<u4", "i8": "<i8", "f8": "<f8"}
+I8_MISSING = -(1 << 63)
+
+# types of the default schema (see export_epl._emit_basic_schemas); others are "str"
+COLUMN_TYPES: Dict[str, str] = {
+    "Timestamp": "i8",
+    "temp": "f8",
+    "humid": "f8",
+    "x": "i8",
+    "y": "i8",
+}
+
+
+def _record_struct(types: Sequence[str]) -> struct.Struct:
+    return struct.Struct("<" + "".join(_FMT[t] for t in types))
+
+
+def write_case_bin(
+    out_path: str | Path,
+    events_by_type: Mapping[str, Iterable[Event]],
+    *,
+    columns: Sequence[str] = DEFAULT_COLUMNS,
+    column_types: Optional[Mapping[str, str]] = None,
+) -> int:
+    """Write the case dataset; return the number of records."""
+    types = [(column_types or COLUMN_TYPES).get(c, "str") for c in columns]
+    rec = _record_struct(types)
+    strings: Dict[str, int] = {}
+
+    def code(v: object) -> int:
+        s = "" if v is None else str(v)
+        c = strings.get(s)
+        if c is None:
+            c = strings[s] = len(strings)
+        return c
+
+    def conv(t: str, v: object) -> object:
+        if t == "str":
+            return code(v)
+        if v == "" or v is None:
+            return I8_MISSING if t == "i8" else math.nan
+        return int(v) if t == "i8" else float(v)  # type: ignore[arg-type]
+
+    n = 0
+    with Path(out_path).open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, rec.size, 0, 0, 0))
+        pack = rec.pack
+        typed = list(enumerate(types))
+        buf: List[bytes] = []
+        for row in iter_case_rows(events_by_type, columns=columns):
+            buf.append(pack(*[conv(t, row[i]) for i, t in typed]))
+            if len(buf) >= 4096:
+                f.write(b"".join(buf))
+                buf.clear()
+            n += 1
+        f.write(b"".join(buf))
+        footer_at = f.tell()
+        f.write(json.dumps({"columns": [[c, t] for c, t in zip(columns, types)], "strings": list(strings)}).encode("utf-8"))
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, rec.size, 0, n, footer_at))
+    return n
+
+
+class EventDataset:
+    """Read-only, memory-mapped view of an `.evb` file.
+
+    `columns()`/`iter_batches()` return numpy views into the mapping (no copy;
+    numpy required); `iter_rows()`/`events_by_type()` decode records in pure Python.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._f = self.path.open("rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.record_size, _, self.n, footer_at = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not an .evb dataset")
+        footer = json.loads(bytes(self._mm[footer_at:]).decode("utf-8"))
+        self.column_names: List[str] = [c for c, _ in footer["columns"]]
+        self.column_types: List[str] = [t for _, t in footer["columns"]]
+        self.strings: List[str] = footer["strings"]
+        self._rec = _record_struct(self.column_types)
+        if self._rec.size != self.record_size:
+            raise ValueError(f"{path}: record size mismatch")
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __enter__(self) -> "EventDataset":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+        self._f.close()
+
+    # ---- columnar access (numpy) ----
+
+    def records(self):
+        """Structured numpy array over all records, backed by the mapping."""
+        import numpy as np
+        offsets, off = [], 0
+        for t in self.column_types:
+            offsets.append(off)
+            off += struct.calcsize("<" + _FMT[t])
+        dt = np.dtype({
+            "names": self.column_names,
+            "formats": [_NP_FMT[t] for t in self.column_types],
+            "offsets": offsets,
+            "itemsize": self.record_size,
+        })
+        return np.frombuffer(self._mm, dtype=dt, count=self.n, offset=_HEADER.size)
+
+    def columns(self) -> Dict[str, object]:
+        """name -> strided numpy view; "str" columns hold codes into `self.strings`."""
+        recs = self.records()
+        return {c: recs[c] for c in self.column_names}
+
+    def iter_batches(self, size: int = 1 << 16) -> Iterator[Dict[str, object]]:
+        recs = self.records()
+        for start in range(0, self.n, size):
+            part = recs[start:start + size]
+            yield {c: part[c] for c in self.column_names}
+
+    # ---- row access (pure Python) ----
+
+    def iter_rows(self) -> Iterator[Dict[str, object]]:
+        """Decoded rows with the CSV's column names and typed values."""
+        strings = self.strings
+        names = self.column_names
+        decoders = []
+        for t in self.column_types:
+            if t == "str":
+                decoders.append(strings.__getitem__)
+            elif t == "i8":
+                decoders.append(lambda v: "" if v == I8_MISSING else v)
+            else:
+                decoders.append(lambda v: "" if v != v else v)
+        view = memoryview(self._mm)[_HEADER.size:_HEADER.size + self.n * self.record_size]
+        try:
+            for vals in self._rec.iter_unpack(view):
+                yield {c: d(v) for c, d, v in zip(names, decoders, vals)}
+        finally:
+            view.release()
+
+    def events_by_type(self) -> Dict[str, List[Event]]:
+        """Engine input shape: EventType -> events with `ts` instead of Timestamp."""
+        out: Dict[str, List[Event]] = {}
+        for row in self.iter_rows():
+            etype = str(row.pop("EventType"))
+            row["ts"] = row.pop("Timestamp")
+            out.setdefault(etype, []).append(row)
+        return out
+
+
+def read_case_bin(path: str | Path) -> Dict[str, List[Event]]:
+    with EventDataset(path) as ds:
+        return ds.events_by_type()
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, List, Sequence
+from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple
 import csv
+import heapq
 
 from .engines.base import Event
 
@@ -23,19 +24,66 @@ def events_to_rows(events_by_type: Dict[str, List[Event]], *, columns: Sequence[
                     row[k] = v
             rows.append(row)
 
-    def key(r):
-        try:
-            return (int(r["Timestamp"]), str(r["EventType"]))
-        except Exception:
-            return (0, str(r["EventType"]))
-    rows.sort(key=key)
+    rows.sort(key=lambda r: _order_key(r["Timestamp"], r["EventType"]))
     return rows
 
-def write_case_csv(out_csv: str | Path, events_by_type: Dict[str, List[Event]], *, columns: Sequence[str] = DEFAULT_COLUMNS) -> None:
+def _order_key(ts: object, etype: object) -> Tuple[int, str]:
+    try:
+        return (int(ts), str(etype))  # type: ignore[call-overload]
+    except Exception:
+        return (0, str(etype))
+
+def _event_ts(ev: Event) -> object:
+    return ev["Timestamp"] if "Timestamp" in ev else ev.get("ts", ev.get("timestamp", ""))
+
+def _event_key(etype: str, ev: Event) -> Tuple[int, str]:
+    return _order_key(_event_ts(ev), ev.get("EventType", etype))
+
+def _stream_rows(etype: str, evs: Iterable[Event], columns: Sequence[str]) -> Iterator[Tuple[Tuple[int, str], List[object]]]:
+    # Same cell values as events_to_rows, built as lists in column order.
+    getters = []
+    for c in columns:
+        if c == "ts":
+            getters.append(lambda ev: "")
+        elif c == "EventType":
+            getters.append(lambda ev: ev.get("EventType", etype))
+        elif c == "Timestamp":
+            getters.append(_event_ts)
+        else:
+            getters.append(lambda ev, c=c: ev.get(c, ""))
+    i_type = list(columns).index("EventType")
+    i_ts = list(columns).index("Timestamp")
+    for ev in evs:
+        row = [g(ev) for g in getters]
+        yield _order_key(row[i_ts], row[i_type]), row
+
+def _is_sorted(etype: str, evs: Sequence[Event]) -> bool:
+    prev = None
+    for ev in evs:
+        key = _event_key(etype, ev)
+        if prev is not None and key < prev:
+            return False
+        prev = key
+    return True
+
+def iter_case_rows(events_by_type: Mapping[str, Iterable[Event]], *, columns: Sequence[str] = DEFAULT_COLUMNS) -> Iterator[List[object]]:
+    """Rows of events_to_rows, in the same order, produced by a k-way merge.
+
+    Each stream is expected in (Timestamp) order, as generate_inputs produces it;
+    list inputs that are not are sorted first, other iterables are trusted.
+    Memory is O(number of streams) beyond the inputs themselves.
+    """
+    its = []
+    for etype, evs in events_by_type.items():
+        if isinstance(evs, Sequence) and not _is_sorted(etype, evs):
+            evs = sorted(evs, key=lambda ev, e=etype: _event_key(e, ev))
+        its.append(_stream_rows(etype, evs, columns))
+    for _, row in heapq.merge(*its, key=lambda kr: kr[0]):
+        yield row
+
+def write_case_csv(out_csv: str | Path, events_by_type: Mapping[str, Iterable[Event]], *, columns: Sequence[str] = DEFAULT_COLUMNS) -> None:
     out_csv = Path(out_csv)
-    rows = events_to_rows(events_by_type, columns=columns)
     with out_csv.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=list(columns))
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
+        w = csv.writer(f)
+        w.writerow(list(columns))
+        w.writerows(iter_case_rows(events_by_type, columns=columns))
@@ -1,20 +1,29 @@
 from __future__ import annotations
 
+import collections
+import hashlib
 import json
-from dataclasses import dataclass
+import os
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import List, Optional, Sequence, Tuple
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+from . import metrics
+from .bulk import chunked, map_chunks
+from .cache import DecompositionCache
+from .io_utils import iter_jsonl
 from .parse import parse_select_query
 from .decompose import decompose_select_query
-from .synth_events import generate_inputs
+from .synth_events import iter_inputs
 from .export_data import write_case_csv
+from .event_binary import write_case_bin
 from .config import DEFAULT_SCHEMA_STREAMS
 
 
 @dataclass(frozen=True)
 class ExportConfig:
     create_window_mode: str = "esper"     # "paper" or "esper"
+    optimize: bool = False                # rewrite the operator tree first (see optimize)
     tag_name: str = "CASE"                # aligns original/decomposed
     name_prefix: str = "Q"
 
@@ -22,24 +31,29 @@ class ExportConfig:
     schema_streams: Sequence[str] = DEFAULT_SCHEMA_STREAMS
     schema_name: str = "BaseEvent"
 
-    emit_csv: bool = True
+    emit_csv: bool = True                 # emit the input dataset (in data_format)
+    data_format: str = "csv"              # "csv" or "bin" (see event_binary)
     n_per_stream: int = 200
     seed: int = 0
+    generator: str = "python"             # "python" or "numpy" (columnar, see synth_events)
 
     # NEW: optional decomposition
     emit_decomposition: bool = True
 
+    # 0 = flat out_dir; k > 0 = one sub-directory per case prefix minus its last k digits
+    shard_digits: int = 0
+
+
+# Bump whenever the files written for a given (query, index, config) change, so
+# incremental exports (see iter_export_cases) rewrite every case.
+EXPORT_VERSION = 1
+
 
 def _ensure_semicolon(stmt: str) -> str:
     s = stmt.strip()
     return s if s.endswith(";") else s + ";"
 
 
-def _stmt_kind(stmt: str) -> str:
-    s = stmt.strip().lower()
-    return "DDL" if s.startswith("create ") else "DML"
-
-
 def _statement_block(cfg: ExportConfig, tag_value: str, case_id: str, stmt_name: str, stmt: str) -> str:
     return "\n".join([
         f'@Tag(name="EPL", value="{tag_value}")',
@@ -71,54 +85,264 @@ def _emit_basic_schemas(cfg: ExportConfig, case_id: str) -> List[str]:
     return out
 
 
+def case_paths(out_dir: Path, cfg: ExportConfig, idx: int) -> Tuple[str, Path, Optional[Path]]:
+    """Return (case, epl_path, data_path) for the case at 1-based workload index idx.
+
+    With `shard_digits = k > 0`, cases sharing all but their last k digits go into
+    one sub-directory, e.g. k=2 puts Q0012 at Q00/Q0012.epl.
+    """
+    case = f"{cfg.name_prefix}{idx:04d}"
+    d = out_dir / case[:-cfg.shard_digits] if cfg.shard_digits > 0 else out_dir
+    ext = {"csv": ".csv", "bin": ".evb"}[cfg.data_format]
+    return case, d / f"{case}.epl", (d / f"{case}{ext}" if cfg.emit_csv else None)
+
+
+def export_case(
+    q: str,
+    idx: int,
+    out_dir: str | Path,
+    *,
+    cfg: ExportConfig = ExportConfig(),
+    cache: Optional[DecompositionCache] = None,
+) -> Tuple[Path, Optional[Path]]:
+    """Write the .epl (and optionally .csv/.evb dataset) files of one case."""
+    case, epl_path, data_path = case_paths(Path(out_dir), cfg, idx)
+    epl_path.parent.mkdir(parents=True, exist_ok=True)
+
+    blocks: List[str] = []
+    if cfg.emit_schemas:
+        blocks.extend(_emit_basic_schemas(cfg, case))
+
+    # Original query always present
+    blocks.append(_statement_block(cfg, "DML", case, f"{case}_Original", q.strip().rstrip(";")))
+
+    # NEW: only include decomposition if requested
+    if cfg.emit_decomposition:
+        if cache is not None:
+            prog, _ = cache.decompose(q, create_window_mode=cfg.create_window_mode, optimize=cfg.optimize)
+        else:
+            with metrics.stage("parse"):
+                parsed = parse_select_query(q)
+            with metrics.stage("decompose"):
+                prog, _ = decompose_select_query(parsed, create_window_mode=cfg.create_window_mode, optimize=cfg.optimize)
+        metrics.count_statements(prog.stmts)
+
+        total = len(prog.stmts)
+        for j, stmt in enumerate(prog.stmts, start=1):
+            name = f"{case}_Decomp_Final" if j == total else f"{case}_Decomp_{j:02d}"
+            blocks.append(_statement_block(cfg, stmt.kind, case, name, stmt.epl()))
+
+    with metrics.stage("write_epl"):
+        epl_path.write_text("\n".join(blocks).rstrip() + "\n", encoding="utf-8")
+    metrics.count_bytes(epl_path)
+
+    if cfg.emit_csv and data_path is not None:
+        ev = iter_inputs(
+            seed=cfg.seed + idx,
+            n_per_stream=cfg.n_per_stream,
+            streams=list(cfg.schema_streams),
+            backend=cfg.generator,
+        )
+        if metrics.enabled():
+            # generation is lazy: its time is also part of write_data
+            ev = {s: metrics.timed_iter("generate_events", it) for s, it in ev.items()}
+            metrics.count("events", cfg.n_per_stream * len(cfg.schema_streams))
+        with metrics.stage("write_data"):
+            if cfg.data_format == "bin":
+                write_case_bin(data_path, ev)
+            else:
+                write_case_csv(data_path, ev)
+        metrics.count_bytes(data_path)
+
+    return epl_path, data_path
+
+
 def export_queries_to_case_files(
     queries: Sequence[str],
     out_dir: str | Path,
     *,
     cfg: ExportConfig = ExportConfig(),
     start_index: int = 1,
+    cache: Optional[DecompositionCache] = None,
+    incremental: bool = False,
 ) -> List[Tuple[Path, Optional[Path]]]:
+    """Write every case; with `incremental`, go through `iter_export_cases` (manifest, skipping unchanged cases)."""
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
+    if incremental:
+        return [
+            (out_dir / rec["epl"], out_dir / rec["data"] if rec["data"] else None)
+            for rec in iter_export_cases(queries, out_dir, cfg=cfg, start_index=start_index)
+        ]
+    return [export_case(q, idx0, out_dir, cfg=cfg, cache=cache) for idx0, q in enumerate(queries, start=start_index)]
 
-    written: List[Tuple[Path, Optional[Path]]] = []
 
-    for idx0, q in enumerate(queries, start=start_index):
-        case = f"{cfg.name_prefix}{idx0:04d}"
-        epl_path = out_dir / f"{case}.epl"
-        csv_path = out_dir / f"{case}.csv" if cfg.emit_csv else None
+# ---------------------------
+# Streaming, parallel export
+# ---------------------------
 
-        blocks: List[str] = []
-        if cfg.emit_schemas:
-            blocks.extend(_emit_basic_schemas(cfg, case))
+MANIFEST_NAME = "manifest.jsonl"
 
-        # Original query always present
-        blocks.append(_statement_block(cfg, "DML", case, f"{case}_Original", q.strip().rstrip(";")))
+_worker: Dict[str, object] = {}
 
-        # NEW: only include decomposition if requested
-        if cfg.emit_decomposition:
-            parsed = parse_select_query(q)
-            prog, _ = decompose_select_query(parsed, create_window_mode=cfg.create_window_mode)
 
-            total = len(prog.statements)
-            for j, stmt in enumerate(prog.statements, start=1):
-                kind = _stmt_kind(stmt)
-                name = f"{case}_Decomp_Final" if j == total else f"{case}_Decomp_{j:02d}"
-                blocks.append(_statement_block(cfg, kind, case, name, stmt.strip().rstrip(";")))
+def _init_export_worker(
+    out_dir: str, cfg: ExportConfig, cache_size: int, cache_path: Optional[str], with_metrics: bool = False,
+) -> None:
+    _worker.update(out_dir=Path(out_dir), cfg=cfg, cache=DecompositionCache(maxsize=cache_size, path=cache_path))
+    if with_metrics:
+        metrics.enable()
+
+
+def _export_chunk(cases: List[Tuple[int, str]]) -> Tuple[List[dict], Optional[dict]]:
+    out_dir: Path = _worker["out_dir"]  # type: ignore[assignment]
+    cfg: ExportConfig = _worker["cfg"]  # type: ignore[assignment]
+    cache: DecompositionCache = _worker["cache"]  # type: ignore[assignment]
+    records: List[dict] = []
+    for idx, q in cases:
+        epl_path, data_path = export_case(q, idx, out_dir, cfg=cfg, cache=cache)
+        records.append({
+            "case": epl_path.stem,
+            "index": idx,
+            "epl": epl_path.relative_to(out_dir).as_posix(),
+            "data": data_path.relative_to(out_dir).as_posix() if data_path is not None else None,
+        })
+    cache.flush()
+    metrics.count("queries", len(cases))
+    return records, metrics.take()
+
+
+def case_hash(query: str, idx: int, cfg_key: str) -> str:
+    """Content hash of one case's inputs; `cfg_key` is `config_key(cfg)`."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([EXPORT_VERSION, idx, query, cfg_key]).encode("utf-8"))
+    return h.hexdigest()
 
-        epl_path.write_text("\n".join(blocks).rstrip() + "\n", encoding="utf-8")
 
-        if cfg.emit_csv and csv_path is not None:
-            ev = generate_inputs(
-                seed=cfg.seed + idx0,
-                n_per_stream=cfg.n_per_stream,
-                streams=list(cfg.schema_streams),
-            )
-            write_case_csv(csv_path, ev)
+def config_key(cfg: ExportConfig) -> str:
+    return json.dumps(asdict(cfg), sort_keys=True, default=list)
 
-        written.append((epl_path, csv_path))
 
-    return written
+def read_manifest(out_dir: str | Path) -> Dict[int, dict]:
+    """index -> record of an existing `manifest.jsonl` (empty if there is none)."""
+    path = Path(out_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        return {rec["index"]: rec for rec in map(json.loads, f) if rec}
+
+
+def _unchanged(out_dir: Path, old: Optional[dict], digest: str) -> bool:
+    if old is None or old.get("hash") != digest:
+        return False
+    return all((out_dir / old[k]).exists() for k in ("epl", "data") if old.get(k))
+
+
+def _remove_orphans(out_dir: Path, old: Dict[int, dict], kept: set) -> int:
+    """Delete files of previously exported cases that are no longer in the manifest."""
+    removed = 0
+    dirs = set()
+    for rec in old.values():
+        for k in ("epl", "data"):
+            rel = rec.get(k)
+            if rel and rel not in kept:
+                p = out_dir / rel
+                if p.exists():
+                    p.unlink()
+                    removed += 1
+                dirs.add(p.parent)
+    for d in sorted(dirs, key=lambda d: len(d.parts), reverse=True):
+        if d != out_dir:
+            try:
+                d.rmdir()  # only succeeds for shard directories left empty
+            except OSError:
+                pass
+    return removed
+
+
+def iter_export_cases(
+    queries: Iterable[str],
+    out_dir: str | Path,
+    *,
+    cfg: ExportConfig = ExportConfig(),
+    start_index: int = 1,
+    workers: int = 1,
+    chunk_size: int = 200,
+    cache_size: int = 4096,
+    cache_path: Optional[str] = None,
+    incremental: bool = True,
+) -> Iterator[dict]:
+    """Export every query, consuming `queries` lazily.
+
+    Cases are written by `workers` processes; one manifest record per case
+    (`case`, `index`, `epl`/`data` paths relative to out_dir and `hash`, the
+    content hash of query, index, config and EXPORT_VERSION) is yielded in
+    workload order and written to `<out_dir>/manifest.jsonl`.
+
+    With `incremental`, a case whose hash matches the previous manifest and
+    whose files exist is not rewritten (its record is yielded with
+    `"skipped": True`). In both modes, files of previously exported cases that
+    are no longer exported are deleted.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    old = read_manifest(out_dir)
+    cfg_key = config_key(cfg)
+    kept: set = set()
+    # full chunks awaiting their (partial) export result, in submission order
+    pending: Deque[List[Tuple[int, str, str, Optional[dict]]]] = collections.deque()
+
+    def jobs() -> Iterator[List[Tuple[int, str]]]:
+        for chunk in chunked(enumerate(queries, start=start_index), chunk_size):
+            full = []
+            for idx, q in chunk:
+                digest = case_hash(q, idx, cfg_key)
+                prev = old.get(idx)
+                full.append((idx, q, digest, prev if incremental and _unchanged(out_dir, prev, digest) else None))
+            pending.append(full)
+            yield [(idx, q) for idx, q, _, prev in full if prev is None]
+
+    tmp = out_dir / (MANIFEST_NAME + ".tmp")
+    with tmp.open("w", encoding="utf-8") as manifest:
+        for records, snap in map_chunks(
+            _export_chunk, jobs(),
+            workers=workers,
+            initializer=_init_export_worker, initargs=(str(out_dir), cfg, cache_size, cache_path, metrics.enabled()),
+        ):
+            metrics.merge(snap)
+            written = iter(records)
+            for idx, q, digest, prev in pending.popleft():
+                if prev is not None:
+                    rec, out = prev, dict(prev, skipped=True)
+                    metrics.count("skipped")
+                else:
+                    rec = dict(next(written), hash=digest)
+                    out = rec
+                kept.update(rec[k] for k in ("epl", "data") if rec.get(k))
+                manifest.write(json.dumps(rec) + "\n")
+                yield out
+    os.replace(tmp, out_dir / MANIFEST_NAME)
+    metrics.count("removed", _remove_orphans(out_dir, old, kept))
+
+
+def iter_export_jsonl(
+    in_jsonl: str | Path,
+    out_dir: str | Path,
+    *,
+    cfg: ExportConfig = ExportConfig(),
+    limit: Optional[int] = None,
+    workers: int = 1,
+    chunk_size: int = 200,
+    cache_size: int = 4096,
+    cache_path: Optional[str] = None,
+    incremental: bool = True,
+) -> Iterator[dict]:
+    """`iter_export_cases` over the queries of a JSONL workload."""
+    return iter_export_cases(
+        (obj["query"] for obj in iter_jsonl(in_jsonl, limit=limit)), out_dir,
+        cfg=cfg, workers=workers, chunk_size=chunk_size,
+        cache_size=cache_size, cache_path=cache_path, incremental=incremental,
+    )
 
 
 def export_jsonl_to_case_files(
@@ -127,15 +351,9 @@ def export_jsonl_to_case_files(
     *,
     cfg: ExportConfig = ExportConfig(),
     limit: Optional[int] = None,
+    cache: Optional[DecompositionCache] = None,
 ) -> List[Tuple[Path, Optional[Path]]]:
-    in_jsonl = Path(in_jsonl)
-    qs: List[str] = []
-    with in_jsonl.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            obj = json.loads(line)
-            qs.append(obj["query"])
-            if limit is not None and len(qs) >= limit:
-                break
-    return export_queries_to_case_files(qs, out_dir, cfg=cfg)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    qs = (obj["query"] for obj in iter_jsonl(in_jsonl, limit=limit))
+    return [export_case(q, idx0, out_dir, cfg=cfg, cache=cache) for idx0, q in enumerate(qs, start=1)]
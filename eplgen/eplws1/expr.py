@@ -0,0 +1,347 @@
+"""EPL conditions and expressions compiled once into Python functions.
+
+Covers what the workload generator emits (`workload_gen._rand_cond`, pattern
+guards, HAVING over aggregate aliases) plus the usual EPL subset:
+
+    or_expr   := and_expr (OR and_expr)*
+    and_expr  := not_expr (AND not_expr)*
+    not_expr  := NOT not_expr | predicate
+    predicate := sum ( (= | != | <> | < | <= | > | >=) sum )*
+               | sum IS [NOT] NULL | sum [NOT] IN (sum, ...)
+               | sum [NOT] BETWEEN sum AND sum | sum [NOT] LIKE 'pattern'
+    sum       := product ((+ | -) product)*
+    product   := unary ((* | / | %) unary)*
+    unary     := - unary | primary
+    primary   := number | 'string' | "string" | TRUE | FALSE | NULL
+               | field | field.field... | agg '(' sum | '*' ')' | '(' or_expr ')'
+
+The parser emits Python source for the whole expression, which is compiled to
+one function `(row, aggvals) -> value`, so evaluating a condition costs a single
+call with no per-event interpretation. AND/OR/NOT and comparisons have Python's
+semantics (AND/OR return an operand); an operand type error such as comparing
+a missing (None) field with a number makes the whole expression None, i.e. not
+satisfied. `compile_expr` results are cached by text.
+
+A field is looked up by its full name first; `S.f` then falls back to `f` of a
+nested event `S` (pattern tags) or, for flat join rows, to `f` itself.
+"""
+from __future__ import annotations
+
+import ast
+import functools
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Event = Dict[str, object]
+
+AGG_FUNCS = ("avg", "sum", "min", "max", "count")
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<str>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+   |(?P<num>\d+\.\d*|\.\d+|\d+)
+   |(?P<id>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+   |(?P<op><>|!=|>=|<=|=|<|>|\+|-|\*|/|%|\(|\)|,)
+)""", re.X)
+
+_CMP = {"=": "==", "==": "==", "!=": "!=", "<>": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+_LITERALS = {"true": "True", "false": "False", "null": "None"}
+
+
+def _get(row: Event, name: str) -> object:
+    v = row.get(name)
+    if v is not None or "." not in name:
+        return v
+    head, _, rest = name.partition(".")
+    inner = row.get(head)
+    if isinstance(inner, dict):
+        return _get(inner, rest)
+    return row.get(name.rsplit(".", 1)[1])
+
+
+def _like(rx: "re.Pattern[str]", v: object) -> Optional[bool]:
+    return None if v is None else rx.fullmatch(str(v)) is not None
+
+
+def like_regex(pattern: str) -> "re.Pattern[str]":
+    """SQL LIKE pattern (`%` any run, `_` one character) as a regex."""
+    return re.compile("".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern), re.S)
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    """(kind, text) pairs; kind is "str", "num", "id" or "op"."""
+    out: List[Tuple[str, str]] = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Cannot tokenize expression: {text!r} at {pos}")
+        out.append((m.lastgroup or "", m.group(m.lastgroup or 0)))
+        pos = m.end()
+    return out
+
+
+class _Parser:
+    """Recursive descent over `tokenize` output, producing Python source."""
+
+    def __init__(self, text: str, agg_offset: Optional[int]) -> None:
+        self.text = text
+        self.toks = tokenize(text)
+        self.i = 0
+        self.agg_offset = agg_offset  # None: aggregates not allowed
+        self.aggs: List[Tuple[str, Optional[Expr]]] = []
+        self.consts: Dict[str, object] = {}
+
+    # ---- token helpers ----
+
+    def _peek(self, k: int = 0) -> Tuple[str, str]:
+        j = self.i + k
+        return self.toks[j] if j < len(self.toks) else ("", "")
+
+    def _word(self, *words: str, k: int = 0) -> bool:
+        kind, tok = self._peek(k)
+        return kind == "id" and tok.lower() in words
+
+    def _op(self, *ops: str) -> bool:
+        kind, tok = self._peek()
+        return kind == "op" and tok in ops
+
+    def _next(self) -> Tuple[str, str]:
+        tok = self._peek()
+        if not tok[0]:
+            raise ValueError(f"Unexpected end of expression: {self.text!r}")
+        self.i += 1
+        return tok
+
+    def _expect(self, op: str) -> None:
+        if not self._op(op):
+            raise ValueError(f"Expected {op!r} in expression {self.text!r}, got {self._peek()[1]!r}")
+        self.i += 1
+
+    def _const(self, value: object) -> str:
+        name = f"_c{len(self.consts)}"
+        self.consts[name] = value
+        return name
+
+    # ---- grammar ----
+
+    def parse(self) -> str:
+        src = self._or()
+        if self.i != len(self.toks):
+            raise ValueError(f"Unexpected {self._peek()[1]!r} in expression {self.text!r}")
+        return src
+
+    def _or(self) -> str:
+        parts = [self._and()]
+        while self._word("or"):
+            self.i += 1
+            parts.append(self._and())
+        return parts[0] if len(parts) == 1 else "(" + " or ".join(parts) + ")"
+
+    def _and(self) -> str:
+        parts = [self._not()]
+        while self._word("and"):
+            self.i += 1
+            parts.append(self._not())
+        return parts[0] if len(parts) == 1 else "(" + " and ".join(parts) + ")"
+
+    def _not(self) -> str:
+        if self._word("not"):
+            self.i += 1
+            return f"(not {self._not()})"
+        return self._predicate()
+
+    def _predicate(self) -> str:
+        left = self._sum()
+        if self._word("is"):
+            self.i += 1
+            neg = self._word("not")
+            if neg:
+                self.i += 1
+            if not self._word("null"):
+                raise ValueError(f"Expected NULL after IS in expression {self.text!r}")
+            self.i += 1
+            return f"({left} is {'not ' if neg else ''}None)"
+        neg = self._word("not") and self._word("in", "between", "like", k=1)
+        if neg:
+            self.i += 1
+        if self._word("in"):
+            self.i += 1
+            self._expect("(")
+            items = [self._sum()]
+            while self._op(","):
+                self.i += 1
+                items.append(self._sum())
+            self._expect(")")
+            return f"({left} {'not in' if neg else 'in'} ({', '.join(items)},))"
+        if self._word("between"):
+            self.i += 1
+            lo = self._sum()
+            if not self._word("and"):
+                raise ValueError(f"Expected AND in BETWEEN in expression {self.text!r}")
+            self.i += 1
+            hi = self._sum()
+            return f"({'not ' if neg else ''}({lo} <= {left} <= {hi}))"
+        if self._word("like"):
+            self.i += 1
+            kind, tok = self._next()
+            if kind != "str":
+                raise ValueError(f"LIKE needs a string pattern in expression {self.text!r}")
+            rx = self._const(like_regex(ast.literal_eval(tok)))
+            return f"({'not ' if neg else ''}_like({rx}, {left}))"
+        if neg:
+            raise ValueError(f"Unexpected NOT in expression {self.text!r}")
+        chain = [left]
+        while self._op(*_CMP):
+            chain.append(_CMP[self._next()[1]])
+            chain.append(self._sum())
+        return left if len(chain) == 1 else "(" + " ".join(chain) + ")"
+
+    def _sum(self) -> str:
+        out = self._product()
+        while self._op("+", "-"):
+            op = self._next()[1]
+            out = f"({out} {op} {self._product()})"
+        return out
+
+    def _product(self) -> str:
+        out = self._unary()
+        while self._op("*", "/", "%"):
+            op = self._next()[1]
+            out = f"({out} {op} {self._unary()})"
+        return out
+
+    def _unary(self) -> str:
+        if self._op("-"):
+            self.i += 1
+            return f"(-{self._unary()})"
+        if self._op("+"):
+            self.i += 1
+            return self._unary()
+        return self._primary()
+
+    def _primary(self) -> str:
+        kind, tok = self._next()
+        if kind == "num":
+            return repr(float(tok)) if "." in tok else repr(int(tok))  # e.g. 01 is not Python
+        if kind == "str":
+            return repr(ast.literal_eval(tok))
+        if kind == "op":
+            if tok != "(":
+                raise ValueError(f"Unexpected {tok!r} in expression {self.text!r}")
+            inner = self._or()
+            self._expect(")")
+            return inner
+        low = tok.lower()
+        if self._op("("):
+            return self._call(tok, low)
+        if low in _LITERALS:
+            return _LITERALS[low]
+        return f"_r.get({tok!r})" if "." not in tok else f"_get(_r, {tok!r})"
+
+    def _call(self, tok: str, low: str) -> str:
+        # only aggregates are supported; their values arrive in `aggvals`
+        if low not in AGG_FUNCS or self.agg_offset is None:
+            raise ValueError(f"Unsupported function in expression: {tok}(...)")
+        start = self.i + 1
+        depth, j = 0, self.i
+        while j < len(self.toks):
+            if self.toks[j][1] == "(":
+                depth += 1
+            elif self.toks[j][1] == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+            j += 1
+        if j >= len(self.toks):
+            raise ValueError(f"Unbalanced parentheses in expression {self.text!r}")
+        inner = self.toks[start:j]
+        if not inner:
+            raise ValueError(f"Missing argument in expression: {tok}()")
+        if len(inner) == 1 and inner[0][1] == "*":
+            if low != "count":
+                raise ValueError(f"Unsupported aggregate: {tok}(*)")
+            arg = None
+        else:
+            arg = compile_expr(" ".join(t for _, t in inner))
+        self.i = j + 1
+        self.aggs.append((low, arg))
+        return f"_a[{self.agg_offset + len(self.aggs) - 1}]"
+
+
+class Expr:
+    """An expression compiled to `fn(row, aggvals) -> value`.
+
+    `aggs` lists the (function, argument) aggregates the expression reads, in the
+    order their values are expected in `aggvals` (starting at the offset given
+    to `compile_expr`); the argument is None for `count(*)`.
+    """
+
+    __slots__ = ("text", "fn", "aggs", "source")
+
+    def __init__(self, text: str, fn: Callable[[Event, Sequence[object]], object],
+                 aggs: Tuple[Tuple[str, Optional["Expr"]], ...] = (), source: str = "") -> None:
+        self.text = text
+        self.fn = fn
+        self.aggs = aggs
+        self.source = source  # the generated Python expression
+
+    def __repr__(self) -> str:
+        return f"Expr({self.text!r})"
+
+    def __call__(self, row: Event, aggvals: Sequence[object] = ()) -> object:
+        try:
+            return self.fn(row, aggvals)
+        except (TypeError, ZeroDivisionError):
+            return None
+
+    def test(self, row: Event, aggvals: Sequence[object] = ()) -> bool:
+        try:
+            return bool(self.fn(row, aggvals))
+        except (TypeError, ZeroDivisionError):
+            return False
+
+    def filter(self, rows: Iterable[Event]) -> List[Event]:
+        """The rows satisfying the expression (as a condition)."""
+        fn = self.fn
+        out: List[Event] = []
+        for r in rows:
+            try:
+                if fn(r, ()):
+                    out.append(r)
+            except (TypeError, ZeroDivisionError):
+                pass
+        return out
+
+
+@functools.lru_cache(maxsize=1 << 12)
+def _compile(text: str, agg_offset: Optional[int]) -> Expr:
+    p = _Parser(text, agg_offset)
+    src = p.parse()
+    env: Dict[str, object] = {"_get": _get, "_like": _like, "__builtins__": {}}
+    env.update(p.consts)
+    try:
+        code = compile(f"lambda _r, _a: {src}", f"<expr {text[:40]!r}>", "eval")
+    except SyntaxError as e:
+        raise ValueError(f"Cannot compile expression: {text!r}") from e
+    fn = eval(code, env)
+    return Expr(text, fn, tuple(p.aggs), src)
+
+
+def compile_expr(text: str, aggs: Optional[List[Tuple[str, Optional[Expr]]]] = None) -> Expr:
+    """Compile (or fetch from the cache) the expression `text`; raises ValueError outside the grammar.
+
+    Aggregates are only accepted when `aggs` is given: the expression's own
+    aggregates are appended to it, and its function reads their values at the
+    matching positions of `aggvals`, so several expressions can share one list.
+    """
+    if aggs is None:
+        return _compile(text.strip(), None)
+    expr = _compile(text.strip(), len(aggs))
+    aggs.extend(expr.aggs)
+    return expr
+
+
+def filter_events(events: Iterable[Event], cond: Optional[str]) -> List[Event]:
+    """Events satisfying `cond` (all of them for an empty condition), e.g. to pre-filter a dataset."""
+    return list(events) if not cond else compile_expr(cond).filter(events)
@@ -0,0 +1,209 @@
+"""Canonical form and fingerprint of a query, for deduplicating workloads.
+
+Two queries get the same fingerprint when they differ only in
+- whitespace and the letter case of keywords and function names,
+- time-window units (`time(60 sec)`, `time(60 seconds)`, `time(1 min)`),
+- the order (or repetition) of AND-ed conditions in WHERE, HAVING, stream
+  filters and pattern guards, and the order of GROUP BY expressions,
+- the names of pattern variables (renamed to v1, v2, ... in order of appearance).
+
+FROM sources and the select list keep their order.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import re
+from dataclasses import replace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .ast import PatternSource, SelectQuery, StreamSource, WindowSpec
+from .optimize import join_conjuncts, split_conjuncts
+from .parse import Token, _split_top_level, parse_select_query, tokenize
+from .print_epl import query_to_epl
+
+_KEYWORDS = frozenset(("and", "or", "not", "is", "null", "true", "false", "in", "between", "like", "as", "every"))
+
+_TIME_UNITS_SEC = {
+    "msec": 0.001, "millisecond": 0.001, "milliseconds": 0.001,
+    "sec": 1, "second": 1, "seconds": 1,
+    "min": 60, "minute": 60, "minutes": 60,
+    "hour": 3600, "hours": 3600,
+}
+_WINDOW = re.compile(r"^\s*(\w+)\s*\((.*)\)\s*$")
+_TIME_ARG = re.compile(r"^(\d+(?:\.\d+)?)\s*([A-Za-z]*)$")
+
+
+def _atoms(toks: List[Token], rename: Dict[str, str]) -> List[str]:
+    out: List[str] = []
+    for i, t in enumerate(toks):
+        if t.kind == "word":
+            nxt = toks[i + 1] if i + 1 < len(toks) else None
+            low = t.text.lower()
+            if low in _KEYWORDS or (nxt is not None and nxt.kind == "open" and nxt.text == "("):
+                out.append(low)
+            else:
+                prev = out[-1] if out else ""
+                out.append(rename.get(t.text, t.text) if prev != "." else t.text)
+        elif t.kind in ("other", "sep"):
+            txt = "".join(t.text.split())
+            if txt:
+                out.append(txt)
+        else:
+            out.append(t.text)
+    return out
+
+
+def _join_atoms(atoms: List[str]) -> str:
+    # single spaces, but none inside a.x, f(x), R(cond), (..) and [..]
+    s = ""
+    prev = ""
+    for a in atoms:
+        tight = (
+            prev[-1:] in (".", "(", "[") or a[0] in (".", ")", "]", ",")
+            or a[0] == "(" and prev[-1:].isalnum() and prev.lower() not in _KEYWORDS
+        )
+        if s and not tight:
+            s += " "
+        s += a
+        prev = a
+    return s
+
+
+def canonical_expr(text: str, rename: Optional[Dict[str, str]] = None) -> str:
+    return _join_atoms(_atoms(tokenize(text), rename or {}))
+
+
+def canonical_cond(cond: str, rename: Optional[Dict[str, str]] = None) -> str:
+    """Conjuncts canonicalized, deduplicated and sorted (`x BETWEEN lo AND hi` is one conjunct)."""
+    return join_conjuncts(sorted({canonical_expr(c, rename) for c in split_conjuncts(cond)}))
+
+
+def canonical_window(func: str) -> str:
+    m = _WINDOW.match(func)
+    if not m:
+        return canonical_expr(func)
+    kind, arg = m.group(1).lower(), m.group(2).strip()
+    if kind == "time":
+        mt = _TIME_ARG.match(arg)
+        if mt and (mt.group(2).lower() or "sec") in _TIME_UNITS_SEC:
+            secs = float(mt.group(1)) * _TIME_UNITS_SEC[mt.group(2).lower() or "sec"]
+            return f"time({secs:g} sec)"
+    return f"{kind}({canonical_expr(arg)})"
+
+
+def _pattern_vars(pattern: str) -> Dict[str, str]:
+    """var -> v1, v2, ... for every `var=Stream` tag, in order of appearance."""
+    toks = tokenize(pattern)
+    out: Dict[str, str] = {}
+    for i in range(len(toks) - 2):
+        a, eq, b = toks[i], toks[i + 1], toks[i + 2]
+        if a.kind == "word" and eq.kind == "other" and eq.text.strip() == "=" and b.kind == "word":
+            out.setdefault(a.text, f"v{len(out) + 1}")
+    return out
+
+
+def canonical_pattern(pattern: str, rename: Dict[str, str]) -> str:
+    """Pattern text with renamed variables and canonical guard conditions."""
+    toks = tokenize(pattern)
+    pieces: List[str] = []
+    i = 0
+    while i < len(toks):
+        t = toks[i]
+        # a guard is the (...) right after `var=Stream`
+        if (
+            t.kind == "open" and t.text == "(" and i >= 3 and toks[i - 1].kind == "word"
+            and toks[i - 2].text.strip() == "=" and toks[i - 3].kind == "word"
+        ):
+            j = i + 1
+            while j < len(toks) and not (toks[j].kind == "close" and toks[j].depth == t.depth):
+                j += 1
+            inner = pattern[t.start + 1:toks[j].start] if j < len(toks) else pattern[t.start + 1:]
+            pieces.append("(" + canonical_cond(inner, rename) + ")")
+            i = j + 1
+            continue
+        pieces.append(_join_atoms(_atoms([t], rename)))
+        i += 1
+    return _join_atoms([p for p in pieces if p])
+
+
+def canonical_query(q: SelectQuery) -> SelectQuery:
+    rename: Dict[str, str] = {}
+    for src in q.from_sources:
+        if isinstance(src, PatternSource):
+            for var in _pattern_vars(src.pattern):
+                rename.setdefault(var, f"v{len(rename) + 1}")
+
+    sources = []
+    for src in q.from_sources:
+        if isinstance(src, PatternSource):
+            sources.append(PatternSource(pattern=canonical_pattern(src.pattern, rename)))
+        else:
+            sources.append(StreamSource(
+                name=src.name,
+                filter_cond=canonical_cond(src.filter_cond) if src.filter_cond else None,
+                window=WindowSpec(func=canonical_window(src.window.func)) if src.window else None,
+            ))
+    return replace(
+        q,
+        select=", ".join(canonical_expr(s, rename) for s in _split_top_level(q.select, ",")),
+        from_sources=sources,
+        where=canonical_cond(q.where, rename) if q.where else None,
+        group_by=", ".join(sorted(canonical_expr(g, rename) for g in _split_top_level(q.group_by, ","))) if q.group_by else None,
+        having=canonical_cond(q.having, rename) if q.having else None,
+    )
+
+
+def canonical_text(query: str) -> str:
+    return query_to_epl(canonical_query(parse_select_query(query)))
+
+
+def fingerprint(query: str | SelectQuery) -> str:
+    """Stable 128-bit hex fingerprint of the canonical form."""
+    if isinstance(query, str):
+        return _fingerprint_text(query)
+    text = query_to_epl(canonical_query(query))
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _fingerprint_text(query: str) -> str:
+    # generated workloads repeat many queries verbatim
+    return fingerprint(parse_select_query(query))
+
+
+# ---------------------------
+# Deduplication
+# ---------------------------
+
+def dedup(queries: Iterable[str]) -> List[Tuple[str, str, int]]:
+    """(first query text, fingerprint, multiplicity) per distinct fingerprint, in first-seen order."""
+    seen: Dict[str, List] = {}
+    for q in queries:
+        fp = fingerprint(q)
+        entry = seen.get(fp)
+        if entry is None:
+            seen[fp] = [q, 1]
+        else:
+            entry[1] += 1
+    return [(q, fp, n) for fp, (q, n) in seen.items()]
+
+
+def unique(queries: Iterable[str], limit: int, *, max_draws: Optional[int] = None) -> Iterator[str]:
+    """Yield the first `limit` queries with distinct fingerprints.
+
+    Stops early (with fewer queries) after `max_draws` candidates, so a workload
+    larger than the generator's distinct-query space still terminates.
+    """
+    if limit <= 0:
+        return
+    seen = set()
+    for draws, q in enumerate(queries, start=1):
+        if max_draws is not None and draws > max_draws:
+            return
+        fp = fingerprint(q)
+        if fp not in seen:
+            seen.add(fp)
+            yield q
+            if len(seen) >= limit:
+                return
@@ -1,22 +1,182 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Awaitable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+import asyncio
 import json
+import math
+import shlex
+import signal
+import time
+import traceback
 
-from .engines.base import Engine, Event
+from .cache import DecompositionCache
+from .engines.base import AsyncEngine, Engine, Event, ThreadedEngine
+from .io_utils import iter_jsonl, open_text
 from .parse import parse_select_query
 from .decompose import decompose_select_query
+from .synth_events import generate_inputs
+from .config import DEFAULT_SCHEMA_STREAMS
 
-def _multiset_key(ev: Event) -> Tuple:
-    # Stable comparison key: sort items; ignore engine-specific metadata keys if desired.
-    return tuple(sorted((k, json.dumps(v, sort_keys=True, default=str)) for k,v in ev.items()))
+# ---------------------------
+# Output comparison
+# ---------------------------
+# Outputs are compared as multisets (bags) of events. Each event is reduced to a
+# hashable canonical form and counted, so a comparison is O(n); only the residue
+# that differs is kept, and reports carry a capped sample of it.
 
-def compare_outputs(a: List[Event], b: List[Event]) -> bool:
+_FLOAT = object()  # stands in for every float in an event's "shape"
+_NAN = ("nan",)    # every NaN, so that NaN outputs match (NaN != NaN)
+_PLAIN = frozenset((str, int, float))
+
+
+def _canon(v: object) -> Hashable:
+    if isinstance(v, dict):
+        return tuple(sorted((str(k), _canon(x)) for k, x in v.items()))
+    if isinstance(v, (list, tuple)):
+        return ("[]",) + tuple(_canon(x) for x in v)
+    if isinstance(v, bool) or v is None:
+        return ("lit", v)  # keep True/1 and None apart
+    if isinstance(v, float) and v != v:
+        return _NAN
+    if isinstance(v, (int, float, str)):
+        return v  # numerically equal ints and floats compare equal
+    return ("str", str(v))
+
+
+def _shape(v: object) -> Hashable:
+    """Canonical form with all floats blanked out (tolerant matching buckets by it)."""
+    if isinstance(v, float):
+        return _FLOAT
+    if isinstance(v, tuple):
+        return tuple(_shape(x) for x in v)
+    return v
+
+
+def _floats(v: object, out: List[float]) -> List[float]:
+    if isinstance(v, float):
+        out.append(v)
+    elif isinstance(v, tuple):
+        for x in v:
+            _floats(x, out)
+    return out
+
+
+@dataclass
+class OutputDiff:
+    """Multiset difference between an expected (`a`) and an actual (`b`) output."""
+    n_a: int
+    n_b: int
+    missing: int = 0                                              # in a, not in b
+    extra: int = 0                                                # in b, not in a
+    missing_sample: List[Tuple[Event, int]] = field(default_factory=list)  # (event, count)
+    extra_sample: List[Tuple[Event, int]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.extra
+
+    def format(self, a_name: str = "a", b_name: str = "b") -> str:
+        lines = [
+            f"{a_name}: {self.n_a} events, {b_name}: {self.n_b} events; "
+            f"{self.missing} only in {a_name}, {self.extra} only in {b_name}"
+        ]
+        for label, sample, total in (
+            (f"only in {a_name}", self.missing_sample, self.missing),
+            (f"only in {b_name}", self.extra_sample, self.extra),
+        ):
+            shown = 0
+            for ev, n in sample:
+                lines.append(f"  {label} x{n}: {json.dumps(ev, sort_keys=True, default=str)}")
+                shown += n
+            if total > shown:
+                lines.append(f"  ... and {total - shown} more {label}")
+        return "\n".join(lines)
+
+
+def _count(events: Iterable[Event], ignore: frozenset) -> Tuple[Counter, Dict[Hashable, Event]]:
+    counts: Counter = Counter()
+    first: Dict[Hashable, Event] = {}
+    for ev in events:
+        cev = {k: v for k, v in ev.items() if k not in ignore} if ignore else ev
+        if all(type(v) in _PLAIN and v == v for v in cev.values()):
+            key: Hashable = tuple(sorted(cev.items()))  # == _canon(cev) for flat events, but faster
+        else:
+            key = _canon(cev)
+        counts[key] += 1
+        if key not in first:
+            first[key] = ev
+    return counts, first
+
+
+def _match_tolerant(only_a: Counter, only_b: Counter, abs_tol: float, rel_tol: float) -> None:
+    """Cancel residual a/b events that agree up to float tolerance (in place)."""
+    buckets: Dict[Hashable, List[Hashable]] = {}
+    for key in only_b:
+        buckets.setdefault(_shape(key), []).append(key)
+    for ka in list(only_a):
+        cands = buckets.get(_shape(ka))
+        if not cands:
+            continue
+        fa = _floats(ka, [])
+        for kb in cands:
+            if not only_b[kb]:
+                continue
+            if all(math.isclose(x, y, rel_tol=rel_tol, abs_tol=abs_tol) for x, y in zip(fa, _floats(kb, []))):
+                n = min(only_a[ka], only_b[kb])
+                only_a[ka] -= n
+                only_b[kb] -= n
+                if not only_a[ka]:
+                    break
+    only_a += Counter()  # drop zero counts
+    only_b += Counter()
+
+
+def diff_outputs(
+    a: Iterable[Event],
+    b: Iterable[Event],
+    *,
+    ignore_keys: Iterable[str] = (),
+    abs_tol: float = 0.0,
+    rel_tol: float = 0.0,
+    sample: int = 5,
+) -> OutputDiff:
+    """Multiset diff of two outputs.
+
+    Keys in `ignore_keys` are dropped before comparing; floats match within
+    `abs_tol`/`rel_tol` (as in `math.isclose`). At most `sample` distinct missing and
+    extra events are kept, with their multiplicities.
+    """
+    ignore = frozenset(ignore_keys)
+    ca, first_a = _count(a, ignore)
+    cb, first_b = _count(b, ignore)
+    diff = OutputDiff(n_a=sum(ca.values()), n_b=sum(cb.values()))
+    only_a, only_b = ca - cb, cb - ca
+    del ca, cb
+    if only_a and only_b and (abs_tol or rel_tol):
+        _match_tolerant(only_a, only_b, abs_tol, rel_tol)
+    diff.missing = sum(only_a.values())
+    diff.extra = sum(only_b.values())
+    diff.missing_sample = [(first_a[k], n) for k, n in only_a.most_common(sample)]
+    diff.extra_sample = [(first_b[k], n) for k, n in only_b.most_common(sample)]
+    return diff
+
+
+def compare_outputs(
+    a: Iterable[Event],
+    b: Iterable[Event],
+    *,
+    ignore_keys: Iterable[str] = (),
+    abs_tol: float = 0.0,
+    rel_tol: float = 0.0,
+) -> bool:
     # Multiset semantics (bag) by default.
-    sa = sorted((_multiset_key(e) for e in a))
-    sb = sorted((_multiset_key(e) for e in b))
-    return sa == sb
+    return diff_outputs(a, b, ignore_keys=ignore_keys, abs_tol=abs_tol, rel_tol=rel_tol, sample=0).ok
+
 
 @dataclass
 class HarnessResult:
@@ -24,40 +184,446 @@ class HarnessResult:
     name: str
     details: str
 
+def _decomposed_statements(query: str, create_window_mode: str, optimize: bool, cache: Optional[DecompositionCache]) -> List[str]:
+    if cache is not None:
+        prog, _ = cache.decompose(query, create_window_mode=create_window_mode, optimize=optimize)
+    else:
+        q = parse_select_query(query)
+        prog, _ = decompose_select_query(q, create_window_mode=create_window_mode, optimize=optimize)
+    return prog.statements
+
+
+def _orig_vs_decomp_result(out_orig: List[Event], out_decomp: List[Event], statements: List[str], **cmp) -> HarnessResult:
+    diff = diff_outputs(out_orig, out_decomp, **cmp)
+    details = ""
+    if not diff.ok:
+        details = (
+            "Mismatch\n"
+            f"{diff.format('original', 'decomposed')}\n"
+            f"decomposed_program={statements}"
+        )
+    return HarnessResult(ok=diff.ok, name="orig_vs_decomp", details=details)
+
+
+def _semantics_vs_esper_result(out_e: List[Event], out_s: List[Event], statements: List[str], **cmp) -> HarnessResult:
+    diff = diff_outputs(out_e, out_s, **cmp)
+    details = ""
+    if not diff.ok:
+        details = f"Mismatch\n{diff.format('esper', 'semantics')}\nstatements={statements}"
+    return HarnessResult(ok=diff.ok, name="semantics_vs_esper", details=details)
+
+
 def run_original_vs_decomposed(
     engine: Engine,
     query: str,
     events: Dict[str, List[Event]],
     *,
     create_window_mode: str = "paper",
+    optimize: bool = False,
+    cache: Optional[DecompositionCache] = None,
+    ignore_keys: Iterable[str] = (),
+    abs_tol: float = 0.0,
+    rel_tol: float = 0.0,
+    sample: int = 5,
 ) -> HarnessResult:
-    q = parse_select_query(query)
-    prog, _ = decompose_select_query(q, create_window_mode=create_window_mode)
-
+    statements = _decomposed_statements(query, create_window_mode, optimize, cache)
     out_orig = engine.run([query], events)
-    out_decomp = engine.run(prog.statements, events)
-
-    ok = compare_outputs(out_orig, out_decomp)
-    details = ""
-    if not ok:
-        details = (
-            "Mismatch\n"
-            f"original_out={out_orig}\n"
-            f"decomposed_out={out_decomp}\n"
-            f"decomposed_program={prog.statements}"
-        )
-    return HarnessResult(ok=ok, name="orig_vs_decomp", details=details)
+    out_decomp = engine.run(statements, events)
+    return _orig_vs_decomp_result(
+        out_orig, out_decomp, statements, ignore_keys=ignore_keys, abs_tol=abs_tol, rel_tol=rel_tol, sample=sample,
+    )
 
 def run_semantics_vs_esper(
     esper: Engine,
     semantics: Engine,
     statements: List[str],
     events: Dict[str, List[Event]],
+    *,
+    ignore_keys: Iterable[str] = (),
+    abs_tol: float = 0.0,
+    rel_tol: float = 0.0,
+    sample: int = 5,
 ) -> HarnessResult:
     out_e = esper.run(statements, events)
     out_s = semantics.run(statements, events)
-    ok = compare_outputs(out_e, out_s)
-    details = ""
-    if not ok:
-        details = f"Mismatch\nesper_out={out_e}\nsemantics_out={out_s}\nstatements={statements}"
-    return HarnessResult(ok=ok, name="semantics_vs_esper", details=details)
+    return _semantics_vs_esper_result(
+        out_e, out_s, statements, ignore_keys=ignore_keys, abs_tol=abs_tol, rel_tol=rel_tol, sample=sample,
+    )
+
+
+# ---------------------------
+# Async variants
+# ---------------------------
+# Same checks against an `AsyncEngine`; both programs of a case run concurrently.
+
+async def run_original_vs_decomposed_async(
+    engine: AsyncEngine,
+    query: str,
+    events: Dict[str, List[Event]],
+    *,
+    create_window_mode: str = "paper",
+    optimize: bool = False,
+    cache: Optional[DecompositionCache] = None,
+    ignore_keys: Iterable[str] = (),
+    abs_tol: float = 0.0,
+    rel_tol: float = 0.0,
+    sample: int = 5,
+) -> HarnessResult:
+    statements = _decomposed_statements(query, create_window_mode, optimize, cache)
+    out_orig, out_decomp = await asyncio.gather(engine.run([query], events), engine.run(statements, events))
+    return _orig_vs_decomp_result(
+        out_orig, out_decomp, statements, ignore_keys=ignore_keys, abs_tol=abs_tol, rel_tol=rel_tol, sample=sample,
+    )
+
+
+async def run_semantics_vs_esper_async(
+    esper: AsyncEngine,
+    semantics: AsyncEngine,
+    statements: List[str],
+    events: Dict[str, List[Event]],
+    *,
+    ignore_keys: Iterable[str] = (),
+    abs_tol: float = 0.0,
+    rel_tol: float = 0.0,
+    sample: int = 5,
+) -> HarnessResult:
+    out_e, out_s = await asyncio.gather(esper.run(statements, events), semantics.run(statements, events))
+    return _semantics_vs_esper_result(
+        out_e, out_s, statements, ignore_keys=ignore_keys, abs_tol=abs_tol, rel_tol=rel_tol, sample=sample,
+    )
+
+
+# ---------------------------
+# Batch harness over workloads
+# ---------------------------
+
+@dataclass(frozen=True)
+class HarnessConfig:
+    engine: str = "reference"             # "reference", "cmd" or "server"
+    runner_cmd: Optional[str] = None      # shell-style command for "cmd"/"server"
+    check: str = "orig_vs_decomp"         # or "semantics_vs_esper" (engine vs reference)
+    create_window_mode: str = "paper"
+    optimize: bool = False
+    schema_streams: Sequence[str] = DEFAULT_SCHEMA_STREAMS
+    n_per_stream: int = 200
+    seed: int = 0
+    generator: str = "python"             # "python" or "numpy"
+    timeout: Optional[float] = None       # per-case wall-clock limit, seconds
+    ignore_keys: Sequence[str] = ()       # output keys left out of the comparison
+    abs_tol: float = 0.0                  # float tolerance, as in math.isclose
+    rel_tol: float = 0.0
+    sample: int = 5                       # distinct missing/extra events shown per mismatch
+    result_cache: Optional[str] = None    # SQLite file caching engine outputs (engines.result_cache)
+    result_cache_bytes: int = 1 << 30
+    engine_version: Optional[str] = None  # part of the result cache key; defaults to the engine's `version`
+    events_via: str = "inline"            # "file": runners read a spilled dataset (engines.events_file)
+    spill_format: str = "csv"             # "csv" or "evb"
+
+
+@dataclass
+class WorkloadSummary:
+    total: int = 0
+    ok: int = 0
+    mismatch: int = 0
+    error: int = 0
+    timeout: int = 0
+    elapsed_s: float = 0.0
+    cases_per_s: float = 0.0
+    top_errors: Dict[str, int] = field(default_factory=dict)
+
+
+def make_engine(kind: str, runner_cmd: Optional[str] = None, *, events_via: str = "inline", spill_format: str = "csv") -> Engine:
+    if kind == "reference":
+        from .engines.reference import ReferenceEngine
+        return ReferenceEngine()
+    if kind in ("cmd", "server"):
+        if not runner_cmd:
+            raise ValueError(f"engine={kind!r} requires a runner command")
+        from .engines.esper_cmd import EsperCmdEngine, EsperServerEngine
+        cmd = shlex.split(runner_cmd)
+        kw = dict(events_via=events_via, spill_format=spill_format)
+        return EsperCmdEngine(cmd, **kw) if kind == "cmd" else EsperServerEngine(cmd, **kw)
+    raise ValueError(f"Unknown engine: {kind}")
+
+
+class CaseTimeout(Exception):
+    pass
+
+
+@contextmanager
+def _deadline(seconds: Optional[float]) -> Iterator[None]:
+    # SIGALRM only fires in the main thread, which is where pool workers run tasks.
+    if not seconds or not hasattr(signal, "SIGALRM"):
+        yield
+        return
+
+    def _raise(signum, frame):
+        raise CaseTimeout(f"case exceeded {seconds}s")
+
+    prev = signal.signal(signal.SIGALRM, _raise)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, prev)
+
+
+_worker_engines: Dict[str, Engine] = {}
+
+
+def _cached(engine: Engine, cfg: HarnessConfig, version: Optional[str]) -> Engine:
+    if not cfg.result_cache:
+        return engine
+    from .engines.result_cache import CachedEngine
+    return CachedEngine(engine, cfg.result_cache, engine_version=version, max_bytes=cfg.result_cache_bytes)
+
+
+def _engines_for(cfg: HarnessConfig) -> Tuple[Engine, Optional[Engine]]:
+    # one engine (and, for persistent runners, one runner process) per worker process
+    key = f"{cfg.engine}:{cfg.runner_cmd}:{cfg.result_cache}"
+    if key not in _worker_engines:
+        engine = make_engine(cfg.engine, cfg.runner_cmd, events_via=cfg.events_via, spill_format=cfg.spill_format)
+        _worker_engines[key] = _cached(engine, cfg, cfg.engine_version)
+    if cfg.check != "semantics_vs_esper":
+        return _worker_engines[key], None
+    ref = f"reference:{cfg.result_cache}"
+    if ref not in _worker_engines:
+        _worker_engines[ref] = _cached(make_engine("reference"), cfg, None)
+    return _worker_engines[key], _worker_engines[ref]
+
+
+def _flush_engines() -> None:
+    # pool workers exit without running atexit hooks, so cached results are committed per case
+    for engine in _worker_engines.values():
+        flush = getattr(engine, "flush", None)
+        if flush is not None:
+            flush()
+
+
+def _case_inputs(index: int, cfg: HarnessConfig) -> Dict[str, List[Event]]:
+    return generate_inputs(
+        seed=cfg.seed + index,
+        n_per_stream=cfg.n_per_stream,
+        streams=list(cfg.schema_streams),
+        backend=cfg.generator,
+    )
+
+
+def _case_cmp(cfg: HarnessConfig) -> dict:
+    return dict(ignore_keys=cfg.ignore_keys, abs_tol=cfg.abs_tol, rel_tol=cfg.rel_tol, sample=cfg.sample)
+
+
+def run_case(index: int, query: str, cfg: HarnessConfig) -> dict:
+    """Run one workload case; never raises, returns a JSON-ready record."""
+    t0 = time.perf_counter()
+    rec = {"index": index, "query": query}
+    try:
+        with _deadline(cfg.timeout):
+            engine, semantics = _engines_for(cfg)
+            events = _case_inputs(index, cfg)
+            cmp = _case_cmp(cfg)
+            if semantics is not None:
+                res = run_semantics_vs_esper(engine, semantics, [query], events, **cmp)
+            else:
+                res = run_original_vs_decomposed(engine, query, events, create_window_mode=cfg.create_window_mode, optimize=cfg.optimize, **cmp)
+        rec.update(asdict(res), status="ok" if res.ok else "mismatch")
+    except CaseTimeout as e:
+        rec.update(ok=False, name=cfg.check, details=str(e), status="timeout")
+    except Exception:
+        rec.update(ok=False, name=cfg.check, details=traceback.format_exc(), status="error")
+    if cfg.result_cache:
+        _flush_engines()
+    rec["elapsed_s"] = round(time.perf_counter() - t0, 6)
+    return rec
+
+
+def _error_key(rec: dict) -> str:
+    lines = [l for l in rec["details"].strip().splitlines() if l.strip()]
+    return lines[-1][:200] if lines else rec["status"]
+
+
+def run_workload(
+    queries: Iterable[str],
+    cfg: HarnessConfig = HarnessConfig(),
+    *,
+    out: Optional[TextIO] = None,
+    workers: int = 1,
+    start_index: int = 1,
+) -> WorkloadSummary:
+    """Run every query through `run_case`, fanning out over `workers` processes.
+
+    Records are written to `out` as JSONL in completion order (use the `index`
+    field to restore input order). Queries are consumed lazily with a bounded
+    number of cases in flight.
+    """
+    summary = WorkloadSummary()
+    errors: Counter = Counter()
+    t0 = time.perf_counter()
+
+    def record(rec: dict) -> None:
+        _record(summary, errors, out, rec)
+
+    cases = enumerate(queries, start=start_index)
+    if workers <= 1:
+        for idx, q in cases:
+            record(run_case(idx, q, cfg))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for idx, q in cases:
+                pending.add(pool.submit(run_case, idx, q, cfg))
+                if len(pending) >= 4 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        record(fut.result())
+            for fut in as_completed(pending):
+                record(fut.result())
+
+    return _finish(summary, errors, t0)
+
+
+def _record(summary: WorkloadSummary, errors: Counter, out: Optional[TextIO], rec: dict) -> None:
+    summary.total += 1
+    setattr(summary, rec["status"], getattr(summary, rec["status"]) + 1)
+    if rec["status"] in ("error", "timeout"):
+        errors[_error_key(rec)] += 1
+    if out is not None:
+        out.write(json.dumps(rec) + "\n")
+
+
+def _finish(summary: WorkloadSummary, errors: Counter, t0: float) -> WorkloadSummary:
+    summary.elapsed_s = time.perf_counter() - t0
+    summary.cases_per_s = summary.total / summary.elapsed_s if summary.elapsed_s > 0 else 0.0
+    summary.top_errors = dict(errors.most_common(10))
+    return summary
+
+
+# ---------------------------
+# Async batch harness
+# ---------------------------
+# One event-loop coordinator instead of a process pool: inputs and decompositions
+# are computed in the loop, engine runs are awaited, so with an external runner
+# the Python side is mostly idle while `concurrency` runner processes work.
+
+def make_async_engine(
+    kind: str,
+    runner_cmd: Optional[str] = None,
+    *,
+    concurrency: int = 4,
+    timeout: Optional[float] = None,
+    events_via: str = "inline",
+    spill_format: str = "csv",
+) -> AsyncEngine:
+    """`cmd`: `AsyncEsperCmdEngine`; `server`/`reference`: the sync engine in worker threads."""
+    kw = dict(events_via=events_via, spill_format=spill_format)
+    if kind == "cmd":
+        if not runner_cmd:
+            raise ValueError("engine='cmd' requires a runner command")
+        from .engines.esper_cmd import AsyncEsperCmdEngine
+        return AsyncEsperCmdEngine(shlex.split(runner_cmd), concurrency=concurrency, timeout=timeout, **kw)
+    if kind == "server":
+        if not runner_cmd:
+            raise ValueError("engine='server' requires a runner command")
+        from .engines.esper_cmd import EsperServerEngine
+        return ThreadedEngine(EsperServerEngine(shlex.split(runner_cmd), pool_size=concurrency, timeout=timeout, **kw))
+    return ThreadedEngine(make_engine(kind, runner_cmd))
+
+
+async def run_case_async(
+    index: int,
+    query: str,
+    cfg: HarnessConfig,
+    engine: AsyncEngine,
+    semantics: Optional[AsyncEngine] = None,
+) -> dict:
+    """`run_case` against an `AsyncEngine` (`semantics` is required for semantics_vs_esper)."""
+    t0 = time.perf_counter()
+    rec = {"index": index, "query": query}
+    try:
+        events = _case_inputs(index, cfg)
+        cmp = _case_cmp(cfg)
+        coro: Awaitable[HarnessResult]
+        if cfg.check == "semantics_vs_esper":
+            if semantics is None:
+                raise ValueError("semantics_vs_esper needs a semantics engine")
+            coro = run_semantics_vs_esper_async(engine, semantics, [query], events, **cmp)
+        else:
+            coro = run_original_vs_decomposed_async(engine, query, events, create_window_mode=cfg.create_window_mode, optimize=cfg.optimize, **cmp)
+        res = await asyncio.wait_for(coro, cfg.timeout)
+        rec.update(asdict(res), status="ok" if res.ok else "mismatch")
+    except asyncio.TimeoutError:
+        rec.update(ok=False, name=cfg.check, details=f"case exceeded {cfg.timeout}s", status="timeout")
+    except Exception:
+        rec.update(ok=False, name=cfg.check, details=traceback.format_exc(), status="error")
+    rec["elapsed_s"] = round(time.perf_counter() - t0, 6)
+    return rec
+
+
+async def run_workload_async(
+    queries: Iterable[str],
+    cfg: HarnessConfig = HarnessConfig(),
+    *,
+    out: Optional[TextIO] = None,
+    concurrency: int = 4,
+    start_index: int = 1,
+    engine: Optional[AsyncEngine] = None,
+) -> WorkloadSummary:
+    """Like `run_workload`, with up to `concurrency` cases in flight in this event loop.
+
+    Records are written in completion order. `engine` defaults to
+    `make_async_engine(cfg.engine, cfg.runner_cmd, concurrency=concurrency)`.
+    """
+    summary = WorkloadSummary()
+    errors: Counter = Counter()
+    t0 = time.perf_counter()
+    owned = engine is None
+    if engine is None:
+        engine = make_async_engine(
+            cfg.engine, cfg.runner_cmd, concurrency=concurrency, events_via=cfg.events_via, spill_format=cfg.spill_format,
+        )
+    semantics = ThreadedEngine(make_engine("reference")) if cfg.check == "semantics_vs_esper" else None
+    pending: set = set()
+    try:
+        for idx, q in enumerate(queries, start=start_index):
+            pending.add(asyncio.ensure_future(run_case_async(idx, q, cfg, engine, semantics)))
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    _record(summary, errors, out, fut.result())
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                _record(summary, errors, out, fut.result())
+    finally:
+        for fut in pending:
+            fut.cancel()
+        if owned:
+            for e in (engine, getattr(engine, "engine", None)):
+                if hasattr(e, "close"):
+                    e.close()  # type: ignore[union-attr]
+    return _finish(summary, errors, t0)
+
+
+def iter_jsonl_queries(in_jsonl: str | Path, *, limit: Optional[int] = None) -> Iterator[str]:
+    for obj in iter_jsonl(in_jsonl, limit=limit):
+        yield obj["query"]
+
+
+def run_workload_jsonl(
+    in_jsonl: str | Path,
+    out_jsonl: str | Path,
+    cfg: HarnessConfig = HarnessConfig(),
+    *,
+    workers: int = 1,
+    limit: Optional[int] = None,
+    concurrency: int = 0,
+) -> WorkloadSummary:
+    """`concurrency > 0` runs the cases with `run_workload_async` instead of a process pool."""
+    if concurrency > 0 and cfg.result_cache:
+        raise ValueError("the result cache is not supported by the async harness")
+    with open_text(out_jsonl, "w") as out:
+        queries = iter_jsonl_queries(in_jsonl, limit=limit)
+        if concurrency > 0:
+            return asyncio.run(run_workload_async(queries, cfg, out=out, concurrency=concurrency))
+        return run_workload(queries, cfg, out=out, workers=workers)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import IO, Iterator, Optional
+
+
+def open_text(path: str | Path, mode: str = "r") -> IO[str]:
+    """Open a UTF-8 text file, transparently (de)compressing `.gz` and `.zst` paths."""
+    p = str(path)
+    if mode not in ("r", "w", "a"):
+        raise ValueError(mode)
+    if p.endswith(".gz"):
+        return gzip.open(p, mode + "t", encoding="utf-8")  # type: ignore[return-value]
+    if p.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError(f"{p}: .zst files require the 'zstandard' package") from e
+        fh = open(p, mode + "b")
+        if mode == "r":
+            stream = zstandard.ZstdDecompressor().stream_reader(fh, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(fh, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(p, mode, encoding="utf-8", newline="" if mode != "r" else None)
+
+
+def iter_jsonl(path: str | Path, *, limit: Optional[int] = None) -> Iterator[dict]:
+    """Yield one object per non-empty line, lazily."""
+    n = 0
+    with open_text(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if limit is not None and n >= limit:
+                return
+            n += 1
+            yield json.loads(line)
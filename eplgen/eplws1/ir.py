@@ -0,0 +1,272 @@
+"""Typed statements of a decomposed program (the Table 19 write procedures).
+
+`decompose` builds a `Program` of statement objects instead of EPL text; each
+statement names the streams it reads (`inputs`, as `StreamRef`s) and the
+stream it writes (`out`), so a program is a DAG over stream names that can be
+analyzed without re-parsing. Text is produced only by `epl()` /
+`Program.statements`, i.e. when a program is exported or handed to an engine.
+
+`Program.to_json()` is a compact, positional encoding:
+
+    {"stmts": [["window", "x_win_1", "time(20 sec)", "paper"],
+               ["insert", "x_win_1", ["A", "camera='R2'"]], ...],
+     "lineage": {"x_win_1": "WINDOW(time(20 sec))", ...}}
+
+A stream reference is its name, or `[name, filter]` for a filtered source;
+trailing null fields are omitted.
+"""
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass
+from typing import ClassVar, Dict, List, Optional, Tuple, Union
+
+from .parse import tokenize
+
+
+@dataclass(frozen=True, slots=True)
+class StreamRef:
+    """A stream read in FROM: a source or produced stream, optionally with an inline filter `name(cond)`."""
+    name: str
+    filter_cond: Optional[str] = None
+
+    def __str__(self) -> str:
+        return self.name if self.filter_cond is None else f"{self.name}({self.filter_cond})"
+
+    def as_json(self) -> Union[str, List[str]]:
+        return self.name if self.filter_cond is None else [self.name, self.filter_cond]
+
+    @classmethod
+    def from_json(cls, obj: Union[str, List[str]]) -> "StreamRef":
+        return cls(obj) if isinstance(obj, str) else cls(obj[0], obj[1])
+
+
+def _into(out: Optional[str], body: str) -> str:
+    return (body if out is None else f"INSERT INTO {out}\n{body}").strip()
+
+
+class Statement:
+    """Base of the statement types; `out` is None for a plain SELECT (the query output)."""
+    __slots__ = ()
+    op: ClassVar[str]
+    kind: ClassVar[str] = "DML"  # "DDL" or "DML", as tagged in exported .epl files
+    out: Optional[str]
+
+    @property
+    def inputs(self) -> Tuple[StreamRef, ...]:
+        return ()
+
+    def epl(self) -> str:
+        """EPL text, without the trailing semicolon."""
+        raise NotImplementedError
+
+    def into(self, out: Optional[str]) -> "Statement":
+        """A copy writing to `out` (None: a plain SELECT)."""
+        return type(self)(out, *(getattr(self, f) for f in self.__match_args__[1:]))  # type: ignore[attr-defined,call-arg]
+
+    def as_json(self) -> list:
+        vals = [getattr(self, f) for f in self.__match_args__]  # type: ignore[attr-defined]
+        while vals and vals[-1] is None:  # trailing optional fields fall back to their defaults
+            vals.pop()
+        return [self.op] + [v.as_json() if isinstance(v, StreamRef) else v for v in vals]
+
+
+@dataclass(frozen=True, slots=True)
+class CreateWindow(Statement):
+    op: ClassVar[str] = "window"
+    kind: ClassVar[str] = "DDL"
+    out: str
+    func: str           # e.g. "time(20 sec)"
+    mode: str = "paper"  # see decompose_select_query(create_window_mode=...)
+
+    def __post_init__(self) -> None:
+        if self.mode not in ("paper", "esper"):
+            raise ValueError(self.mode)
+
+    def epl(self) -> str:
+        # 'paper' mirrors Listing 10: CREATE WINDOW AWindow#time(20 seconds)
+        # 'esper' uses Esper-style: create window AWindow.win:time(20 sec) as SomeType
+        if self.mode == "paper":
+            return f"CREATE WINDOW {self.out}#{self.func}".strip()
+        return f"CREATE WINDOW {self.out}.win:{self.func} as BaseEvent"
+
+
+@dataclass(frozen=True, slots=True)
+class InsertSelect(Statement):
+    """INSERT INTO out SELECT * FROM src (fills a named window, or renames a stream)."""
+    op: ClassVar[str] = "insert"
+    out: Optional[str]
+    src: StreamRef
+
+    @property
+    def inputs(self) -> Tuple[StreamRef, ...]:
+        return (self.src,)
+
+    def epl(self) -> str:
+        return _into(self.out, f"SELECT *\nFROM {self.src}")
+
+
+@dataclass(frozen=True, slots=True)
+class Filter(Statement):
+    op: ClassVar[str] = "filter"
+    out: Optional[str]
+    src: StreamRef
+    cond: str
+
+    @property
+    def inputs(self) -> Tuple[StreamRef, ...]:
+        return (self.src,)
+
+    def epl(self) -> str:
+        return _into(self.out, f"SELECT *\nFROM {self.src}\nWHERE {self.cond}")
+
+
+@dataclass(frozen=True, slots=True)
+class Join(Statement):
+    op: ClassVar[str] = "join"
+    out: Optional[str]
+    left: StreamRef
+    right: StreamRef
+
+    @property
+    def inputs(self) -> Tuple[StreamRef, ...]:
+        return (self.left, self.right)
+
+    def epl(self) -> str:
+        return _into(self.out, f"SELECT *\nFROM {self.left}, {self.right}")
+
+
+@dataclass(frozen=True, slots=True)
+class Project(Statement):
+    """Projection/aggregation, with an optional fused WHERE (see optimize)."""
+    op: ClassVar[str] = "project"
+    out: Optional[str]
+    src: StreamRef
+    select: str
+    group_by: Optional[str] = None
+    where: Optional[str] = None
+
+    @property
+    def inputs(self) -> Tuple[StreamRef, ...]:
+        return (self.src,)
+
+    def epl(self) -> str:
+        body = [f"SELECT {self.select}", f"FROM {self.src}"]
+        if self.where:
+            body.append(f"WHERE {self.where}")
+        if self.group_by:
+            body.append(f"GROUP BY {self.group_by}")
+        return _into(self.out, "\n".join(body))
+
+
+@dataclass(frozen=True, slots=True)
+class Pattern(Statement):
+    op: ClassVar[str] = "pattern"
+    out: Optional[str]
+    select: str
+    pattern: str  # raw PATTERN [...] text
+
+    @property
+    def inputs(self) -> Tuple[StreamRef, ...]:
+        return pattern_streams(self.pattern)
+
+    def epl(self) -> str:
+        return _into(self.out, f"SELECT {self.select}\nFROM PATTERN {self.pattern}")
+
+
+@functools.lru_cache(maxsize=1 << 12)
+def pattern_streams(pattern: str) -> Tuple[StreamRef, ...]:
+    """The streams a PATTERN reads, one per atom `[var=]Stream[(guard)]`, the guard as filter."""
+    toks = [t for t in tokenize(pattern) if t.kind != "other" or t.text.strip()]
+    out: List[StreamRef] = []
+    i = 0
+    while i < len(toks):
+        t = toks[i]
+        if t.kind != "word" or t.text.lower() == "every":
+            i += 1
+            continue
+        if i + 2 < len(toks) and toks[i + 1].text.strip() == "=" and toks[i + 2].kind == "word":
+            i += 2  # var=Stream
+        name = toks[i].text
+        i += 1
+        cond = None
+        if i < len(toks) and toks[i].kind == "open" and toks[i].text == "(":
+            j = i + 1
+            while j < len(toks) and not (toks[j].kind == "close" and toks[j].depth == toks[i].depth):
+                j += 1
+            end = toks[j].start if j < len(toks) else len(pattern)
+            cond = pattern[toks[i].start + 1:end].strip() or None
+            i = j + 1
+        out.append(StreamRef(name, cond))
+    return tuple(out)
+
+
+STATEMENT_TYPES: Dict[str, type] = {
+    cls.op: cls for cls in (CreateWindow, InsertSelect, Filter, Join, Project, Pattern)
+}
+_REF_FIELDS = {"src", "left", "right"}
+
+
+def statement_from_json(obj: list) -> Statement:
+    cls = STATEMENT_TYPES[obj[0]]
+    names = cls.__match_args__
+    return cls(*(StreamRef.from_json(v) if n in _REF_FIELDS else v for n, v in zip(names, obj[1:])))
+
+
+class Program:
+    """Statements in execution order, plus `stream_lineage` (out stream -> description)."""
+
+    def __init__(self) -> None:
+        self.stmts: List[Statement] = []
+        self.stream_lineage: Dict[str, str] = {}
+
+    def add(self, stmt: Statement, desc: Optional[str] = None) -> None:
+        self.stmts.append(stmt)
+        if stmt.out and desc:
+            self.stream_lineage[stmt.out] = desc
+
+    def extend(self, other: "Program") -> None:
+        self.stmts.extend(other.stmts)
+        self.stream_lineage.update(other.stream_lineage)
+
+    @property
+    def statements(self) -> List[str]:
+        """The program as EPL statement texts (rendered on every access)."""
+        return [s.epl() + ";" for s in self.stmts]
+
+    # ---- graph view ----
+
+    def producers(self) -> Dict[str, List[int]]:
+        """Stream -> indices of the statements writing it (a named window has two)."""
+        out: Dict[str, List[int]] = {}
+        for i, s in enumerate(self.stmts):
+            if s.out is not None:
+                out.setdefault(s.out, []).append(i)
+        return out
+
+    def sources(self) -> List[str]:
+        """Streams read but not produced by the program (its inputs), in first-use order."""
+        produced = {s.out for s in self.stmts}
+        seen: Dict[str, None] = {}
+        for s in self.stmts:
+            for ref in s.inputs:
+                if ref.name not in produced:
+                    seen.setdefault(ref.name)
+        return list(seen)
+
+    def edges(self) -> List[Tuple[int, int]]:
+        """(producer, consumer) statement index pairs."""
+        prod = self.producers()
+        return [(p, i) for i, s in enumerate(self.stmts) for ref in s.inputs for p in prod.get(ref.name, ())]
+
+    # ---- serialization ----
+
+    def to_json(self) -> dict:
+        return {"stmts": [s.as_json() for s in self.stmts], "lineage": self.stream_lineage}
+
+    @classmethod
+    def from_json(cls, obj: dict) -> "Program":
+        prog = cls()
+        prog.stmts = [statement_from_json(s) for s in obj["stmts"]]
+        prog.stream_lineage = dict(obj.get("lineage", {}))
+        return prog
@@ -0,0 +1,208 @@
+"""Cardinality-aware ordering of multi-source FROM clauses.
+
+`to_operator_tree` folds the FROM sources into a left-deep join chain in textual
+order. This module estimates, for every order, how much state the intermediate
+joins hold and how many events they emit, and picks the cheapest one.
+
+Per-stream statistics come from a sample of the synthetic generator
+(`synth_events`): the event rate and the selectivity of each stream filter
+`R(cond)`, measured by evaluating the filter on the sample. A source then holds
+
+    length(n) window:  n events (the filter runs before the window)
+    time(t) window:    rate * selectivity * t events
+    no window:         1 event (only the triggering one)
+
+and emits rate * selectivity events per second. For a join prefix P the model
+uses |P| = prod(|S|) and rate(P) = sum(rate(S) * |P| / |S|); join predicates in
+WHERE are not estimated (selectivity 1). The cost of an order is the summed size
+of its intermediate (non-final) joins, ties broken by their summed rate.
+
+Join rows are flat merges in which the first source holding a field wins (see
+`engines.reference`), and `S.f` falls back to that flat `f`, so an order can
+change results. `reorder_joins` only takes an order under which every field the
+query reads -- all of them for `SELECT *` -- still comes from the same source.
+"""
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass, replace
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from .ast import SelectQuery, StreamSource
+from .engines.base import Event
+from .engines.reference import parse_window
+from .expr import compile_expr, tokenize
+from .synth_events import generate_stream
+
+
+@dataclass(frozen=True)
+class JoinPlan:
+    order: Tuple[int, ...]       # indices into the query's from_sources
+    sources: Tuple[str, ...]     # stream names, in join order
+    state: float                 # summed size of the intermediate joins (events)
+    rate: float                  # summed output rate of the intermediate joins (events/s)
+    same_rows: bool = True       # every field the query reads comes from the same source as in textual order
+
+    def as_dict(self) -> dict:
+        return {"order": list(self.order), "sources": list(self.sources), "state": self.state, "rate": self.rate,
+                "same_rows": self.same_rows}
+
+
+class JoinStats:
+    """Event rates and filter selectivities per stream, from sampled events.
+
+    Streams without a given sample are sampled lazily from `generate_stream`.
+    """
+
+    def __init__(
+        self,
+        samples: Optional[Dict[str, List[Event]]] = None,
+        *,
+        n_sample: int = 2000,
+        seed: int = 0,
+        ts_per_second: float = 1000.0,
+    ) -> None:
+        self.samples: Dict[str, List[Event]] = dict(samples or {})
+        self.n_sample = n_sample
+        self.seed = seed
+        self.ts_per_second = ts_per_second
+        self._sel: Dict[Tuple[str, str], float] = {}
+        self._fields: Dict[str, FrozenSet[str]] = {}
+
+    def sample(self, stream: str) -> List[Event]:
+        evs = self.samples.get(stream)
+        if evs is None:
+            evs = self.samples[stream] = generate_stream(self.n_sample, seed=self.seed, stream_name=stream)
+        return evs
+
+    def fields(self, stream: str) -> FrozenSet[str]:
+        """Field names seen in the stream's sample."""
+        f = self._fields.get(stream)
+        if f is None:
+            f = self._fields[stream] = frozenset(k for e in self.sample(stream) for k in e)
+        return f
+
+    def rate(self, stream: str) -> float:
+        """Events per second."""
+        evs = self.sample(stream)
+        if len(evs) < 2:
+            return 0.0
+        span = float(evs[-1]["ts"]) - float(evs[0]["ts"])
+        return (len(evs) - 1) / span * self.ts_per_second if span > 0 else float(len(evs))
+
+    def selectivity(self, stream: str, cond: Optional[str]) -> float:
+        if not cond:
+            return 1.0
+        key = (stream, cond)
+        sel = self._sel.get(key)
+        if sel is None:
+            try:
+                expr = compile_expr(cond)
+            except ValueError:
+                sel = 1.0  # outside the fragment the reference engine evaluates
+            else:
+                evs = self.sample(stream)
+                sel = len(expr.filter(evs)) / len(evs) if evs else 1.0
+            self._sel[key] = sel
+        return sel
+
+    def source_size_rate(self, src: StreamSource) -> Tuple[float, float]:
+        """(events held, events emitted per second) of one FROM source."""
+        rate = self.rate(src.name) * self.selectivity(src.name, src.filter_cond)
+        if src.window is None:
+            return 1.0, rate
+        kind, size = parse_window(src.window.func, ts_per_second=self.ts_per_second)
+        if kind == "length":
+            return float(size), rate
+        return rate * size / self.ts_per_second, rate
+
+
+_NOT_FIELDS = {"and", "or", "not", "is", "null", "true", "false", "in", "between", "like", "as"}
+
+
+def _star_item(toks: List[Tuple[str, str]]) -> bool:
+    depth = 0
+    for k, (kind, tok) in enumerate(toks):
+        if kind == "op" and tok in ("(", ")"):
+            depth += 1 if tok == "(" else -1
+        elif kind == "op" and tok == "*" and depth == 0 and (k == 0 or toks[k - 1][1] == ","):
+            return True
+    return False
+
+
+def read_fields(q: SelectQuery) -> Optional[FrozenSet[str]]:
+    """Flat field names the query reads from join rows; None when it reads all of them (`*`)."""
+    names = set()
+    for text in (q.select, q.where, q.group_by, q.having):
+        if not text:
+            continue
+        try:
+            toks = tokenize(text)
+        except ValueError:
+            return None
+        if text is q.select and _star_item(toks):
+            return None
+        for k, (kind, tok) in enumerate(toks):
+            if kind != "id" or tok.lower() in _NOT_FIELDS:
+                continue
+            if k + 1 < len(toks) and toks[k + 1][1] == "(":
+                continue  # function name
+            names.add(tok.rsplit(".", 1)[-1])
+    return frozenset(names)
+
+
+def _owners(fields: Sequence[FrozenSet[str]], order: Sequence[int], names: Sequence[str]) -> Tuple[Optional[int], ...]:
+    return tuple(next((i for i in order if f in fields[i]), None) for f in names)
+
+
+def _cost(sizes: Sequence[float], rates: Sequence[float], order: Sequence[int]) -> Tuple[float, float]:
+    state = flow = 0.0
+    size = 1.0
+    for k, i in enumerate(order):
+        size *= sizes[i]
+        if 1 <= k < len(order) - 1:
+            state += size
+            flow += sum(rates[j] * size / sizes[j] for j in order[:k + 1] if sizes[j] > 0)
+    return state, flow
+
+
+def plan_joins(q: SelectQuery, stats: JoinStats, *, max_exhaustive: int = 6) -> List[JoinPlan]:
+    """Estimated cost of each left-deep join order, cheapest first (ties keep textual order).
+
+    Queries with fewer than two sources, or with a PATTERN source, yield no plans.
+    Beyond `max_exhaustive` sources only the textual and the size-sorted orders are costed.
+    """
+    srcs = list(q.from_sources)
+    if len(srcs) < 2 or not all(isinstance(s, StreamSource) for s in srcs):
+        return []
+    est = [stats.source_size_rate(s) for s in srcs]  # type: ignore[arg-type]
+    sizes = [s for s, _ in est]
+    rates = [r for _, r in est]
+    textual = tuple(range(len(srcs)))
+    if len(srcs) <= max_exhaustive:
+        orders = list(itertools.permutations(textual))
+    else:
+        orders = [textual, tuple(sorted(textual, key=lambda i: (sizes[i], rates[i])))]
+    fields = [stats.fields(s.name) for s in srcs]  # type: ignore[union-attr]
+    read = read_fields(q)
+    names = sorted(frozenset().union(*fields) if read is None else read)
+    owners = _owners(fields, textual, names)
+    plans = []
+    for order in orders:
+        state, flow = _cost(sizes, rates, order)
+        same = order == textual or _owners(fields, order, names) == owners
+        plans.append(JoinPlan(order, tuple(srcs[i].name for i in order), state, flow, same))  # type: ignore[union-attr]
+    plans.sort(key=lambda p: (p.state, p.rate))
+    return plans
+
+
+def reorder_joins(q: SelectQuery, stats: JoinStats) -> Tuple[SelectQuery, List[JoinPlan]]:
+    """Return (q with its FROM sources in the cheapest `same_rows` order, all costed plans).
+
+    q itself is returned when the textual order is kept.
+    """
+    plans = plan_joins(q, stats)
+    best = next((p for p in plans if p.same_rows), None)
+    if best is None or list(best.order) == sorted(best.order):
+        return q, plans
+    return replace(q, from_sources=[q.from_sources[i] for i in best.order]), plans
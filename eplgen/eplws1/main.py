@@ -1,40 +1,140 @@
 from __future__ import annotations
 
-import argparse, json
-from pathlib import Path
+import argparse, json, os, sys, time
+from dataclasses import asdict
+from typing import Tuple
 
-from .workload_gen import generate_workload
-from .parse import parse_select_query
-from .decompose import decompose_select_query
-from .export_epl import export_jsonl_to_case_files, ExportConfig
+from .workload_gen import iter_workload, iter_workload_vectorized
+from .export_epl import iter_export_jsonl, ExportConfig
+from .harness import HarnessConfig, iter_jsonl_queries, run_workload_jsonl
+from .fingerprint import dedup, unique
+from .cache import DecompositionCache
+from .bulk import decompose_jsonl, decompose_workload_jsonl
+from .io_utils import open_text
+from . import metrics
 
 
 def cmd_gen(args: argparse.Namespace) -> None:
     streams = None
     if args.streams:
         streams = [s.strip() for s in args.streams.split(",") if s.strip()]
-    qs = generate_workload(args.n, seed=args.seed, streams=streams) if streams else generate_workload(args.n, seed=args.seed)
+    kw = {"streams": streams} if streams else {}
 
-    outp = Path(args.out)
-    with outp.open("w", encoding="utf-8") as f:
-        for q in qs:
-            f.write(json.dumps({"query": q}) + "\n")
+    shard, num_shards = _parse_shard(args.shard)
+    if args.unique and num_shards > 1:
+        raise SystemExit("--unique cannot be combined with --shard")
+    # with --unique, draw candidates until n distinct queries (or the draw budget) are reached
+    n = args.n * args.max_draws_factor if args.unique else args.n
+    if args.generator == "numpy":
+        workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+        qs = iter_workload_vectorized(n, seed=args.seed, shard=shard, num_shards=num_shards, workers=workers, **kw)
+    elif num_shards > 1:
+        raise SystemExit("--shard requires --generator numpy")
+    else:
+        qs = iter_workload(n, seed=args.seed, **kw)
+    if args.unique:
+        qs = unique(qs, args.n)
+
+    written = 0
+    with open_text(args.out, "w") as f:
+        write = metrics.timed("write", f.write)
+        for q in metrics.timed_iter("generate", qs):
+            write(json.dumps({"query": q}) + "\n")
+            written += 1
+    metrics.count("queries", written)
+    metrics.count_bytes(args.out)
+    if args.unique and written < args.n:
+        print(f"only {written} distinct queries within {n} draws", file=sys.stderr)
+
+
+def cmd_dedup(args: argparse.Namespace) -> None:
+    n = 0
+
+    def queries():
+        nonlocal n
+        for q in iter_jsonl_queries(args.inp, limit=args.limit):
+            n += 1
+            yield q
+
+    groups = dedup(queries())
+    with open_text(args.out, "w") as f:
+        for q, fp, count in groups:
+            f.write(json.dumps({"query": q, "fingerprint": fp, "count": count}) + "\n")
+    print(f"{n} queries -> {len(groups)} distinct", file=sys.stderr)
+
+
+def _parse_shard(spec: str) -> Tuple[int, int]:
+    i, _, n = spec.partition("/")
+    try:
+        return int(i), int(n or 1)
+    except ValueError:
+        raise SystemExit(f"bad --shard {spec!r}, expected i/N") from None
+
+
+def _open_cache(args: argparse.Namespace) -> DecompositionCache:
+    return DecompositionCache(maxsize=args.cache_size, path=args.cache)
+
+
+def _add_cache_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--cache", type=str, default=None, help="SQLite file persisting decompositions across runs")
+    p.add_argument("--cache-size", type=int, default=4096, help="In-memory LRU entries")
+
+
+def _add_metrics_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--metrics-out", type=str, default=None, help="Write per-stage wall/CPU times, counts and peak RSS as JSON")
+    p.add_argument("--profile", type=str, default=None, help="Profile the main process into this file (cProfile stats; pyinstrument HTML if it ends in .html)")
+
+
+def _run_instrumented(args: argparse.Namespace) -> None:
+    prof = metrics.Profile(args.profile) if args.profile else None
+    rec = metrics.enable() if args.metrics_out else None
+    wall, cpu = time.perf_counter(), time.process_time()
+    if prof is not None:
+        prof.start()
+    try:
+        args.func(args)
+    finally:
+        if prof is not None:
+            prof.stop()
+        if rec is not None:
+            doc = metrics.report(
+                args.cmd, time.perf_counter() - wall, time.process_time() - cpu, rec,
+                workers=getattr(args, "workers", 1),
+            )
+            metrics.disable()
+            with open(args.metrics_out, "w", encoding="utf-8") as f:
+                json.dump(doc, f, indent=2)
+                f.write("\n")
 
 
 def cmd_decompose(args: argparse.Namespace) -> None:
-    inp = Path(args.inp)
-    outp = Path(args.out)
-    with inp.open("r", encoding="utf-8") as fin, outp.open("w", encoding="utf-8") as fout:
-        for line in fin:
-            obj = json.loads(line)
-            q = obj["query"]
-            parsed = parse_select_query(q)
-            prog, _ = decompose_select_query(parsed, create_window_mode=args.create_window_mode)
-            fout.write(json.dumps({
-                "query": q,
-                "decomposed": prog.statements,
-                "lineage": prog.stream_lineage,
-            }) + "\n")
+    if args.shared:
+        sd = decompose_workload_jsonl(
+            args.inp, args.out,
+            create_window_mode=args.create_window_mode,
+            optimize=args.optimize,
+            cache_size=args.cache_size, cache_path=args.cache,
+        )
+        print(
+            f"decomposed {len(sd.query_streams)} queries into {len(sd.prog.statements)} shared statements "
+            f"({sd.unshared_statements} unshared)",
+            file=sys.stderr,
+        )
+        return
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    n, stats = decompose_jsonl(
+        args.inp,
+        args.out,
+        create_window_mode=args.create_window_mode,
+        optimize=args.optimize,
+        join_order=args.join_order,
+        workers=workers,
+        chunk_size=args.chunk_size,
+        ordered=not args.unordered,
+        cache_size=args.cache_size,
+        cache_path=args.cache,
+    )
+    print(f"decomposed {n} queries; cache: {stats}", file=sys.stderr)
 
 
 def cmd_export_epl(args: argparse.Namespace) -> None:
@@ -44,16 +144,64 @@ def cmd_export_epl(args: argparse.Namespace) -> None:
 
     cfg = ExportConfig(
         create_window_mode=args.create_window_mode,
+        optimize=args.optimize,
         tag_name=args.tag_name,
         name_prefix=args.name_prefix,
         emit_schemas=args.emit_schemas,
         schema_streams=schema_streams or ExportConfig().schema_streams,
         emit_csv=args.emit_csv,
+        data_format=args.data_format,
         n_per_stream=args.n_per_stream,
         seed=args.seed,
+        generator=args.generator,
         emit_decomposition=args.decompose,   # NEW
+        shard_digits=args.shard_digits,
+    )
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    n = skipped = 0
+    for rec in iter_export_jsonl(
+        args.inp, args.out_dir, cfg=cfg, limit=args.limit,
+        workers=workers, chunk_size=args.chunk_size,
+        cache_size=args.cache_size, cache_path=args.cache,
+        incremental=not args.force,
+    ):
+        n += 1
+        skipped += rec.get("skipped", False)
+    print(f"exported {n} cases to {args.out_dir} ({skipped} unchanged, not rewritten)", file=sys.stderr)
+
+
+def cmd_harness(args: argparse.Namespace) -> None:
+    schema_streams = None
+    if args.schema_streams:
+        schema_streams = [s.strip() for s in args.schema_streams.split(",") if s.strip()]
+
+    cfg = HarnessConfig(
+        engine=args.engine,
+        runner_cmd=args.runner_cmd,
+        check=args.check,
+        create_window_mode=args.create_window_mode,
+        optimize=args.optimize,
+        schema_streams=schema_streams or HarnessConfig().schema_streams,
+        n_per_stream=args.n_per_stream,
+        seed=args.seed,
+        generator=args.generator,
+        timeout=args.timeout,
+        ignore_keys=tuple(args.ignore_key),
+        abs_tol=args.abs_tol,
+        rel_tol=args.rel_tol,
+        sample=args.sample,
+        result_cache=args.result_cache,
+        result_cache_bytes=int(args.result_cache_mb * (1 << 20)),
+        engine_version=args.engine_version,
+        events_via=args.events_via,
+        spill_format=args.spill_format,
     )
-    export_jsonl_to_case_files(args.inp, args.out_dir, cfg=cfg, limit=args.limit)
+    if args.concurrency > 0 and args.result_cache:
+        raise SystemExit("--result-cache cannot be combined with --concurrency")
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    summary = run_workload_jsonl(args.inp, args.out, cfg, workers=workers, limit=args.limit, concurrency=args.concurrency)
+    json.dump(asdict(summary), sys.stdout, indent=2)
+    sys.stdout.write("\n")
 
 
 def main(argv=None) -> None:
@@ -65,13 +213,33 @@ def main(argv=None) -> None:
     g.add_argument("--seed", type=int, default=0)
     g.add_argument("--out", type=str, required=True)
     g.add_argument("--streams", type=str, default=None, help="Comma-separated stream/event type names")
+    g.add_argument("--generator", choices=["python", "numpy"], default="python", help="numpy: vectorized, block-seeded (a different query stream than python)")
+    g.add_argument("--shard", type=str, default="0/1", help="i/N: write only shard i of N of the workload (numpy generator)")
+    g.add_argument("--workers", type=int, default=1, help="Worker processes for the numpy generator (0 = one per CPU)")
+    g.add_argument("--unique", action="store_true", help="Reject queries whose canonical fingerprint was already generated")
+    g.add_argument("--max-draws-factor", type=int, default=20, help="With --unique, give up after n * factor candidates")
+    _add_metrics_args(g)
     g.set_defaults(func=cmd_gen)
 
+    u = sub.add_parser("dedup", help="Collapse a JSONL workload to distinct canonical fingerprints, with multiplicities.")
+    u.add_argument("--in", dest="inp", type=str, required=True)
+    u.add_argument("--out", type=str, required=True)
+    u.add_argument("--limit", type=int, default=None)
+    u.set_defaults(func=cmd_dedup)
+
 
     d = sub.add_parser("decompose", help="Decompose EPL queries into atomic queries (Algorithms 1-3).")
     d.add_argument("--in", dest="inp", type=str, required=True)
     d.add_argument("--out", type=str, required=True)
     d.add_argument("--create-window-mode", choices=["paper","esper"], default="paper")
+    d.add_argument("--optimize", action="store_true", help="Rewrite the operator tree before decomposing (push filters, fuse filter+project, drop SELECT *); default is the paper-faithful translation")
+    d.add_argument("--workers", type=int, default=1, help="Worker processes (0 = one per CPU)")
+    d.add_argument("--chunk-size", type=int, default=1000, help="Input lines per work unit")
+    d.add_argument("--unordered", action="store_true", help="Write results as they complete, with an 'index' field")
+    d.add_argument("--shared", action="store_true", help="Decompose the whole workload into one shared network (single JSON output)")
+    d.add_argument("--join-order", action="store_true", help="Reorder multi-source FROM clauses by estimated join cost; records list the costed join_plans")
+    _add_cache_args(d)
+    _add_metrics_args(d)
     d.set_defaults(func=cmd_decompose)
     
 
@@ -79,6 +247,7 @@ def main(argv=None) -> None:
     e.add_argument("--in", dest="inp", type=str, required=True)
     e.add_argument("--out-dir", dest="out_dir", type=str, required=True)
     e.add_argument("--create-window-mode", choices=["paper","esper"], default="esper")
+    e.add_argument("--optimize", action="store_true", help="Rewrite the operator tree before decomposing (push filters, fuse filter+project, drop SELECT *); default is the paper-faithful translation")
     e.add_argument("--tag-name", type=str, default="CASE")
     e.add_argument("--name-prefix", type=str, default="Q")
     e.add_argument("--emit-schemas", action="store_true", default=True)
@@ -86,14 +255,52 @@ def main(argv=None) -> None:
     e.add_argument("--schema-streams", type=str, default=None, help="Comma-separated schema stream/event types for schema + CSV generation")
     e.add_argument("--emit-csv", action="store_true", default=True)
     e.add_argument("--no-csv", action="store_false", dest="emit_csv")
+    e.add_argument("--data-format", choices=["csv", "bin"], default="csv", help="Input dataset format: <case>.csv or memory-mappable <case>.evb")
     e.add_argument("--n-per-stream", type=int, default=200)
     e.add_argument("--seed", type=int, default=0)
+    e.add_argument("--generator", choices=["python", "numpy"], default="python", help="Event generator backend for the CSV data")
     e.add_argument("--limit", type=int, default=None)
     e.add_argument("--no-decompose", action="store_false", dest="decompose", default=True)
+    e.add_argument("--shard-digits", type=int, default=0, help="Group cases into sub-directories by dropping the last K digits of the case name (0 = flat)")
+    e.add_argument("--workers", type=int, default=1, help="Worker processes (0 = one per CPU)")
+    e.add_argument("--chunk-size", type=int, default=200, help="Cases per work unit")
+    e.add_argument("--force", action="store_true", help="Rewrite every case, ignoring the content hashes in an existing manifest.jsonl")
+    _add_cache_args(e)
+    _add_metrics_args(e)
     e.set_defaults(func=cmd_export_epl)
 
+    h = sub.add_parser("harness", help="Run a whole workload through the test harness in parallel; stream results to JSONL.")
+    h.add_argument("--in", dest="inp", type=str, required=True)
+    h.add_argument("--out", type=str, required=True)
+    h.add_argument("--engine", choices=["reference", "cmd", "server"], default="reference")
+    h.add_argument("--runner-cmd", type=str, default=None, help="Runner command for --engine cmd/server, e.g. 'java -jar runner.jar'")
+    h.add_argument("--check", choices=["orig_vs_decomp", "semantics_vs_esper"], default="orig_vs_decomp")
+    h.add_argument("--create-window-mode", choices=["paper","esper"], default="paper")
+    h.add_argument("--optimize", action="store_true", help="Rewrite the operator tree before decomposing (push filters, fuse filter+project, drop SELECT *); default is the paper-faithful translation")
+    h.add_argument("--schema-streams", type=str, default=None, help="Comma-separated stream/event types for input generation")
+    h.add_argument("--n-per-stream", type=int, default=200)
+    h.add_argument("--seed", type=int, default=0)
+    h.add_argument("--generator", choices=["python", "numpy"], default="python", help="Event generator backend")
+    h.add_argument("--workers", type=int, default=1, help="Worker processes (0 = one per CPU)")
+    h.add_argument("--concurrency", type=int, default=0, help="Run cases from one asyncio coordinator with up to N in flight (original and decomposed run concurrently); replaces --workers")
+    h.add_argument("--timeout", type=float, default=None, help="Per-case timeout in seconds")
+    h.add_argument("--limit", type=int, default=None)
+    h.add_argument("--ignore-key", action="append", default=[], help="Output key to leave out of the comparison (repeatable)")
+    h.add_argument("--abs-tol", type=float, default=0.0, help="Absolute float tolerance when comparing outputs")
+    h.add_argument("--rel-tol", type=float, default=0.0, help="Relative float tolerance when comparing outputs")
+    h.add_argument("--sample", type=int, default=5, help="Distinct missing/extra events reported per mismatch")
+    h.add_argument("--result-cache", type=str, default=None, help="SQLite file caching engine outputs by (engine, version, statements, events digest)")
+    h.add_argument("--result-cache-mb", type=float, default=1024, help="Evict least recently used cached outputs beyond this size")
+    h.add_argument("--engine-version", type=str, default=None, help="Engine version for the result cache key (bump when the runner changes)")
+    h.add_argument("--events-via", choices=["inline", "file"], default="inline", help="file: write each case's events once to a temp dataset and pass runners its path instead of inline JSON")
+    h.add_argument("--spill-format", choices=["csv", "evb"], default="csv", help="Dataset format for --events-via file")
+    h.set_defaults(func=cmd_harness)
+
     args = p.parse_args(argv)
-    args.func(args)
+    if getattr(args, "metrics_out", None) or getattr(args, "profile", None):
+        _run_instrumented(args)
+    else:
+        args.func(args)
 
 
 if __name__ == "__main__":
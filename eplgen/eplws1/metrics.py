@@ -0,0 +1,246 @@
+"""Opt-in per-stage timings, counters and profiles for the CLI (`--metrics-out`, `--profile`).
+
+Instrumented code calls the module-level hooks (`stage`, `count`, `timed`,
+`timed_iter`, ...). They record into a process-global `Metrics` installed by
+`enable()`; with none installed (the default) `stage()` returns a shared no-op
+context manager, `timed()`/`timed_iter()` return their argument unchanged and
+the counters return immediately.
+
+Worker processes record into their own `Metrics`; the pool functions ship
+`take()` back with each chunk and the parent `merge()`s it, so stage times are
+summed over all processes (and can exceed the wall time of the run).
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TypeVar
+
+from .ir import Statement
+
+T = TypeVar("T")
+
+_perf = time.perf_counter
+_cpu = time.process_time
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.stages: Dict[str, List[float]] = {}  # name -> [wall s, cpu s, calls]
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        acc = self.stages.get(name)
+        if acc is None:
+            acc = self.stages[name] = [0.0, 0.0, 0]
+        acc[0] += wall
+        acc[1] += cpu
+        acc[2] += calls
+
+    def merge(self, snap: Optional[dict]) -> None:
+        """Add a `take()` snapshot (e.g. from a worker process)."""
+        if not snap:
+            return
+        for name, (wall, cpu, calls) in snap["stages"].items():
+            self.add(name, wall, cpu, calls)
+        for name, n in snap["counts"].items():
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def as_dict(self) -> dict:
+        return {
+            "stages": {
+                name: {"wall_s": round(w, 6), "cpu_s": round(c, 6), "calls": int(n)}
+                for name, (w, c, n) in sorted(self.stages.items(), key=lambda kv: -kv[1][0])
+            },
+            "counts": dict(sorted(self.counts.items())),
+        }
+
+
+class _Stage:
+    __slots__ = ("m", "name", "wall", "cpu")
+
+    def __init__(self, m: Metrics, name: str) -> None:
+        self.m = m
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.wall = _perf()
+        self.cpu = _cpu()
+
+    def __exit__(self, *exc) -> None:
+        self.m.add(self.name, _perf() - self.wall, _cpu() - self.cpu)
+
+
+_current: Optional[Metrics] = None
+_NULL = contextlib.nullcontext()
+
+
+def enable() -> Metrics:
+    """Install a recorder in this process (keeping an already installed one)."""
+    global _current
+    if _current is None:
+        _current = Metrics()
+    return _current
+
+
+def disable() -> None:
+    global _current
+    _current = None
+
+
+def enabled() -> bool:
+    return _current is not None
+
+
+def take() -> Optional[dict]:
+    """Return and reset what this process recorded (None when disabled)."""
+    m = _current
+    if m is None:
+        return None
+    snap = {"stages": m.stages, "counts": m.counts}
+    m.stages, m.counts = {}, {}
+    return snap
+
+
+def merge(snap: Optional[dict]) -> None:
+    if _current is not None:
+        _current.merge(snap)
+
+
+# ---------------------------
+# Hooks
+# ---------------------------
+
+def stage(name: str):
+    """Context manager adding its wall/CPU time to stage `name`."""
+    m = _current
+    return _NULL if m is None else _Stage(m, name)
+
+
+def count(name: str, n: int = 1) -> None:
+    m = _current
+    if m is not None:
+        m.counts[name] = m.counts.get(name, 0) + n
+
+
+def count_bytes(path: str | Path, name: str = "bytes_written") -> None:
+    """Add the size of a written file (stat only when enabled)."""
+    if _current is not None:
+        count(name, os.path.getsize(path))
+
+
+def count_statements(statements: Sequence[Statement]) -> None:
+    """Count emitted statements (`Program.stmts`) and the named windows among them."""
+    if _current is None:
+        return
+    count("statements", len(statements))
+    count("windows", sum(1 for s in statements if s.op == "window"))
+
+
+def timed(name: str, fn: Callable[..., T]) -> Callable[..., T]:
+    """fn itself when disabled, else a wrapper timing every call as stage `name`."""
+    m = _current
+    if m is None:
+        return fn
+
+    def wrapper(*args, **kwargs):
+        w, c = _perf(), _cpu()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            m.add(name, _perf() - w, _cpu() - c)
+
+    return wrapper
+
+
+def timed_iter(name: str, it: Iterable[T]) -> Iterable[T]:
+    """it itself when disabled, else an iterator timing every `next()` as stage `name`."""
+    m = _current
+    if m is None:
+        return it
+
+    def gen() -> Iterator[T]:
+        src = iter(it)
+        wall = cpu = 0.0
+        n = 0
+        try:
+            while True:
+                w, c = _perf(), _cpu()
+                try:
+                    item = next(src)
+                except StopIteration:
+                    return
+                finally:
+                    wall += _perf() - w
+                    cpu += _cpu() - c
+                n += 1
+                yield item
+        finally:
+            m.add(name, wall, cpu, n)
+
+    return gen()
+
+
+# ---------------------------
+# Process-level figures
+# ---------------------------
+
+def peak_rss() -> Dict[str, Optional[int]]:
+    """Peak resident set size in bytes of this process and of its reaped children (workers)."""
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return {"self": None, "children": None}
+    unit = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is KiB on Linux, bytes on macOS
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit,
+    }
+
+
+class Profile:
+    """cProfile (pstats dump) or, for a `.html` path, pyinstrument (HTML report).
+
+    Covers the calling process only, not worker processes.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        if self.path.suffix == ".html":
+            try:
+                from pyinstrument import Profiler
+            except ImportError as e:
+                raise RuntimeError("an .html profile needs pyinstrument (pip install pyinstrument)") from e
+            self._prof = Profiler()
+        else:
+            import cProfile
+            self._prof = cProfile.Profile()
+
+    def start(self) -> None:
+        if self.path.suffix == ".html":
+            self._prof.start()
+        else:
+            self._prof.enable()
+
+    def stop(self) -> None:
+        if self.path.suffix == ".html":
+            self._prof.stop()
+            self.path.write_text(self._prof.output_html(), encoding="utf-8")
+        else:
+            self._prof.disable()
+            self._prof.dump_stats(str(self.path))
+
+
+def report(command: str, wall: float, cpu: float, m: Metrics, **extra: object) -> dict:
+    """The `--metrics-out` document."""
+    doc = {"command": command, "wall_s": round(wall, 6), "cpu_s": round(cpu, 6)}
+    doc.update(extra)
+    doc.update(m.as_dict())
+    counts = m.counts
+    if wall > 0 and counts.get("queries"):
+        doc["queries_per_s"] = round(counts["queries"] / wall, 1)
+    doc["peak_rss_bytes"] = peak_rss()
+    return doc
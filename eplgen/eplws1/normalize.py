@@ -1,34 +1,44 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from .ast import (
     SelectQuery, OpNode, OpSelect, OpWhere, OpJoin, OpWindow, OpStream, OpPattern,
-    StreamSource, PatternSource, WindowSpec,
+    StreamSource, PatternSource, WindowSpec, NodeTable,
 )
 
-def to_operator_tree(q: SelectQuery) -> OpNode:
+def to_operator_tree(q: SelectQuery, *, table: Optional[NodeTable] = None) -> OpNode:
+    """Operator tree of q; with a `table`, built from (and added to) its hash-consed nodes."""
     # FROM clause -> omega
     if len(q.from_sources) == 0:
         raise ValueError("FROM clause is empty")
 
     def source_to_op(src):
         if isinstance(src, StreamSource):
-            base = OpStream(src=StreamSource(name=src.name, filter_cond=src.filter_cond, window=None))
+            stream = src if src.window is None else StreamSource(name=src.name, filter_cond=src.filter_cond)
+            if table is not None:
+                base = table.stream(stream)
+                return table.windowed(base, src.window) if src.window is not None else base
+            base = OpStream(src=stream)
             if src.window is not None:
                 return OpWindow(child=base, window=src.window)
             return base
         if isinstance(src, PatternSource):
-            return OpPattern(src=src)
+            return table.pattern(src) if table is not None else OpPattern(src=src)
         raise TypeError(src)
 
     omega: OpNode = source_to_op(q.from_sources[0])
     for src in q.from_sources[1:]:
-        omega = OpJoin(left=omega, right=source_to_op(src))
+        right = source_to_op(src)
+        omega = table.join(omega, right) if table is not None else OpJoin(left=omega, right=right)
 
     # WHERE
     node: OpNode = omega
     if q.where:
-        node = OpWhere(cond=q.where, child=node)
+        node = table.where(q.where, node) if table is not None else OpWhere(cond=q.where, child=node)
 
     # SELECT (+ optional GROUP BY)
+    if table is not None:
+        return table.select(q.select, q.group_by, node)
     node = OpSelect(select=q.select, group_by=q.group_by, child=node)
     return node
@@ -0,0 +1,193 @@
+"""Rule-based rewrites of the operator tree, applied between normalize and decompose.
+
+`to_operator_tree` mirrors the query text (WHERE above the whole FROM clause,
+SELECT on top), and Algorithms 1-3 translate that shape verbatim. The rules
+below trade the paper's one-operator-per-statement form for fewer statements
+and earlier filtering:
+
+- push: a WHERE conjunct that only touches one FROM source moves into that
+  source's stream filter `R(cond)` -- below its window and below the join;
+- fuse: a remaining WHERE directly under SELECT is evaluated by the projection
+  statement itself (`OpSelect.where`) instead of a separate filter statement;
+- drop: a `SELECT *` without GROUP BY over a stage that already emits a stream
+  (WHERE, join, pattern) is removed.
+
+A conjunct is only pushed below a window whose contents do not depend on the
+events it would then no longer see, i.e. no window or a time window; under a
+length window, filtering first would change which events the window retains.
+"""
+from __future__ import annotations
+
+from dataclasses import replace
+from typing import List, Optional, Set, Tuple
+
+from .ast import OpJoin, OpNode, OpPattern, OpSelect, OpStream, OpWhere, OpWindow
+from .parse import tokenize
+
+_KEYWORDS = frozenset(("and", "or", "not", "is", "null", "true", "false", "in", "between", "like"))
+
+
+def split_conjuncts(cond: str) -> List[str]:
+    """Top-level AND operands of cond; a condition with a top-level OR is one operand.
+
+    The AND of `[NOT] BETWEEN lo AND hi` stays inside its operand.
+    """
+    toks = [t for t in tokenize(cond) if t.depth == 0 and t.kind == "word"]
+    if any(t.text.lower() == "or" for t in toks):
+        return [cond.strip()]
+    out: List[str] = []
+    start = 0
+    between = False
+    for t in toks:
+        word = t.text.lower()
+        if word == "between":
+            between = True
+        elif word == "and" and between:
+            between = False
+        elif word == "and":
+            out.append(cond[start:t.start].strip())
+            start = t.start + len(t.text)
+    out.append(cond[start:].strip())
+    return [c for c in out if c]
+
+
+def join_conjuncts(parts: List[str]) -> str:
+    return " AND ".join(f"({p})" if _has_or(p) else p for p in parts)
+
+
+def _has_or(cond: str) -> bool:
+    return any(t.depth == 0 and t.kind == "word" and t.text.lower() == "or" for t in tokenize(cond))
+
+
+def _references(cond: str) -> Tuple[Set[str], bool]:
+    """(stream qualifiers used as `Q.field`, whether there are unqualified identifiers)."""
+    toks = tokenize(cond)
+    quals: Set[str] = set()
+    bare = False
+    i = 0
+    while i < len(toks):
+        t = toks[i]
+        if t.kind == "word" and t.text.lower() not in _KEYWORDS:
+            nxt = toks[i + 1] if i + 1 < len(toks) else None
+            if nxt is not None and nxt.text == "." and i + 2 < len(toks) and toks[i + 2].kind == "word":
+                quals.add(t.text)
+                i += 3
+                continue
+            if nxt is None or nxt.kind != "open":  # function names are not references
+                bare = True
+        i += 1
+    return quals, bare
+
+
+def _unqualify(cond: str, qual: str) -> str:
+    toks = tokenize(cond)
+    out: List[str] = []
+    skip = 0
+    for i, t in enumerate(toks):
+        if skip:
+            skip -= 1
+            continue
+        if t.kind == "word" and t.text == qual and i + 1 < len(toks) and toks[i + 1].text == ".":
+            skip = 1
+            continue
+        out.append(t.text)
+    return "".join(out)
+
+
+# ---------------------------
+# Rules
+# ---------------------------
+
+def _leaves(node: OpNode) -> List[OpNode]:
+    if isinstance(node, OpJoin):
+        return _leaves(node.left) + _leaves(node.right)
+    return [node]
+
+
+def _leaf_name(leaf: OpNode) -> Optional[str]:
+    if isinstance(leaf, OpWindow):
+        leaf = leaf.child
+    return leaf.src.name if isinstance(leaf, OpStream) else None
+
+
+def _accepts_filter(leaf: OpNode) -> bool:
+    if isinstance(leaf, OpStream):
+        return True
+    return (
+        isinstance(leaf, OpWindow) and isinstance(leaf.child, OpStream)
+        and leaf.window.func.replace(" ", "").lower().startswith("time(")
+    )
+
+
+def _target(cond: str, leaves: List[OpNode]) -> Optional[Tuple[int, str]]:
+    """(leaf index, condition as a stream filter) for a single-source conjunct."""
+    quals, bare = _references(cond)
+    names = [_leaf_name(l) for l in leaves]
+    if len(leaves) == 1:
+        if not _accepts_filter(leaves[0]) or quals - {names[0]}:
+            return None
+        return 0, _unqualify(cond, names[0]) if quals else cond  # type: ignore[arg-type]
+    # in a join, unqualified fields are ambiguous (all streams share one schema)
+    if bare or len(quals) != 1:
+        return None
+    (q,) = quals
+    if names.count(q) != 1:
+        return None
+    i = names.index(q)
+    # join rows are flat merges where the first source wins, so `S.f` reads the
+    # first source's `f` in the original WHERE: only that source may take it
+    if i != 0:
+        return None
+    return (i, _unqualify(cond, q)) if _accepts_filter(leaves[i]) else None
+
+
+def _with_filter(leaf: OpNode, conds: List[str]) -> OpNode:
+    if isinstance(leaf, OpWindow):
+        return replace(leaf, child=_with_filter(leaf.child, conds))
+    assert isinstance(leaf, OpStream)
+    parts = ([leaf.src.filter_cond] if leaf.src.filter_cond else []) + conds
+    return OpStream(src=replace(leaf.src, filter_cond=join_conjuncts(parts)))
+
+
+def _rebuild(node: OpNode, leaves: List[OpNode]) -> OpNode:
+    it = iter(leaves)
+
+    def go(n: OpNode) -> OpNode:
+        if isinstance(n, OpJoin):
+            return OpJoin(left=go(n.left), right=go(n.right))
+        return next(it)
+
+    return go(node)
+
+
+def push_filters(where: OpWhere) -> OpNode:
+    leaves = _leaves(where.child)
+    pushed: List[List[str]] = [[] for _ in leaves]
+    kept: List[str] = []
+    for c in split_conjuncts(where.cond):
+        tgt = _target(c, leaves)
+        if tgt is None:
+            kept.append(c)
+        else:
+            pushed[tgt[0]].append(tgt[1])
+    if not any(pushed):
+        return where
+    child = _rebuild(where.child, [_with_filter(l, p) if p else l for l, p in zip(leaves, pushed)])
+    return OpWhere(cond=join_conjuncts(kept), child=child) if kept else child
+
+
+def optimize_tree(node: OpNode, *, push: bool = True, fuse: bool = True, drop: bool = True) -> OpNode:
+    """Apply the rewrite rules to a `to_operator_tree` result."""
+    if isinstance(node, OpSelect):
+        child = optimize_tree(node.child, push=push, fuse=fuse, drop=drop)
+        if (
+            drop and node.select.strip() == "*" and not node.group_by and node.where is None
+            and isinstance(child, (OpWhere, OpJoin, OpPattern))
+        ):
+            return child
+        if fuse and isinstance(child, OpWhere) and node.where is None:
+            return OpSelect(select=node.select, group_by=node.group_by, child=child.child, where=child.cond)
+        return replace(node, child=child)
+    if isinstance(node, OpWhere) and push:
+        return push_filters(node)
+    return node
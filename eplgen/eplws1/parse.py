@@ -1,199 +1,189 @@
 from __future__ import annotations
 
 import re
-from typing import List, Tuple, Optional
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 from .ast import SelectQuery, StreamSource, PatternSource, WindowSpec, FromSource
 
-_KEYWORDS = [" where ", " group by ", " having "]
+# ---------------------------
+# Lexer
+# ---------------------------
+
+# One token per quoted string, identifier, bracket or separator; everything else
+# (spaces, operators, numbers) is lumped into "other" runs. An unterminated quote
+# extends to the end of the input.
+_LEX = re.compile(r"""
+    (?P<str>'[^']*(?:'|$)|"[^"]*(?:"|$))
+   |(?P<word>[A-Za-z_][A-Za-z0-9_]*)
+   |(?P<open>[(\[])
+   |(?P<close>[)\]])
+   |(?P<sep>[,#])
+   |(?P<other>[^'"A-Za-z_()\[\],#]+)
+""", re.X)
+
+_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_INSERT = re.compile(r"^insert\s+into\s+([A-Za-z_][A-Za-z0-9_]*)\s+(select\s+.+)$", flags=re.I)
+
+# clause keyword -> the text that must appear at top level, surrounded by single spaces
+_CLAUSE_KW = {"where": " where ", "group": " group by ", "having": " having "}
+
+
+class Token(NamedTuple):
+    kind: str    # "str", "word", "open", "close", "sep" or "other"
+    text: str
+    start: int
+    depth: int   # () plus [] nesting depth the token sits at (0 == top level)
+
+
+def tokenize(s: str) -> List[Token]:
+    """Single pass over s tracking quote and ()/[] nesting state."""
+    out: List[Token] = []
+    par = br = 0
+    for m in _LEX.finditer(s):
+        kind = m.lastgroup or "other"
+        text = m.group()
+        if kind == "open":
+            out.append(Token(kind, text, m.start(), par + br))
+            if text == "(":
+                par += 1
+            else:
+                br += 1
+            continue
+        if kind == "close":
+            if text == ")":
+                par = max(0, par - 1)
+            else:
+                br = max(0, br - 1)
+        out.append(Token(kind, text, m.start(), par + br))
+    return out
+
 
 def _split_top_level(s: str, sep: str = ",") -> List[str]:
-    """Split by sep, but ignore separators inside (), [] and quotes."""
+    """Split by sep (',' or '#'), but ignore separators inside (), [] and quotes."""
     out: List[str] = []
-    buf: List[str] = []
-    depth_par = 0
-    depth_br = 0
-    in_squote = False
-    in_dquote = False
-    i = 0
-    while i < len(s):
-        ch = s[i]
-        if ch == "'" and not in_dquote:
-            in_squote = not in_squote
-            buf.append(ch)
-            i += 1
-            continue
-        if ch == '"' and not in_squote:
-            in_dquote = not in_dquote
-            buf.append(ch)
-            i += 1
-            continue
-        if not in_squote and not in_dquote:
-            if ch == "(":
-                depth_par += 1
-            elif ch == ")":
-                depth_par = max(0, depth_par - 1)
-            elif ch == "[":
-                depth_br += 1
-            elif ch == "]":
-                depth_br = max(0, depth_br - 1)
-            if ch == sep and depth_par == 0 and depth_br == 0:
-                part = "".join(buf).strip()
-                if part:
-                    out.append(part)
-                buf = []
-                i += 1
-                continue
-        buf.append(ch)
-        i += 1
-    part = "".join(buf).strip()
+    start = 0
+    for t in tokenize(s):
+        if t.kind == "sep" and t.text == sep and t.depth == 0:
+            part = s[start:t.start].strip()
+            if part:
+                out.append(part)
+            start = t.start + 1
+    part = s[start:].strip()
     if part:
         out.append(part)
     return out
 
 
-def _find_clause_boundaries(q: str) -> Tuple[str, str, Optional[str], Optional[str], Optional[str]]:
-    """Return (select_list, from_clause, where, group_by, having)."""
-    ql = q.strip()
-    ql = re.sub(r"\s+", " ", ql)
-    low = ql.lower()
-
-    m = re.match(r"^select\s+(.+?)\s+from\s+(.+)$", ql, flags=re.I)
-    if not m:
-        raise ValueError(f"Not a SELECT-FROM query: {q}")
-
-    select_list = m.group(1).strip()
-    rest = m.group(2).strip()
-    rest_low = rest.lower()
-
-    where = group_by = having = None
-
-    # locate keywords at top-level by scanning and tracking nesting
-    def find_kw(rest_s: str, kw: str) -> int:
-        # expects kw with surrounding spaces, e.g. ' where '
-        depth_par = depth_br = 0
-        in_squote = in_dquote = False
-        rs = rest_s
-        rslow = rs.lower()
-        i = 0
-        while i <= len(rs) - len(kw):
-            ch = rs[i]
-            if ch == "'" and not in_dquote:
-                in_squote = not in_squote
-                i += 1
-                continue
-            if ch == '"' and not in_squote:
-                in_dquote = not in_dquote
-                i += 1
-                continue
-            if not in_squote and not in_dquote:
-                if ch == "(":
-                    depth_par += 1
-                elif ch == ")":
-                    depth_par = max(0, depth_par-1)
-                elif ch == "[":
-                    depth_br += 1
-                elif ch == "]":
-                    depth_br = max(0, depth_br-1)
-                if depth_par == 0 and depth_br == 0 and rslow.startswith(kw, i):
-                    return i
-            i += 1
-        return -1
-
-    idx_where = find_kw(rest, " where ")
-    idx_group = find_kw(rest, " group by ")
-    idx_having = find_kw(rest, " having ")
-
-    # determine ordering among present clauses
-    cutpoints = [(idx_where, "where"), (idx_group, "group"), (idx_having, "having")]
-    cutpoints = [(i, k) for i,k in cutpoints if i != -1]
-    cutpoints.sort()
-
-    from_part_end = cutpoints[0][0] if cutpoints else len(rest)
-    from_clause = rest[:from_part_end].strip()
-
-    def slice_clause(start_idx: int, start_kw: str, end_idx: int) -> str:
-        return rest[start_idx + len(start_kw): end_idx].strip()
-
-    for pos, (idx, key) in enumerate(cutpoints):
-        end = cutpoints[pos+1][0] if pos+1 < len(cutpoints) else len(rest)
-        if key == "where":
-            where = slice_clause(idx, " where ", end)
-        elif key == "group":
-            group_by = slice_clause(idx, " group by ", end)
-        elif key == "having":
-            having = slice_clause(idx, " having ", end)
+# ---------------------------
+# Parser
+# ---------------------------
 
-    return select_list, from_clause, where, group_by, having
+def _normalize(q: str) -> str:
+    return " ".join(q.strip().rstrip(";").split())
 
 
-def _parse_source(src: str) -> FromSource:
-    s = src.strip()
-    low = s.lower()
-    if low.startswith("pattern"):
+def _parse_source(s: str, hash_idx: int = -1) -> FromSource:
+    """Parse one FROM item; hash_idx is the position of its top-level '#', if any."""
+    if s[:7].lower() == "pattern":
         # allow: PATTERN [ ... ] or PATTERN[...] (tolerant)
-        m = re.match(r"pattern\s*(\[.*\])\s*$", s, flags=re.I)
-        if not m:
-            raise ValueError(f"Bad PATTERN source: {src}")
-        return PatternSource(pattern=m.group(1).strip())
+        pat = s[7:].strip()
+        if len(pat) < 2 or pat[0] != "[" or pat[-1] != "]":
+            raise ValueError(f"Bad PATTERN source: {s}")
+        return PatternSource(pattern=pat)
 
     # Stream source: Name [ (cond) ] [ #win(...) ]
-    # 1) window part (last #... if present at top level)
     window = None
-    # Find top-level '#'
-    # (ignore hashes inside quotes)
-    depth_par = depth_br = 0
-    in_squote = in_dquote = False
-    hash_idx = -1
-    for i,ch in enumerate(s):
-        if ch == "'" and not in_dquote:
-            in_squote = not in_squote
-            continue
-        if ch == '"' and not in_squote:
-            in_dquote = not in_dquote
-            continue
-        if not in_squote and not in_dquote:
-            if ch == "(":
-                depth_par += 1
-            elif ch == ")":
-                depth_par = max(0, depth_par-1)
-            elif ch == "[":
-                depth_br += 1
-            elif ch == "]":
-                depth_br = max(0, depth_br-1)
-            if ch == "#" and depth_par == 0 and depth_br == 0:
-                hash_idx = i
-                break
     base = s
     if hash_idx != -1:
         base = s[:hash_idx].strip()
-        win = s[hash_idx+1:].strip()
-        window = WindowSpec(func=win)
+        window = WindowSpec(func=sys.intern(s[hash_idx + 1:].strip()))
 
-    # 2) filter args, e.g. DetectMov(camera="R2")
-    m = re.match(r"^([A-Za-z_][A-Za-z0-9_]*)\s*(\((.*)\))?\s*$", base)
+    m = _NAME.match(base)
     if not m:
-        raise ValueError(f"Bad stream source: {src}")
-    name = m.group(1)
+        raise ValueError(f"Bad stream source: {s}")
+    rem = base[m.end():].strip()
     filter_cond = None
-    if m.group(3) is not None:
-        filter_cond = m.group(3).strip()
-    return StreamSource(name=name, filter_cond=filter_cond, window=window)
+    if rem:
+        if rem[0] != "(" or rem[-1] != ")":
+            raise ValueError(f"Bad stream source: {s}")
+        filter_cond = rem[1:-1].strip()
+    return StreamSource(name=sys.intern(m.group()), filter_cond=filter_cond, window=window)
+
+
+def _parse_select(qs: str) -> Tuple[str, List[FromSource], Optional[str], Optional[str], Optional[str]]:
+    """Return (select_list, sources, where, group_by, having) for normalized `SELECT ...` text."""
+    if qs[:7].lower() != "select ":
+        raise ValueError(f"Not a SELECT-FROM query: {qs}")
+    # first ' from ' after a non-empty select list (not nesting-aware, like the clause itself)
+    i_from = qs.lower().find(" from ", 8)
+    if i_from == -1:
+        raise ValueError(f"Not a SELECT-FROM query: {qs}")
+    select_list = qs[7:i_from].strip()
+    rest = qs[i_from + 6:].strip()
+
+    kw_at: Dict[str, int] = {}
+    marks: List[Token] = []  # top-level ',' and '#'
+    for t in tokenize(rest):
+        if t.depth:
+            continue
+        if t.kind == "sep":
+            marks.append(t)
+        elif t.kind == "word":
+            key = t.text.lower()
+            if key in _CLAUSE_KW and key not in kw_at:
+                kw = _CLAUSE_KW[key]
+                at = t.start - 1
+                if at >= 0 and rest[at:at + len(kw)].lower() == kw:
+                    kw_at[key] = at
+
+    cutpoints = sorted((idx, key) for key, idx in kw_at.items())
+    from_end = cutpoints[0][0] if cutpoints else len(rest)
+
+    clauses: Dict[str, Optional[str]] = {"where": None, "group": None, "having": None}
+    for pos, (idx, key) in enumerate(cutpoints):
+        end = cutpoints[pos + 1][0] if pos + 1 < len(cutpoints) else len(rest)
+        clauses[key] = rest[idx + len(_CLAUSE_KW[key]):end].strip()
+
+    sources: List[FromSource] = []
+    start = 0
+    hash_at = -1
+    for t in marks:
+        if t.start >= from_end:
+            break
+        if t.text == "#":
+            if hash_at == -1:
+                hash_at = t.start
+            continue
+        _add_source(sources, rest, start, t.start, hash_at)
+        start, hash_at = t.start + 1, -1
+    _add_source(sources, rest, start, from_end, hash_at)
+
+    return select_list, sources, clauses["where"], clauses["group"], clauses["having"]
+
+
+def _add_source(sources: List[FromSource], rest: str, start: int, end: int, hash_at: int) -> None:
+    raw = rest[start:end]
+    s = raw.strip()
+    if not s:
+        return
+    if hash_at != -1:
+        hash_at -= start + (len(raw) - len(raw.lstrip()))
+    sources.append(_parse_source(s, hash_at))
 
 
 def parse_select_query(q: str) -> SelectQuery:
     """Parse a single EPL SELECT statement (optionally with INSERT INTO prefix)."""
-    qs = q.strip().rstrip(";").strip()
-    qs = re.sub(r"\s+", " ", qs)
+    qs = _normalize(q)
 
     insert_into = None
-    m_ins = re.match(r"^insert\s+into\s+([A-Za-z_][A-Za-z0-9_]*)\s+(select\s+.+)$", qs, flags=re.I)
-    if m_ins:
-        insert_into = m_ins.group(1)
-        qs = m_ins.group(2)
+    if qs[:6].lower() == "insert":
+        m_ins = _INSERT.match(qs)
+        if m_ins:
+            insert_into = m_ins.group(1)
+            qs = m_ins.group(2)
 
-    select_list, from_clause, where, group_by, having = _find_clause_boundaries(qs)
-    sources = [_parse_source(p) for p in _split_top_level(from_clause, ",")]
+    select_list, sources, where, group_by, having = _parse_select(qs)
 
     return SelectQuery(
         select=select_list,
@@ -1,32 +1,168 @@
 from __future__ import annotations
 
-from typing import Dict, List, Sequence
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
 import random
+import zlib
 
 from .engines.base import Event
 from .config import DEFAULT_SCHEMA_STREAMS
 
-def generate_stream(n: int, seed: int = 0, *, stream_name: str) -> List[Event]:
-    random.seed(seed)
-    out: List[Event] = []
+def iter_stream(n: int, seed: int = 0, *, stream_name: str) -> Iterator[Event]:
+    rng = random.Random(seed)  # same sequence as seeding the global RNG, but thread-safe
     t0 = 0
     for _ in range(n):
-        t0 += random.choice([1, 1, 1, 2, 5])
-        out.append({
-            "camera": random.choice(["R1","R2","R3"]),
-            "therm": random.choice(["R1","R2","R3"]),
-            "temp": float(random.choice([18, 21, 23, 35, 42, 50])),
-            "humid": float(random.choice([10, 20, 35, 40, 50])),
-            "x": int(random.choice([0,1,2,3,4])),
-            "y": int(random.choice([0,1,2,3,4])),
+        t0 += rng.choice([1, 1, 1, 2, 5])
+        yield {
+            "camera": rng.choice(["R1","R2","R3"]),
+            "therm": rng.choice(["R1","R2","R3"]),
+            "temp": float(rng.choice([18, 21, 23, 35, 42, 50])),
+            "humid": float(rng.choice([10, 20, 35, 40, 50])),
+            "x": int(rng.choice([0,1,2,3,4])),
+            "y": int(rng.choice([0,1,2,3,4])),
             "sensor": stream_name,
             "ts": int(t0),
-        })
-    return out
+        }
+
+def generate_stream(n: int, seed: int = 0, *, stream_name: str) -> List[Event]:
+    return list(iter_stream(n, seed, stream_name=stream_name))
 
 def generate_inputs(
     seed: int = 0,
     n_per_stream: int = 50,
     streams: Sequence[str] = DEFAULT_SCHEMA_STREAMS,
+    *,
+    backend: str = "python",
 ) -> Dict[str, List[Event]]:
+    if backend == "numpy":
+        return {s: b.to_events() for s, b in generate_inputs_columnar(seed, n_per_stream, streams).items()}
+    if backend != "python":
+        raise ValueError(backend)
     return {s: generate_stream(n_per_stream, seed=seed+idx, stream_name=s) for idx, s in enumerate(streams)}
+
+def iter_inputs(
+    seed: int = 0,
+    n_per_stream: int = 50,
+    streams: Sequence[str] = DEFAULT_SCHEMA_STREAMS,
+    *,
+    backend: str = "python",
+) -> Dict[str, Iterable[Event]]:
+    """Lazy variant of generate_inputs: the same events, one ts-ordered iterator per stream."""
+    if backend == "numpy":
+        return {
+            s: (ev for b in iter_stream_batches(n_per_stream, seed, stream_name=s) for ev in b.to_events())
+            for s in streams
+        }
+    if backend != "python":
+        raise ValueError(backend)
+    return {s: iter_stream(n_per_stream, seed=seed+idx, stream_name=s) for idx, s in enumerate(streams)}
+
+
+# ---------------------------
+# Columnar (NumPy) generator
+# ---------------------------
+# Same value distributions as generate_stream, drawn in bulk from one
+# numpy.random.Generator per stream. The values differ from the `random`-based
+# generator, but are deterministic in (seed, stream name).
+
+CATEGORIES: Tuple[str, ...] = ("R1", "R2", "R3")
+_TS_STEPS = (1, 1, 1, 2, 5)
+_TEMPS = (18.0, 21.0, 23.0, 35.0, 42.0, 50.0)
+_HUMIDS = (10.0, 20.0, 35.0, 40.0, 50.0)
+
+# Fields are drawn block by block; a fixed block size keeps the values independent
+# of how callers consume them (one big batch, batches, or single events).
+BATCH_SIZE = 1 << 16
+
+
+def _np():
+    try:
+        import numpy
+    except ImportError as e:
+        raise RuntimeError("the columnar event generator requires numpy") from e
+    return numpy
+
+
+def stream_rng(seed: int, stream_name: str):
+    """Independent numpy Generator for one stream, derived from (seed, stream name)."""
+    np = _np()
+    return np.random.default_rng(np.random.SeedSequence([seed & 0xFFFFFFFF, zlib.crc32(stream_name.encode("utf-8"))]))
+
+
+@dataclass
+class EventBatch:
+    """Columnar events of one stream.
+
+    `camera`/`therm` hold int8 codes into CATEGORIES; `sensor` is constant (the
+    stream name) and therefore not materialized.
+    """
+    stream: str
+    ts: "np.ndarray"       # int64
+    camera: "np.ndarray"   # int8 codes
+    therm: "np.ndarray"    # int8 codes
+    temp: "np.ndarray"     # float64
+    humid: "np.ndarray"    # float64
+    x: "np.ndarray"        # int64
+    y: "np.ndarray"        # int64
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def to_events(self) -> List[Event]:
+        cats = CATEGORIES
+        s = self.stream
+        return [
+            {"camera": cats[c], "therm": cats[t], "temp": tp, "humid": h, "x": x, "y": y, "sensor": s, "ts": ts}
+            for ts, c, t, tp, h, x, y in zip(
+                self.ts.tolist(), self.camera.tolist(), self.therm.tolist(),
+                self.temp.tolist(), self.humid.tolist(), self.x.tolist(), self.y.tolist(),
+            )
+        ]
+
+
+def iter_stream_batches(n: int, seed: int = 0, *, stream_name: str) -> Iterator[EventBatch]:
+    """Yield n events of one stream in columnar batches of BATCH_SIZE (the last may be shorter)."""
+    np = _np()
+    rng = stream_rng(seed, stream_name)
+    temps = np.asarray(_TEMPS)
+    humids = np.asarray(_HUMIDS)
+    steps = np.asarray(_TS_STEPS, dtype=np.int64)
+    t0 = 0
+    done = 0
+    while done < n:
+        m = min(BATCH_SIZE, n - done)
+        ts = np.cumsum(steps.take(rng.integers(0, len(steps), size=m, dtype=np.int8)))
+        ts += t0
+        t0 = int(ts[-1])
+        yield EventBatch(
+            stream=stream_name,
+            ts=ts,
+            camera=rng.integers(0, len(CATEGORIES), size=m, dtype=np.int8),
+            therm=rng.integers(0, len(CATEGORIES), size=m, dtype=np.int8),
+            temp=temps.take(rng.integers(0, len(temps), size=m, dtype=np.int8)),
+            humid=humids.take(rng.integers(0, len(humids), size=m, dtype=np.int8)),
+            x=rng.integers(0, 5, size=m, dtype=np.int8).astype(np.int64),
+            y=rng.integers(0, 5, size=m, dtype=np.int8).astype(np.int64),
+        )
+        done += m
+
+
+def generate_stream_columns(n: int, seed: int = 0, *, stream_name: str) -> EventBatch:
+    """All n events of one stream as a single columnar batch."""
+    np = _np()
+    batches = list(iter_stream_batches(n, seed, stream_name=stream_name))
+    if len(batches) == 1:
+        return batches[0]
+    if not batches:
+        i8, i64, f64 = np.zeros(0, np.int8), np.zeros(0, np.int64), np.zeros(0, np.float64)
+        return EventBatch(stream_name, i64, i8, i8, f64, f64, i64, i64)
+    cols = ("ts", "camera", "therm", "temp", "humid", "x", "y")
+    return EventBatch(stream_name, *(np.concatenate([getattr(b, c) for b in batches]) for c in cols))
+
+
+def generate_inputs_columnar(
+    seed: int = 0,
+    n_per_stream: int = 50,
+    streams: Sequence[str] = DEFAULT_SCHEMA_STREAMS,
+) -> Dict[str, EventBatch]:
+    return {s: generate_stream_columns(n_per_stream, seed=seed, stream_name=s) for s in streams}
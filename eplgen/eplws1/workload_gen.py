@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from typing import List, Sequence
+from typing import Dict, Iterator, List, Sequence, Tuple
 import random
 
 from .ast import SelectQuery, StreamSource, PatternSource, WindowSpec
+from .bulk import map_chunks
 from .print_epl import query_to_epl
 from .config import DEFAULT_SCHEMA_STREAMS
 from .config import _AGGS
@@ -110,3 +111,188 @@ def generate_query(weights=DEFAULT_WEIGHTS, *, streams: Sequence[str] = DEFAULT_
 def generate_workload(n: int, seed: int = 0, weights=DEFAULT_WEIGHTS, *, streams: Sequence[str] = DEFAULT_SCHEMA_STREAMS) -> List[str]:
     random.seed(seed)
     return [query_to_epl(generate_query(weights=weights, streams=streams)) for _ in range(n)]
+
+def iter_workload(n: int, seed: int = 0, weights=DEFAULT_WEIGHTS, *, streams: Sequence[str] = DEFAULT_SCHEMA_STREAMS) -> Iterator[str]:
+    """Lazy generate_workload: the same queries, one at a time."""
+    random.seed(seed)
+    for _ in range(n):
+        yield query_to_epl(generate_query(weights=weights, streams=streams))
+
+
+# ---------------------------
+# Vectorized (NumPy) generator
+# ---------------------------
+# Same clause distributions as generate_query, with every decision for a block of
+# queries drawn at once. Block b is generated from its own Generator seeded by
+# (seed, b), so any range of blocks -- a shard -- is reproducible on its own, and
+# concatenating shards 0..N-1 in order yields the whole workload.
+
+BLOCK_SIZE = 4096
+
+_COND_FIELDS = ("camera", "therm", "temp", "humid", "x", "y")
+_CAT_OPS, _CAT_VALS = ("=", "!="), ("'R1'", "'R2'", "'R3'")
+_NUM_OPS = (">", ">=", "<", "<=")
+_TH_VALS, _XY_VALS = (20, 30, 40, 50), (0, 1, 2, 3, 4)
+_TIME_NS, _TIME_UNITS, _LEN_NS = (5, 10, 20, 60), ("seconds", "sec"), (5, 10, 100, 1000)
+
+
+def _np():
+    try:
+        import numpy
+    except ImportError as e:
+        raise RuntimeError("the vectorized workload generator requires numpy") from e
+    return numpy
+
+
+def _cond_table():
+    """All _rand_cond outcomes, plus per-field (offset, #ops, #values) into the table."""
+    table: List[str] = []
+    layout = []
+    for f in _COND_FIELDS:
+        ops, vals = (_CAT_OPS, _CAT_VALS) if f in ("camera", "therm") else (
+            (_NUM_OPS, _TH_VALS) if f in ("temp", "humid") else (_NUM_OPS, _XY_VALS))
+        layout.append((len(table), len(ops), len(vals)))
+        table.extend(f"{f} {op} {v}" for op in ops for v in vals)
+    return table, layout
+
+
+_CONDS, _COND_LAYOUT = _cond_table()
+_WINDOWS = [WindowSpec(func=f"time({k} {u})") for k in _TIME_NS for u in _TIME_UNITS] + [
+    WindowSpec(func=f"length({k})") for k in _LEN_NS
+]
+
+
+def _cond_codes(rng, shape) -> "np.ndarray":
+    """Indices into _CONDS, distributed like _rand_cond."""
+    np = _np()
+    layout = np.asarray(_COND_LAYOUT)
+    off, n_ops, n_vals = layout[rng.integers(0, len(_COND_FIELDS), size=shape)].transpose(-1, *range(len(shape)))
+    op = (rng.random(shape) * n_ops).astype(np.int64)
+    val = (rng.random(shape) * n_vals).astype(np.int64)
+    return off + op * n_vals + val
+
+
+def _window_codes(rng, shape) -> "np.ndarray":
+    """Indices into _WINDOWS, distributed like _rand_window."""
+    np = _np()
+    k = rng.integers(0, 4, size=shape)
+    is_time = rng.random(shape) < 0.7
+    return np.where(is_time, 2 * k + rng.integers(0, 2, size=shape), 2 * len(_TIME_NS) + k)
+
+
+def generate_block(block: int, m: int, seed: int = 0, weights=DEFAULT_WEIGHTS, *, streams: Sequence[str] = DEFAULT_SCHEMA_STREAMS) -> List[str]:
+    """The m queries of block `block` (m <= BLOCK_SIZE; only the last block is shorter)."""
+    np = _np()
+    rng = np.random.default_rng(np.random.SeedSequence([seed & 0xFFFFFFFF, block]))
+    s = list(streams) if streams else list(DEFAULT_SCHEMA_STREAMS)
+    u = rng.random((m, 9))
+    is_pattern = u[:, 0] < weights["pattern"] / (weights["pattern"] + 80)
+    aggs = u[:, 1] < weights["aggregates"] / 100
+    group = aggs & (u[:, 2] < weights["group_by"] / 100)
+    having = (group & (u[:, 3] < weights["having"] / 100)).tolist()
+    every = (u[:, 4] < weights["every"] / 100).tolist()
+    followed = (u[:, 5] < weights["followed_by"] / 100).tolist()
+    guard = (u[:, 6] < weights["guards"] / 100).tolist()
+    join = (u[:, 7] < weights["join"] / 100).tolist()
+    where = (u[:, 8] < weights["where"] / 100).tolist()
+    is_pattern, aggs, group = is_pattern.tolist(), aggs.tolist(), group.tolist()
+    gfield = rng.integers(0, 2, size=m).tolist()
+    afield = rng.integers(0, 3, size=m).tolist()
+    agg = rng.integers(0, len(_AGGS), size=m).tolist()
+    lvar = rng.integers(0, 3, size=m).tolist()
+    rvar = rng.integers(0, 3, size=m).tolist()
+    # two source slots per query; slot 1 is only used by joins
+    src_stream = rng.integers(0, len(s), size=(m, 2)).tolist()
+    src_filter = (rng.random((m, 2)) < weights["r_filter"] / 100).tolist()
+    src_window = (rng.random((m, 2)) < weights["windows"] / 100).tolist()
+    filters = _cond_codes(rng, (m, 2)).tolist()
+    wins = _window_codes(rng, (m, 2)).tolist()
+    wheres = _cond_codes(rng, (m,)).tolist()
+    guards = _cond_codes(rng, (m, 2)).tolist()
+
+    left_stream = s[0]
+    right_stream = s[1] if len(s) > 1 else left_stream
+    # text is assembled directly in query_to_epl's layout; sources are memoized
+    sources: Dict[Tuple[int, int, int], str] = {}
+
+    def source(k: int, f: int, w: int) -> str:
+        txt = sources.get((k, f, w))
+        if txt is None:
+            txt = s[k] + (f"({_CONDS[f]})" if f >= 0 else "") + (f"#{_WINDOWS[w].func}" if w >= 0 else "")
+            sources[(k, f, w)] = txt
+        return txt
+
+    out: List[str] = []
+    for i in range(m):
+        having_line = None
+        group_line = None
+        if aggs[i]:
+            afield_s = ("temp", "humid", "*")[afield[i]]
+            agg_expr = "count(*)" if _AGGS[agg[i]] == "count" else f"{_AGGS[agg[i]]}({afield_s})"
+            if group[i]:
+                gf = ("camera", "therm")[gfield[i]]
+                select_line = f"SELECT {gf}, {agg_expr} as a1"
+                group_line = f"GROUP BY {gf}"
+                if having[i]:
+                    having_line = "HAVING a1 > 1"
+            else:
+                select_line = f"SELECT {agg_expr} as a1"
+        else:
+            select_line = "SELECT *"
+        if is_pattern[i]:
+            left = f"{('a', 'x', 'm')[lvar[i]]}={left_stream}"
+            if every[i]:
+                left = "EVERY " + left
+            right = f"{('b', 'y', 'n')[rvar[i]]}={right_stream}"
+            if guard[i]:
+                right += f"({_CONDS[guards[i][0]]} AND {_CONDS[guards[i][1]]})"
+            from_line = f"FROM PATTERN [{left} -> {right}]" if followed[i] else f"FROM PATTERN [{left}]"
+        else:
+            st, fl, wn, fc, wc = src_stream[i], src_filter[i], src_window[i], filters[i], wins[i]
+            from_line = "FROM " + ", ".join(
+                source(st[j], fc[j] if fl[j] else -1, wc[j] if wn[j] else -1) for j in range(2 if join[i] else 1)
+            )
+        lines = [select_line, from_line]
+        if where[i]:
+            lines.append(f"WHERE {_CONDS[wheres[i]]}")
+        if group_line:
+            lines.append(group_line)
+        if having_line:
+            lines.append(having_line)
+        out.append("\n".join(lines) + ";")
+    return out
+
+
+def shard_blocks(n: int, shard: int = 0, num_shards: int = 1) -> range:
+    """Block indices of shard `shard` of `num_shards` (contiguous, nearly equal in size)."""
+    if not 0 <= shard < num_shards:
+        raise ValueError(f"bad shard {shard}/{num_shards}")
+    n_blocks = -(-n // BLOCK_SIZE)
+    return range(n_blocks * shard // num_shards, n_blocks * (shard + 1) // num_shards)
+
+
+def iter_workload_vectorized(
+    n: int,
+    seed: int = 0,
+    weights=DEFAULT_WEIGHTS,
+    *,
+    streams: Sequence[str] = DEFAULT_SCHEMA_STREAMS,
+    shard: int = 0,
+    num_shards: int = 1,
+    workers: int = 1,
+) -> Iterator[str]:
+    """Stream the queries of one shard of an n-query workload, in workload order.
+
+    Blocks are generated by `workers` processes; the output does not depend on
+    `workers` or on how the workload is sharded.
+    """
+    jobs = (
+        (b, min(BLOCK_SIZE, n - b * BLOCK_SIZE), seed, dict(weights), tuple(streams))
+        for b in shard_blocks(n, shard, num_shards)
+    )
+    for queries in map_chunks(_generate_blocks, ([j] for j in jobs), workers=workers):
+        yield from queries
+
+
+def _generate_blocks(jobs: List[Tuple[int, int, int, dict, Sequence[str]]]) -> List[str]:
+    return [q for b, m, seed, weights, streams in jobs for q in generate_block(b, m, seed, weights, streams=streams)]
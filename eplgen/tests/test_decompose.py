@@ -0,0 +1,25 @@
+from dataclasses import replace
+
+import pytest
+
+from eplws1.decompose import SharedDecomposer, decompose_select_query
+from eplws1.parse import parse_select_query
+from eplws1.workload_gen import generate_workload
+
+QUERIES = [parse_select_query(t) for t in generate_workload(150, seed=3)] + [
+    parse_select_query("SELECT camera, avg(temp) AS a1 FROM DetectMov#time(10 sec) GROUP BY camera HAVING a1 > 3"),
+]
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+@pytest.mark.parametrize("into", [None, "Out"])
+def test_unshared_statements_match_per_query_decomposition(optimize, into):
+    shared = SharedDecomposer(optimize=optimize)
+    expected = 0
+    for q in QUERIES:
+        q = replace(q, insert_into=into)
+        shared.add(q)
+        expected += len(decompose_select_query(q, optimize=optimize)[0].stmts)
+    assert shared.unshared_statements == expected
+    if into is None:
+        assert len(shared.prog.stmts) < expected
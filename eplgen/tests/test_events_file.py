@@ -0,0 +1,75 @@
+import json
+import shlex
+import sys
+from pathlib import Path
+
+import pytest
+
+from eplws1.engines.esper_cmd import EsperCmdEngine
+from eplws1.engines.events_file import EventSpill, load_events, spill_columns
+from eplws1.harness import HarnessConfig, run_workload_jsonl
+from eplws1.synth_events import generate_inputs
+
+
+def test_acquired_file_outlives_eviction():
+    spill = EventSpill(keep=2)
+    try:
+        held = spill.acquire(generate_inputs(seed=0, n_per_stream=5))
+        others = [generate_inputs(seed=i, n_per_stream=5) for i in range(1, 5)]
+        for events in others:
+            spill.spill(events)
+        assert Path(held.path).exists()
+        spill.release(held)
+        assert not Path(held.path).exists()
+    finally:
+        spill.close()
+
+
+def test_concurrent_harness_with_events_via_file(tmp_path):
+    inp = tmp_path / "workload.jsonl"
+    with inp.open("w") as f:
+        for i in range(24):
+            f.write(json.dumps({"query": f"SELECT * FROM DetectMov(temp > {i % 30})#length({i % 5 + 1})"}) + "\n")
+    runner = f"{shlex.quote(sys.executable)} -m eplws1.engines.py_runner"
+    summaries = {}
+    for via in ("inline", "file"):
+        cfg = HarnessConfig(engine="cmd", runner_cmd=runner, n_per_stream=20, events_via=via)
+        summaries[via] = run_workload_jsonl(inp, tmp_path / f"{via}.jsonl", cfg, concurrency=16)
+    assert summaries["file"].error == 0, summaries["file"].top_errors
+    assert (summaries["file"].ok, summaries["file"].mismatch) == (summaries["inline"].ok, summaries["inline"].mismatch) == (24, 0)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "evb"])
+def test_spill_round_trips_events(fmt):
+    events = generate_inputs(seed=1, n_per_stream=20)
+    for i, ev in enumerate(events["DetectMov"]):
+        ev["zone"] = f"z{i % 3}"
+    for evs in events.values():
+        for ev in evs:
+            ev.setdefault("zone", "")
+    spill = EventSpill(fmt)
+    try:
+        ref = spill.spill(events)
+        assert "zone" in spill_columns(events)
+        assert load_events(ref) == events
+    finally:
+        spill.close()
+
+
+@pytest.mark.parametrize("change", [
+    lambda ev: ev.pop("temp"),
+    lambda ev: ev.update(temp=None),
+    lambda ev: ev.update(x=1.5),
+    lambda ev: ev.update(extra=3),
+    lambda ev: ev.update(flag=True),
+])
+def test_lossy_events_are_sent_inline(change):
+    events = generate_inputs(seed=1, n_per_stream=5)
+    change(events["AlertSmoke"][2])
+    assert spill_columns(events) is None
+    engine = EsperCmdEngine(["unused"], events_via="file")
+    try:
+        fields, held = engine._events_fields(events)
+        assert fields == {"events": events} and held is None
+    finally:
+        engine.close()
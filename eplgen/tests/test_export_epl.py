@@ -0,0 +1,36 @@
+import pytest
+
+from eplws1.export_epl import iter_export_cases, read_manifest
+from eplws1.workload_gen import generate_workload
+
+QUERIES = generate_workload(20, seed=4)
+
+
+def _export(out_dir, queries, incremental):
+    return list(iter_export_cases(queries, out_dir, incremental=incremental))
+
+
+def _files(out_dir):
+    return {str(p.relative_to(out_dir)) for p in out_dir.rglob("*") if p.is_file()}
+
+
+def _listed(out_dir):
+    return {rec[k] for rec in read_manifest(out_dir).values() for k in ("epl", "data") if rec.get(k)}
+
+
+def test_incremental_rerun_skips_unchanged(tmp_path):
+    _export(tmp_path, QUERIES, True)
+    recs = _export(tmp_path, QUERIES[:5] + ["SELECT * FROM DetectMov#length(3)"] + QUERIES[6:], True)
+    assert [r["index"] for r in recs if not r.get("skipped")] == [6]
+
+
+@pytest.mark.parametrize("first", [True, False])
+@pytest.mark.parametrize("second", [True, False])
+def test_shrinking_export_removes_orphans(tmp_path, first, second):
+    _export(tmp_path, QUERIES, first)
+    assert len(read_manifest(tmp_path)) == 20
+    _export(tmp_path, QUERIES[:10], second)
+    assert len(read_manifest(tmp_path)) == 10
+    assert _files(tmp_path) == _listed(tmp_path) | {"manifest.jsonl"}
+    _export(tmp_path, QUERIES[:5], True)
+    assert _files(tmp_path) == _listed(tmp_path) | {"manifest.jsonl"}
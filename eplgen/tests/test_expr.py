@@ -0,0 +1,71 @@
+import pytest
+
+from eplws1.expr import compile_expr, filter_events
+from eplws1.joinorder import JoinStats
+
+ROW = {"x": 3, "y": 2.5, "camera": "R1", "n": None, "S.f": 7, "a": {"temp": 40}, "f": 1}
+
+
+@pytest.mark.parametrize("text, value", [
+    ("x = 3", True),
+    ("x = 03", True),
+    ("x = 3.", True),
+    ("y > .5", True),
+    ("1 + 2 * 3 = 7", True),
+    ("(1 + 2) * 3", 9),
+    ("-x + 10 % 4", -1),
+    ("x > 1 AND y < 2 OR camera = 'R1'", True),
+    ("NOT x > 1 AND y < 2", False),
+    ("NOT (x > 1 AND y < 2)", True),
+    ("1 < x < 5", True),
+    ("x <> 3 or x != 4", True),
+    ("x BETWEEN 1 AND 3", True),
+    ("x NOT BETWEEN 1 AND 3", False),
+    ("x IN (1, 2, 3)", True),
+    ("camera NOT IN ('R2', 'R3')", True),
+    ("camera LIKE 'R_'", True),
+    ("camera NOT LIKE '%1'", False),
+    ("n IS NULL", True),
+    ("x IS NOT NULL", True),
+    ("TRUE AND NOT FALSE", True),
+    ("camera = \"R1\"", True),
+    ("S.f = 7", True),
+    ("a.temp = 40", True),
+    ("Q.f = 1", True),  # flat join row: Q.f falls back to f
+    ("n > 3", None),  # comparing NULL with a number is not satisfied
+    ("x / 0", None),
+])
+def test_values(text, value):
+    assert compile_expr(text)(ROW) == value
+
+
+@pytest.mark.parametrize("text", [
+    "x >", "(x > 1", "x > 1)", "x IS 3", "foo(x)", "avg(x) > 1", "x NOT > 3", "x LIKE y", "x = @", "count()",
+    "'it''s'",  # adjacent strings are not concatenated
+])
+def test_errors_are_value_errors(text):
+    with pytest.raises(ValueError):
+        compile_expr(text)
+
+
+def test_aggregates_share_one_list():
+    aggs = []
+    e1 = compile_expr("avg(temp) > 3", aggs)
+    e2 = compile_expr("count(*) + max(x + 1)", aggs)
+    assert [(f, a.text if a else None) for f, a in aggs] == [("avg", "temp"), ("count", None), ("max", "x + 1")]
+    assert e1({}, [4, 0, 0]) is True
+    assert e2({}, [0, 2, 5]) == 7
+    with pytest.raises(ValueError):
+        compile_expr("avg(*) > 1", [])
+
+
+def test_filter_and_test():
+    rows = [{"x": 1}, {"x": None}, {"x": 5}, {}]
+    assert filter_events(rows, "x > 2") == [{"x": 5}]
+    assert filter_events(rows, None) == rows
+    assert not compile_expr("x > 2").test({"x": "a"})
+
+
+def test_selectivity_accepts_leading_zero():
+    sel = JoinStats(n_sample=200).selectivity("DetectMov", "x = 01")
+    assert sel == JoinStats(n_sample=200).selectivity("DetectMov", "x = 1")
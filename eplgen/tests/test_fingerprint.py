@@ -0,0 +1,58 @@
+import pytest
+
+from eplws1.fingerprint import canonical_text, dedup, fingerprint
+from eplws1.workload_gen import generate_workload
+
+BASE = "SELECT * FROM DetectMov#time(10 sec)"
+
+EQUIVALENT = [
+    (BASE + " WHERE x > 1 AND temp < 30", "select *  from DetectMov#time(10 seconds) where temp < 30 and x > 1"),
+    (BASE, "SELECT * FROM DetectMov#time(10 sec)"),
+    ("SELECT * FROM DetectMov#time(60 sec)", "SELECT * FROM DetectMov#time(1 min)"),
+    (BASE + " WHERE x BETWEEN 1 AND 3 AND y > 2", BASE + " WHERE y > 2 AND x between 1 and 3"),
+    ("SELECT camera, avg(temp) FROM DetectMov#length(5) GROUP BY camera, sensor",
+     "SELECT camera, AVG(temp) FROM DetectMov#length(5) GROUP BY sensor, camera"),
+    ("SELECT * FROM PATTERN [EVERY a=DetectMov(temp > 3 AND x < 1) -> b=AlertSmoke]",
+     "SELECT * FROM PATTERN [EVERY p=DetectMov(x < 1 AND temp > 3) -> q=AlertSmoke]"),
+]
+
+DISTINCT = [
+    (BASE + " WHERE x BETWEEN 1 AND 3 AND y BETWEEN 2 AND 4", BASE + " WHERE x BETWEEN 1 AND 4 AND y BETWEEN 2 AND 3"),
+    (BASE + " WHERE x BETWEEN 1 AND 3", BASE + " WHERE x NOT BETWEEN 1 AND 3"),
+    (BASE + " WHERE x > 1 OR y > 2 AND z > 3", BASE + " WHERE (x > 1 OR y > 2) AND z > 3"),
+    ("SELECT * FROM DetectMov#length(5), AlertSmoke#length(5)", "SELECT * FROM AlertSmoke#length(5), DetectMov#length(5)"),
+    ("SELECT * FROM DetectMov#time(10 sec)", "SELECT * FROM DetectMov#length(10)"),
+]
+
+
+@pytest.mark.parametrize("a, b", EQUIVALENT)
+def test_equivalent_queries_share_fingerprint(a, b):
+    assert fingerprint(a) == fingerprint(b)
+
+
+@pytest.mark.parametrize("a, b", DISTINCT)
+def test_distinct_queries_do_not_collide(a, b):
+    assert fingerprint(a) != fingerprint(b)
+
+
+def test_between_conjuncts_stay_whole():
+    text = canonical_text(BASE + " WHERE y BETWEEN 2 AND 4 AND x BETWEEN 1 AND 3")
+    assert "WHERE x between 1 and 3 AND y between 2 and 4;" in text
+
+
+@pytest.mark.parametrize("query", [a for pair in EQUIVALENT + DISTINCT for a in pair])
+def test_canonical_text_is_idempotent(query):
+    once = canonical_text(query)
+    assert canonical_text(once) == once
+    assert fingerprint(once) == fingerprint(query)
+
+
+def test_canonical_text_idempotent_on_generated_workload():
+    for line in generate_workload(200, seed=2):
+        once = canonical_text(line)
+        assert canonical_text(once) == once
+
+
+def test_dedup_counts_equivalent_queries():
+    out = dedup([EQUIVALENT[0][0], DISTINCT[0][0], EQUIVALENT[0][1], DISTINCT[0][1]])
+    assert [n for _, _, n in out] == [2, 1, 1]
@@ -0,0 +1,51 @@
+from eplws1.harness import compare_outputs, diff_outputs
+
+
+def nan():
+    return float("nan")  # a new object each time: equal NaN objects match by identity
+
+
+def test_bag_semantics():
+    a = [{"x": 1, "y": "a"}, {"x": 2, "y": "b"}, {"x": 1, "y": "a"}]
+    assert compare_outputs(a, list(reversed(a)))
+    assert not compare_outputs(a, a[:2])
+    assert compare_outputs([{"x": 1, "y": 2}], [{"y": 2, "x": 1}])
+
+
+def test_int_float_bool_none():
+    assert compare_outputs([{"x": 1}], [{"x": 1.0}])
+    assert not compare_outputs([{"x": 1}], [{"x": True}])
+    assert not compare_outputs([{"x": 0}], [{"x": None}])
+
+
+def test_nan_matches_nan():
+    assert compare_outputs([{"a": nan()}], [{"a": nan()}])
+    assert compare_outputs([{"a": nan(), "b": 1}, {"a": 2.0, "b": 1}], [{"a": 2.0, "b": 1}, {"a": nan(), "b": 1}])
+    assert compare_outputs([{"a": {"b": [nan()]}}], [{"a": {"b": [nan()]}}])
+    assert not compare_outputs([{"a": nan()}], [{"a": 1.0}])
+    assert compare_outputs([{"a": nan(), "b": 1.0}], [{"a": nan(), "b": 1.0 + 1e-12}], rel_tol=1e-9)
+
+
+def test_float_tolerance():
+    a = [{"avg": 0.1 + 0.2, "k": "x"}]
+    b = [{"avg": 0.3, "k": "x"}]
+    assert not compare_outputs(a, b)
+    assert compare_outputs(a, b, abs_tol=1e-9)
+    assert compare_outputs(a, b, rel_tol=1e-9)
+    assert not compare_outputs(a, [{"avg": 0.3, "k": "y"}], abs_tol=1e-9)
+    assert not compare_outputs([{"v": 1.0}], [{"v": 1.1}], rel_tol=1e-3)
+
+
+def test_ignore_keys():
+    a = [{"x": 1, "ts": 10}, {"x": 2, "ts": 20}]
+    b = [{"x": 1, "ts": 11}, {"x": 2, "ts": 21}]
+    assert not compare_outputs(a, b)
+    assert compare_outputs(a, b, ignore_keys=["ts"])
+
+
+def test_diff_sample_and_counts():
+    d = diff_outputs([{"x": 1}] * 3 + [{"x": 2}], [{"x": 1}, {"x": 3}], sample=1)
+    assert (d.n_a, d.n_b, d.missing, d.extra) == (4, 2, 3, 1)
+    assert d.missing_sample == [({"x": 1}, 2)]
+    assert d.extra_sample == [({"x": 3}, 1)]
+    assert "only in a" in d.format()
@@ -0,0 +1,41 @@
+from eplws1.engines.reference import ReferenceEngine
+from eplws1.harness import compare_outputs
+from eplws1.joinorder import JoinStats, reorder_joins
+from eplws1.parse import parse_select_query
+from eplws1.print_epl import query_to_epl
+from eplws1.synth_events import generate_inputs
+
+FROM = "FROM DetectMov#time(60 sec), BaseThermRead#length(5), AlertSmoke(camera='R1')#length(5)"
+
+
+def _outputs(query: str) -> list:
+    events = generate_inputs(seed=3, n_per_stream=60, streams=["DetectMov", "BaseThermRead", "AlertSmoke"])
+    return ReferenceEngine().run([query], events)
+
+
+def _reordered(query: str) -> str:
+    q = parse_select_query(query)
+    reordered, plans = reorder_joins(q, JoinStats())
+    assert plans
+    return query_to_epl(reordered)
+
+
+def test_select_star_keeps_first_source():
+    query = "SELECT * " + FROM
+    new = _reordered(query)
+    assert parse_select_query(new).from_sources[0].name == "DetectMov"
+    assert compare_outputs(_outputs(query), _outputs(new))
+
+
+def test_reordered_outputs_equal():
+    query = "SELECT count(*) AS c " + FROM
+    new = _reordered(query)
+    assert parse_select_query(new).from_sources[0].name != "DetectMov"
+    assert compare_outputs(_outputs(query), _outputs(new))
+
+
+def test_unqualified_field_pins_owner():
+    query = "SELECT temp " + FROM + " WHERE camera = 'R1'"
+    new = _reordered(query)
+    assert parse_select_query(new).from_sources[0].name == "DetectMov"
+    assert compare_outputs(_outputs(query), _outputs(new))
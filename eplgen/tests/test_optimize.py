@@ -0,0 +1,40 @@
+import pytest
+
+from eplws1.decompose import decompose_select_query
+from eplws1.engines.reference import ReferenceEngine
+from eplws1.harness import run_original_vs_decomposed
+from eplws1.optimize import split_conjuncts
+from eplws1.parse import parse_select_query
+from eplws1.synth_events import generate_inputs
+
+JOIN = "FROM DetectMov#time(10 sec), BaseThermRead#time(10 sec)"
+QUERIES = [
+    "SELECT * " + JOIN + " WHERE DetectMov.temp BETWEEN 20 AND 30",
+    "SELECT * " + JOIN + " WHERE DetectMov.temp NOT BETWEEN 20 AND 30 AND BaseThermRead.humid > 40",
+    "SELECT * " + JOIN + " WHERE DetectMov.x BETWEEN 1 AND 5 AND BaseThermRead.y BETWEEN 2 AND 8",
+    "SELECT * " + JOIN + " WHERE DetectMov.x BETWEEN 1 AND 5 AND DetectMov.y > 2",
+    "SELECT * FROM DetectMov#time(10 sec) WHERE temp BETWEEN 10 AND 20 AND camera = 'R1'",
+    "SELECT camera, avg(temp) FROM DetectMov#time(10 sec) WHERE temp > 10 GROUP BY camera",
+    "SELECT * FROM DetectMov#length(5) WHERE temp BETWEEN 10 AND 20",
+]
+
+
+def test_split_conjuncts_keeps_between():
+    assert split_conjuncts("x BETWEEN 1 AND 3 AND y NOT BETWEEN 2 AND 4 AND z > 1") == [
+        "x BETWEEN 1 AND 3", "y NOT BETWEEN 2 AND 4", "z > 1"]
+    assert split_conjuncts("a > 1 OR b BETWEEN 1 AND 2") == ["a > 1 OR b BETWEEN 1 AND 2"]
+
+
+def test_pushed_between_stays_whole():
+    prog, _ = decompose_select_query(parse_select_query(QUERIES[0]), optimize=True)
+    text = "\n".join(prog.statements)
+    assert "DetectMov(temp BETWEEN 20 AND 30)" in text
+    assert "WHERE 30" not in text
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+@pytest.mark.parametrize("query", QUERIES)
+def test_decomposed_outputs_equal(query, optimize):
+    events = generate_inputs(seed=5, n_per_stream=80)
+    res = run_original_vs_decomposed(ReferenceEngine(), query, events, optimize=optimize)
+    assert res.ok, res.details